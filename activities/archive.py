@@ -0,0 +1,375 @@
+import gzip
+import json
+import os
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import router
+from django.db import transaction
+from django.db.models import DateTimeField
+from django.utils.dateparse import parse_datetime
+
+from . import get_activity_model
+from .managers import is_feed_entries_enabled
+from .retention import get_expired_batches
+
+
+def get_archive_path(directory, created_dttm):
+    """Gets the path of the archive file for activities created in the month
+    of ``created_dttm``.  Archives are partitioned by month so old months can
+    be moved to cold storage (or restored) on their own.
+    """
+    return os.path.join(directory, 'activities-{0:%Y-%m}.jsonl.gz'.format(
+        created_dttm
+    ))
+
+
+def _get_content_type_key(content_type_id):
+    """Gets the portable "app_label.model" key for a content type id."""
+    if content_type_id is None:
+        return None
+
+    content_type = ContentType.objects.get_for_id(content_type_id)
+    return '{0}.{1}'.format(content_type.app_label, content_type.model)
+
+
+def _get_content_type_id(content_type_key):
+    """Gets the content type id for an "app_label.model" key."""
+    if content_type_key is None:
+        return None
+
+    app_label, model = content_type_key.split('.')
+    return ContentType.objects.get_by_natural_key(app_label, model).id
+
+
+def _get_attnames(model):
+    """Gets the column attribute names of the model's concrete fields."""
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _serialize_values(values):
+    """Converts a ``values()`` row to json serializable values."""
+    return dict((key, value.isoformat() if hasattr(value, 'isoformat')
+                 else value)
+                for key, value in values.items())
+
+
+def _deserialize_values(model, values):
+    """Converts an archived row back to model field values."""
+    for field in model._meta.concrete_fields:
+        if (isinstance(field, DateTimeField) and
+                values.get(field.attname) is not None):
+            values[field.attname] = parse_datetime(values[field.attname])
+
+    return values
+
+
+class ActivityArchiver(object):
+    """Moves old activities, with their replies and recipients, out of the
+    database into gzip compressed JSON Lines files and loads them back.
+
+    Each line of an archive file is one activity.  Content types are written
+    as "app_label.model" so archives can be restored into another database.
+
+    >>> archiver = ActivityArchiver(directory='/var/archive/activities')
+    >>> archiver.archive(cutoff=datetime(2015, 1, 1))
+    >>> archiver.restore(path='/var/archive/activities/activities-2014-12.jsonl.gz')
+    """
+
+    def __init__(self, directory=None, batch_size=1000):
+        """
+        :param directory: the directory the archive files are written to.
+        :param batch_size: the number of activities read and deleted (or
+            restored) per batch.
+        """
+        self.directory = directory
+        self.batch_size = batch_size
+
+    def get_queryset(self, cutoff):
+        """Gets the queryset of the activities to archive."""
+        Activity = get_activity_model()
+        return Activity._base_manager.filter(created_dttm__lt=cutoff)
+
+    def get_batches(self, cutoff):
+        """Gets the lists of activity ids to archive in ``(created_dttm, id)``
+        order.  Only one batch of ids is held in memory at a time.
+        """
+        return get_expired_batches(queryset=self.get_queryset(cutoff=cutoff),
+                                   batch_size=self.batch_size)
+
+    def get_grouped_ids(self, activity_ids):
+        """Gets the ids of the activities grouped (directly or indirectly)
+        under the activities that aren't in ``activity_ids``.  They're
+        archived with their group so the group links survive a restore.
+        """
+        Activity = get_activity_model()
+        archived_ids = set(activity_ids)
+        group_ids = archived_ids
+        grouped_ids = []
+
+        while group_ids:
+            group_ids = set(Activity._base_manager.filter(
+                group_id__in=group_ids
+            ).exclude(id__in=archived_ids).values_list('id', flat=True))
+            grouped_ids.extend(group_ids)
+            archived_ids |= group_ids
+
+        return grouped_ids
+
+    def serialize_activities(self, activity_ids):
+        """Gets the json serializable dicts of the activities with their
+        "replies" and "for_objs" recipients as ``[content_type, object_id]``.
+        """
+        Activity = get_activity_model()
+        for_objs_field = Activity._meta.get_field('for_objs')
+        through_model = for_objs_field.rel.through
+        reply_model = Activity._meta.get_field('replies').related_model
+        activity_field_name = for_objs_field.m2m_field_name()
+        activity_for_field_name = for_objs_field.m2m_reverse_field_name()
+
+        activities = dict(
+            (values['id'], values) for values in
+            Activity._base_manager.filter(id__in=activity_ids).values(
+                *_get_attnames(Activity)
+            )
+        )
+
+        for values in activities.values():
+            values['about_content_type_id'] = _get_content_type_key(
+                values['about_content_type_id']
+            )
+            values['for_objs'] = []
+            values['replies'] = []
+
+        for activity_id, content_type_id, object_id in (
+            through_model._base_manager.filter(**{
+                '{0}_id__in'.format(activity_field_name): activity_ids
+            }).values_list(
+                '{0}_id'.format(activity_field_name),
+                '{0}__content_type'.format(activity_for_field_name),
+                '{0}__object_id'.format(activity_for_field_name)
+            )
+        ):
+            activities[activity_id]['for_objs'].append(
+                [_get_content_type_key(content_type_id), object_id]
+            )
+
+        for values in reply_model._base_manager.filter(
+            activity_id__in=activity_ids
+        ).order_by('id').values(*_get_attnames(reply_model)):
+            activities[values['activity_id']]['replies'].append(
+                _serialize_values(values)
+            )
+
+        return [_serialize_values(activities[activity_id])
+                for activity_id in sorted(activities)]
+
+    def archive(self, cutoff, is_dry_run=True):
+        """Writes the activities created before the cutoff to the monthly
+        archive files and deletes them from the database.  Activities grouped
+        under an archived activity are archived with it, even if they're
+        newer than the cutoff.  Each batch is written and flushed to the
+        archive files before it's deleted.  Rows are appended to existing
+        archive files.
+
+        :param cutoff: the datetime the archived activities were created
+            before.
+        :param is_dry_run: if True, the activities are counted but not
+            archived.
+        :return: the number of activities archived (or that would be
+            archived).
+        """
+        if is_dry_run:
+            return self.get_queryset(cutoff=cutoff).count()
+
+        Activity = get_activity_model()
+        archive_files = {}
+        num_archived = 0
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        try:
+            for activity_ids in self.get_batches(cutoff=cutoff):
+                activity_ids = activity_ids + self.get_grouped_ids(
+                    activity_ids=activity_ids
+                )
+                files_written = set()
+
+                for path, values in self.get_archive_rows(
+                    self.serialize_activities(activity_ids)
+                ):
+                    if path not in archive_files:
+                        archive_files[path] = gzip.open(path, 'ab')
+
+                    archive_files[path].write(
+                        json.dumps(values, sort_keys=True).encode('utf-8') +
+                        b'\n'
+                    )
+                    files_written.add(path)
+
+                for path in files_written:
+                    archive_files[path].flush()
+                    os.fsync(archive_files[path].fileno())
+
+                num_archived += Activity.objects.fast_delete(
+                    queryset=Activity._base_manager.filter(id__in=activity_ids),
+                    batch_size=self.batch_size
+                )
+        finally:
+            for archive_file in archive_files.values():
+                archive_file.close()
+
+        return num_archived
+
+    def get_archive_rows(self, activities):
+        """Gets the archive file path of each serialized activity.  Activities
+        grouped under another archived activity are written to the file of
+        the top activity of the group, after the activities they're grouped
+        under, so restoring the file restores the group.
+
+        :param activities: list of the serialized activity dicts.
+        :return: list of ``(path, values)`` tuples in the order to write them.
+        """
+        activities_by_id = dict((values['id'], values)
+                                for values in activities)
+        rows = []
+
+        for values in activities:
+            group = values
+            depth = 0
+
+            while (group['group_id'] in activities_by_id and
+                   depth < len(activities)):
+                group = activities_by_id[group['group_id']]
+                depth += 1
+
+            path = get_archive_path(
+                directory=self.directory,
+                created_dttm=parse_datetime(group['created_dttm'])
+            )
+            rows.append((depth, values['id'], path, values))
+
+        return [(path, values) for depth, activity_id, path, values
+                in sorted(rows, key=lambda row: row[:2])]
+
+    def read(self, path):
+        """Reads the activity dicts from an archive file one at a time."""
+        with gzip.open(path, 'rb') as archive_file:
+            for line in archive_file:
+                line = line.strip()
+
+                if line:
+                    yield json.loads(line.decode('utf-8'))
+
+    def restore(self, path):
+        """Loads the activities in an archive file back into the database with
+        their original ids.  Activities that already exist are skipped so a
+        restore can safely be run more than once.  The share counts of the
+        shared objects are incremented and the feed entries are recreated
+        when enabled.
+
+        :param path: the path of the archive file.
+        :return: the number of activities restored.
+        """
+        batch = []
+        num_restored = 0
+
+        for values in self.read(path):
+            batch.append(values)
+
+            if len(batch) >= self.batch_size:
+                num_restored += self.restore_batch(batch)
+                batch = []
+
+        if batch:
+            num_restored += self.restore_batch(batch)
+
+        return num_restored
+
+    def restore_batch(self, batch):
+        """Bulk creates a batch of archived activities with their replies and
+        recipients.
+
+        :param batch: list of the activity dicts read from an archive.
+        :return: the number of activities restored.
+        """
+        Activity = get_activity_model()
+        for_objs_field = Activity._meta.get_field('for_objs')
+        through_model = for_objs_field.rel.through
+        reply_model = Activity._meta.get_field('replies').related_model
+        existing_ids = set(Activity._base_manager.filter(
+            id__in=[values['id'] for values in batch]
+        ).values_list('id', flat=True))
+        batch = [values for values in batch
+                 if values['id'] not in existing_ids]
+
+        if not batch:
+            return 0
+
+        activities = []
+        replies = []
+        recipients = []
+
+        for values in batch:
+            replies.extend(values.pop('replies'))
+            recipients.extend(
+                (values['id'], (_get_content_type_id(content_type_key),
+                                object_id))
+                for content_type_key, object_id in values.pop('for_objs')
+            )
+            values['about_content_type_id'] = _get_content_type_id(
+                values['about_content_type_id']
+            )
+            activities.append(Activity(**_deserialize_values(Activity,
+                                                              values)))
+
+        # the group activity may have been deleted or not restored yet
+        activities_by_id = dict((activity.id, activity)
+                                for activity in activities)
+        group_ids = set(activities_by_id) | set(
+            Activity._base_manager.filter(id__in=set(
+                activity.group_id for activity in activities
+                if activity.group_id is not None
+            )).values_list('id', flat=True)
+        )
+
+        for activity in activities:
+            if activity.group_id not in group_ids:
+                activity.group_id = None
+
+        with transaction.atomic(using=router.db_for_write(Activity)):
+            Activity._base_manager.bulk_create(activities)
+            reply_model._base_manager.bulk_create([
+                reply_model(**_deserialize_values(reply_model, values))
+                for values in sorted(replies, key=lambda r: r['id'])
+            ])
+            activity_fors = (
+                for_objs_field.related_model.objects.get_or_create_for_keys(
+                    keys=set(key for activity_id, key in recipients)
+                )
+            )
+            through_model._base_manager.bulk_create([
+                through_model(**{
+                    '{0}_id'.format(for_objs_field.m2m_field_name()):
+                        activity_id,
+                    '{0}_id'.format(for_objs_field.m2m_reverse_field_name()):
+                        activity_fors[key].id
+                })
+                for activity_id, key in recipients
+            ])
+            Activity.objects.update_about_share_counts(activities=activities,
+                                                       delta=1)
+
+            if is_feed_entries_enabled():
+                feed_entry_model = Activity.objects._get_feed_entry_model()
+                feed_entry_model.objects.bulk_create_for_activities(
+                    feed_entries=[(activities_by_id[activity_id],
+                                   activity_fors[key])
+                                  for activity_id, key in recipients]
+                )
+
+            Activity.objects.bump_feed_generations(
+                activity_ids=list(activities_by_id)
+            )
+
+        return len(activities)
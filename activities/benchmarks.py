@@ -0,0 +1,291 @@
+import platform
+from datetime import datetime
+from random import Random
+from timeit import default_timer
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections
+from django.db import router
+from django.db import transaction
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from . import get_activity_model
+from .generator import ActivityGenerator
+from .paging import HasMorePaginator
+from .prefetch import prefetch_about_objects
+from .prefetch import prefetch_latest_replies
+
+try:
+    import tracemalloc
+except ImportError:
+    # python < 3.4
+    tracemalloc = None
+
+
+def percentile(values, percent):
+    """Gets the percentile of a list of values using the nearest rank."""
+    if not values:
+        return None
+
+    values = sorted(values)
+    index = max(0, int(round(percent / 100.0 * len(values))) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+def measure(func, iterations, connection):
+    """Times a function over a number of iterations.
+
+    :param func: the function to time.  It's called with no args.
+    :param iterations: the number of timed calls.
+    :param connection: the database connection to count the queries of.
+    :return: dict of the "ops_per_second", "p50_ms", "p95_ms",
+        "queries_per_op", "query_ms_per_op" and "peak_memory_kb" (None if
+        ``tracemalloc`` isn't available) results.
+    """
+    # warm up the caches (content types, templates, etc) first
+    func()
+
+    latencies = []
+
+    with CaptureQueriesContext(connection) as queries:
+        for i in range(iterations):
+            start = default_timer()
+            func()
+            latencies.append(default_timer() - start)
+
+    peak_memory_kb = None
+
+    if tracemalloc is not None:
+        # measured in a separate call since tracing slows down the timings
+        is_tracing = tracemalloc.is_tracing()
+
+        if not is_tracing:
+            tracemalloc.start()
+
+        tracemalloc.clear_traces()
+        func()
+        peak_memory_kb = tracemalloc.get_traced_memory()[1] / 1024.0
+
+        if not is_tracing:
+            tracemalloc.stop()
+
+    total_seconds = sum(latencies)
+    return {
+        'iterations': iterations,
+        'ops_per_second': (iterations / total_seconds
+                           if total_seconds else None),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'queries_per_op': len(queries) / float(iterations),
+        'query_ms_per_op': sum(float(query['time'])
+                               for query in queries.captured_queries) *
+                           1000 / iterations,
+        'peak_memory_kb': peak_memory_kb,
+    }
+
+
+class ActivityBenchmarks(object):
+    """Benchmarks the activity write path, feed reads and rendering over
+    generated datasets of increasing size (see ``ActivityGenerator``).  The
+    results can be written as json and diffed across commits.
+
+    Benchmarks:
+
+    * create: ``ActivityManager.create`` with a few recipients.
+    * get_for_object: reading a page of a user's feed with ``get_for_object``.
+    * activities_view: a full ``ActivitiesView`` request for a user's feed.
+    * render_activities: rendering a prefetched page with the
+        ``render_activities`` template tag.
+
+    The datasets are generated in a transaction that's rolled back when the
+    benchmarks finish unless ``keep_data`` is True.
+
+    >>> benchmarks = ActivityBenchmarks(sizes=[1000, 10000])
+    >>> results = benchmarks.run()
+    """
+    benchmark_names = ('create', 'get_for_object', 'activities_view',
+                       'render_activities')
+
+    def __init__(self, sizes, iterations=50, page_size=15, num_users=1000,
+                 seed=0, benchmark_names=None, keep_data=False):
+        """
+        :param sizes: the list of the number of activities in the datasets.
+        :param iterations: the number of timed calls per benchmark.
+        :param page_size: the number of activities per feed page.
+        :param num_users: the number of users in the datasets.
+        :param seed: the random seed of the datasets.
+        :param benchmark_names: (optional) the names of the benchmarks to run.
+            Defaults to all of them.
+        :param keep_data: boolean indicating if the generated datasets should
+            be kept in the database.
+        """
+        self.sizes = sorted(sizes)
+        self.iterations = iterations
+        self.page_size = page_size
+        self.num_users = num_users
+        self.seed = seed
+        self.benchmark_names = benchmark_names or self.benchmark_names
+        self.keep_data = keep_data
+        self.random = Random(seed)
+        self.generator = ActivityGenerator(num_users=num_users, seed=seed)
+        self.num_generated = 0
+
+    def get_connection(self):
+        """Gets the connection of the activities database."""
+        return connections[router.db_for_write(get_activity_model())]
+
+    def setup_dataset(self, size):
+        """Generates activities until the dataset has ``size`` activities."""
+        if size > self.num_generated:
+            self.num_generated += self.generator.generate(
+                num_activities=size - self.num_generated
+            )['activities']
+
+        User = get_user_model()
+        self.users = self.generator.get_users()
+        # the first generated user is the most active
+        self.user = User._default_manager.get(id=self.users[0].id)
+
+    def get_benchmark(self, name):
+        """Gets the function to time for a benchmark."""
+        return getattr(self, 'get_{0}_benchmark'.format(name))()
+
+    def get_create_benchmark(self):
+        Activity = get_activity_model()
+
+        def create():
+            Activity.objects.create(
+                created_user=self.user,
+                about=self.random.choice(self.users),
+                text='Benchmark activity',
+                ensure_for_objs=self.random.sample(self.users,
+                                                   min(5, len(self.users)))
+            )
+
+        return create
+
+    def get_get_for_object_benchmark(self):
+        Activity = get_activity_model()
+
+        def get_for_object():
+            list(Activity.objects.get_for_object(
+                obj=self.user,
+                for_user=self.user
+            ).order_by(
+                *Activity.objects.get_for_object_ordering()
+            )[:self.page_size])
+
+        return get_for_object
+
+    def get_activities_view_benchmark(self):
+        from .views import ActivitiesGenericObjectView
+
+        view = ActivitiesGenericObjectView.as_view()
+        request_factory = RequestFactory()
+        content_type = ContentType.objects.get_for_model(self.user)
+
+        def activities_view():
+            request = request_factory.get('/', {'aps': self.page_size})
+            request.user = self.user
+            request.session = {}
+            response = view(request,
+                            content_type_id=str(content_type.id),
+                            object_id=str(self.user.id))
+            response.render()
+
+        return activities_view
+
+    def get_render_activities_benchmark(self):
+        from .templatetags.activity_tags import render_activities
+
+        Activity = get_activity_model()
+        page = HasMorePaginator(
+            Activity.objects.get_for_object(obj=self.user,
+                                            for_user=self.user),
+            self.page_size
+        ).page(1)
+        page.object_list = prefetch_about_objects(
+            activities=list(page.object_list)
+        )
+        prefetch_latest_replies(activities=page.object_list, count=3)
+        request = RequestFactory().get('/')
+        request.user = self.user
+
+        def render():
+            render_activities(context={'request': request,
+                                       'user': self.user},
+                              page=page,
+                              obj=self.user,
+                              activity_url='/activities')
+
+        return render
+
+    def run_benchmarks(self, size):
+        """Runs the benchmarks for a dataset size.
+
+        :return: list of the result dicts.
+        """
+        connection = self.get_connection()
+        results = []
+
+        for name in self.benchmark_names:
+            result = {'name': name, 'size': size}
+
+            try:
+                # each benchmark is rolled back so the writes of one don't
+                # change the dataset of the next.
+                with transaction.atomic(using=connection.alias):
+                    result.update(measure(func=self.get_benchmark(name),
+                                          iterations=self.iterations,
+                                          connection=connection))
+                    transaction.set_rollback(True, using=connection.alias)
+            except Exception as e:
+                result['error'] = '{0}: {1}'.format(e.__class__.__name__, e)
+
+            results.append(result)
+
+        return results
+
+    def get_metadata(self):
+        """Gets the environment of the run so results can be compared."""
+        connection = self.get_connection()
+        return {
+            'datetime': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'iterations': self.iterations,
+            'page_size': self.page_size,
+            'num_users': self.num_users,
+            'seed': self.seed,
+        }
+
+    def run(self, progress_callback=None):
+        """Runs the benchmarks for each dataset size.
+
+        :param progress_callback: (optional) function called with the list of
+            results of each dataset size.
+        :return: dict of the "metadata" and the list of "results".
+        """
+        connection = self.get_connection()
+        results = []
+
+        with transaction.atomic(using=connection.alias):
+            for size in self.sizes:
+                self.setup_dataset(size=size)
+                size_results = self.run_benchmarks(size=size)
+                results.extend(size_results)
+
+                if progress_callback:
+                    progress_callback(size_results)
+
+            if not self.keep_data:
+                transaction.set_rollback(True, using=connection.alias)
+
+        return {
+            'metadata': self.get_metadata(),
+            'results': results,
+        }
@@ -0,0 +1,152 @@
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+
+
+class CacheStats(object):
+    """Keeps track of the hit and miss counts for a cache."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def record_hit(self):
+        self.hits += 1
+
+    def record_miss(self):
+        self.misses += 1
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get_hit_rate(self):
+        """Gets the ratio of cache lookups that were hits."""
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    def get_stats(self):
+        """Gets the cache statistics."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.get_hit_rate()
+        }
+
+
+class LRUCache(CacheStats):
+    """Bounded, thread safe, in-process least recently used cache that keeps
+    track of its hit and miss counts.
+
+    >>> cache = LRUCache(max_size=2)
+    >>> cache.set('a', 1)
+    >>> cache.get('a')
+    1
+    >>> cache.hits
+    1
+    """
+
+    def __init__(self, max_size=None):
+        """
+        :param max_size: the max number of items to keep in the cache.  If
+            None, ``get_max_size`` is used to get the max size each time an
+            item is added to the cache.  A max size of 0 disables the cache.
+        """
+        super(LRUCache, self).__init__()
+        self._max_size = max_size
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get_max_size(self):
+        """Gets the max number of items to keep in the cache."""
+        return self._max_size
+
+    def get(self, key, default=None):
+        """Gets an item from the cache and marks it as the most recently
+        used.
+        """
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                self.record_miss()
+                return default
+
+            self._items[key] = value
+            self.record_hit()
+            return value
+
+    def set(self, key, value):
+        """Adds an item to the cache evicting the least recently used items if
+        the cache is full.
+        """
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        """Adds many items to the cache.
+
+        :param items: dict of the items to add to the cache.
+        """
+        max_size = self.get_max_size()
+
+        if not max_size:
+            return
+
+        with self._lock:
+            for key, value in items.items():
+                self._items.pop(key, None)
+                self._items[key] = value
+
+            while len(self._items) > max_size:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        """Removes an item from the cache."""
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        """Removes all items from the cache and resets the counters."""
+        with self._lock:
+            self._items.clear()
+            self.reset_stats()
+
+    def get_stats(self):
+        """Gets the cache statistics."""
+        stats = super(LRUCache, self).get_stats()
+        stats.update({
+            'size': len(self._items),
+            'max_size': self.get_max_size()
+        })
+        return stats
+
+
+class ActivityForCache(LRUCache):
+    """Per-process LRU cache mapping ``(content_type_id, object_id)`` keys to
+    ``ActivityFor`` primary keys so hot recipients (the creating user, popular
+    groups, etc) don't need to be looked up every time an activity is
+    created.
+
+    The max size is controlled by the ``ACTIVITIES_FOR_CACHE_SIZE`` setting
+    and defaults to 0 which disables the cache.  Deleting an ``ActivityFor``
+    only invalidates the cache of the current process so only enable this
+    when ``ActivityFor`` rows are never deleted (i.e. by
+    ``ActivityFor.objects.merge_duplicates``) while other processes are
+    creating activities.
+    """
+
+    def get_max_size(self):
+        if self._max_size is not None:
+            return self._max_size
+
+        return getattr(settings, 'ACTIVITIES_FOR_CACHE_SIZE', 0)
+
+
+activity_for_cache = ActivityForCache()
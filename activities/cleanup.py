@@ -1,7 +1,12 @@
 from logging import getLogger
+from multiprocessing import Pool
 
+import django
 from activities.models import Activity
 from django.contrib.contenttypes.models import ContentType
+from django.db import connections
+from django.db import router
+from django.db.transaction import TransactionManagementError
 
 
 logger = getLogger(__name__)
@@ -12,9 +17,38 @@ class ActivityCleaner(object):
     a valid "about" object.  This can happen if the "about" object is deleted
     and the notifications weren't cleaned up properly.
 
+    Each content type is processed in bounded ranges of "about" ids.  When the
+    "about" model is in the same database as the activities, the stale "about"
+    ids are found with an anti-join in the database.  Otherwise the existing
+    ids of the range are read from the "about" model's database and compared.
+    Stale activities are deleted in fixed size batches, each in its own short
+    transaction.  The ranges can be cleaned up in parallel worker processes.
+
     >>> cleaner = ActivityCleaner()
     >>> cleaner.cleanup()
     """
+
+    def __init__(self, chunk_size=100000, batch_size=1000,
+                 progress_callback=None, workers=1):
+        """
+        :param chunk_size: the number of "about" ids to check per range.
+        :param batch_size: the max number of activities to delete per
+            transaction.
+        :param progress_callback: (optional) function called with a dict of
+            the progress after each range of "about" ids is cleaned.  The dict
+            has the "model", "about_id_start", "about_id_end",
+            "num_stale_about_ids" and "num_activities" keys.
+        :param workers: the number of worker processes to clean up the
+            content types and "about" id ranges in.  Each worker uses its own
+            database connections so the cleanup can't run in parallel inside
+            a transaction.  Workers read the settings from the
+            ``DJANGO_SETTINGS_MODULE`` environment variable.
+        """
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.progress_callback = progress_callback
+        self.workers = workers
+
     def get_distinct_content_type_ids(self):
         """Gets the distinct content type ids that exist in the db."""
         return (Activity.objects.order_by()
@@ -29,6 +63,203 @@ class ActivityCleaner(object):
                                 .values_list('about_id', flat=True)
                                 .distinct())
 
+    def get_about_id_ranges(self, content_type):
+        """Gets the ``(about_id_start, about_id_end)`` ranges to clean up for
+        the content type.  Each range holds up to ``chunk_size`` distinct
+        "about" ids, so gaps in the ids don't create empty ranges.
+
+        :param content_type: the content type of the "about" model.
+        """
+        about_ids = self.get_about_ids_by_content_type(
+            content_type=content_type
+        ).order_by('about_id')
+        about_id_start = 0
+
+        while True:
+            # the last "about" id of the range
+            about_id_last = list(about_ids.filter(
+                about_id__gte=about_id_start
+            )[self.chunk_size - 1:self.chunk_size])
+
+            if not about_id_last:
+                break
+
+            yield about_id_start, about_id_last[0] + 1
+            about_id_start = about_id_last[0] + 1
+
+        if about_ids.filter(about_id__gte=about_id_start).exists():
+            yield about_id_start, None
+
+    def is_same_database(self, model):
+        """Boolean indicating if the "about" model is in the same database as
+        the activities so the stale "about" ids can be found with an
+        anti-join.
+        """
+        return router.db_for_read(model) == router.db_for_read(Activity)
+
+    def get_existing_about_ids(self, model, about_id_start, about_id_end):
+        """Gets the queryset of the "about" model's primary keys in the range.
+        The range keeps the anti-join subquery to the ids being checked
+        instead of the whole "about" table.
+        """
+        return _filter_id_range(queryset=model._default_manager.all(),
+                                field_name='pk',
+                                id_start=about_id_start,
+                                id_end=about_id_end).values('pk')
+
+    def get_stale_activities(self, content_type, model, about_id_start,
+                             about_id_end):
+        """Gets the queryset of the activities about objects in the range
+        that no longer exist.  Only used when the "about" model is in the
+        same database as the activities.
+        """
+        return _filter_id_range(
+            queryset=Activity.objects.filter(about_content_type=content_type),
+            field_name='about_id',
+            id_start=about_id_start,
+            id_end=about_id_end
+        ).exclude(about_id__in=self.get_existing_about_ids(
+            model=model,
+            about_id_start=about_id_start,
+            about_id_end=about_id_end
+        ))
+
+    def get_stale_about_ids(self, content_type, model, about_id_start,
+                            about_id_end):
+        """Gets the "about" ids in the range that no longer exist.
+
+        :param content_type: the content type of the "about" model.
+        :param model: the "about" model.
+        :param about_id_start: the first "about" id of the range (inclusive).
+        :param about_id_end: the last "about" id of the range (exclusive) or
+            None for no upper bound.
+        """
+        if self.is_same_database(model):
+            # anti-join in the database
+            return list(self.get_stale_activities(
+                content_type=content_type,
+                model=model,
+                about_id_start=about_id_start,
+                about_id_end=about_id_end
+            ).order_by().values_list('about_id', flat=True).distinct())
+
+        about_ids = _filter_id_range(
+            queryset=self.get_about_ids_by_content_type(
+                content_type=content_type
+            ),
+            field_name='about_id',
+            id_start=about_id_start,
+            id_end=about_id_end
+        )
+
+        # the "about" model is in a different database so the existing ids
+        # can't be joined to.
+        about_ids = set(about_ids)
+
+        if not about_ids:
+            return []
+
+        existing_about_ids = model._default_manager.filter(
+            pk__in=about_ids
+        ).values_list('pk', flat=True)
+        return list(about_ids.difference(existing_about_ids))
+
+    def delete_activities(self, queryset, is_dry_run=True):
+        """Deletes the stale activities in batches.
+
+        :param queryset: the queryset of the stale activities.
+        :param is_dry_run: if True, the activities are counted but not
+            deleted.
+        :return: the number of activities deleted (or that would be deleted).
+        """
+        if is_dry_run:
+            return queryset.count()
+
+        return Activity.objects.fast_delete(queryset=queryset,
+                                            batch_size=self.batch_size)
+
+    def cleanup_range(self, content_type, model, about_id_start,
+                      about_id_end, is_dry_run=True):
+        """Cleans up the stale activities for a range of "about" ids.
+
+        :return: tuple of the list of stale "about" ids and the number of
+            activities deleted.
+        """
+        stale_about_ids = self.get_stale_about_ids(
+            content_type=content_type,
+            model=model,
+            about_id_start=about_id_start,
+            about_id_end=about_id_end
+        )
+
+        if not stale_about_ids:
+            return stale_about_ids, 0
+
+        if self.is_same_database(model):
+            # the range and the anti-join instead of a list of ids
+            queryset = self.get_stale_activities(
+                content_type=content_type,
+                model=model,
+                about_id_start=about_id_start,
+                about_id_end=about_id_end
+            )
+        else:
+            queryset = Activity.objects.filter(
+                about_content_type=content_type,
+                about_id__in=stale_about_ids
+            )
+
+        num_activities = self.delete_activities(queryset=queryset,
+                                                is_dry_run=is_dry_run)
+        logger.info(
+            'Cleaning up {0} activities for the following stale '
+            '"{1}" instance ids: {2}'.format(num_activities,
+                                             model,
+                                             stale_about_ids))
+        return stale_about_ids, num_activities
+
+    def get_tasks(self):
+        """Gets the ranges of "about" ids to clean up for every content type
+        that has activities.
+
+        :return: iterable of dicts with the "content_type_id",
+            "about_id_start" and "about_id_end" keys.
+        """
+        for content_type_id in self.get_distinct_content_type_ids():
+            content_type = ContentType.objects.filter(id=content_type_id).first()
+
+            if not content_type:
+                continue
+
+            if content_type.model_class() is None:
+                # the model no longer exists.
+                continue
+
+            for about_id_start, about_id_end in self.get_about_id_ranges(
+                content_type=content_type
+            ):
+                yield {
+                    'content_type_id': content_type.id,
+                    'about_id_start': about_id_start,
+                    'about_id_end': about_id_end
+                }
+
+    def cleanup_task(self, task, is_dry_run=True):
+        """Cleans up the stale activities for a task from ``get_tasks``.
+
+        :return: tuple of the task, the list of stale "about" ids and the
+            number of activities deleted.
+        """
+        content_type = ContentType.objects.get_for_id(task['content_type_id'])
+        stale_about_ids, num_activities = self.cleanup_range(
+            content_type=content_type,
+            model=content_type.model_class(),
+            about_id_start=task['about_id_start'],
+            about_id_end=task['about_id_end'],
+            is_dry_run=is_dry_run
+        )
+        return task, stale_about_ids, num_activities
+
     def cleanup(self, is_dry_run=True):
         """Performs the cleanup of the the stale activities (activities that
         have no valid about object).
@@ -36,40 +267,89 @@ class ActivityCleaner(object):
         :param is_dry_run: boolean indicating if the objects should be deleted
             from the database or not.  If False, this will only print out the
             ids of the items that would be cleaned up.
+        :return: dict of the list of stale "about" ids keyed by the "about"
+            model.
         """
-        content_type_ids = self.get_distinct_content_type_ids()
-        cleaned_about_ids = {}
+        tasks = self.get_tasks()
+        pool = None
 
-        for content_type_id in content_type_ids:
-            content_type = ContentType.objects.filter(id=content_type_id).first()
+        if self.workers > 1:
+            if any(connection.in_atomic_block
+                   for connection in connections.all()):
+                # the connections are closed for the workers which would
+                # break the caller's transaction.
+                raise TransactionManagementError(
+                    'The activity cleanup can\'t run in parallel workers '
+                    'inside a transaction.'
+                )
 
-            if not content_type:
-                continue
+            tasks = list(tasks)
 
-            model = content_type.model_class()
-            unique_about_ids = self.get_about_ids_by_content_type(
-                content_type=content_type
+            # the worker processes can't share the database connections
+            for connection in connections.all():
+                connection.close()
+
+            # workers that are spawned instead of forked don't inherit the
+            # loaded apps.
+            pool = Pool(processes=self.workers, initializer=django.setup)
+            results = pool.imap_unordered(
+                _cleanup_task,
+                [(self.chunk_size, self.batch_size, task, is_dry_run)
+                 for task in tasks]
             )
-            existing_about_ids = (model.objects.filter(id__in=unique_about_ids)
-                                               .values_list('id', flat=True))
+        else:
+            results = (self.cleanup_task(task=task, is_dry_run=is_dry_run)
+                       for task in tasks)
 
-            # these are the ids of the objects that no longer exist in the db
-            stale_about_ids = set(unique_about_ids).difference(existing_about_ids)
+        cleaned_about_ids = {}
 
-            if stale_about_ids:
-                cleanup_queryset = Activity.objects.filter(
-                    about_content_type=content_type,
-                    about_id__in=stale_about_ids
-                )
-                logger.info(
-                    'Cleaning up {0} activities for the following stale '
-                    '"{1}" instance ids: {2}'.format(cleanup_queryset.count(),
-                                                     model,
-                                                     stale_about_ids))
+        try:
+            for task, stale_about_ids, num_activities in results:
+                model = ContentType.objects.get_for_id(
+                    task['content_type_id']
+                ).model_class()
 
-                cleaned_about_ids[model] = list(stale_about_ids)
+                if stale_about_ids:
+                    cleaned_about_ids.setdefault(model, []).extend(
+                        stale_about_ids
+                    )
 
-                if not is_dry_run:
-                    cleanup_queryset.delete()
+                if self.progress_callback:
+                    self.progress_callback({
+                        'model': model,
+                        'about_id_start': task['about_id_start'],
+                        'about_id_end': task['about_id_end'],
+                        'num_stale_about_ids': len(stale_about_ids),
+                        'num_activities': num_activities
+                    })
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
 
         return cleaned_about_ids
+
+
+def _cleanup_task(args):
+    """Cleans up a task in a worker process.
+
+    :param args: tuple of the cleaner's chunk size and batch size, the task
+        and is_dry_run.
+    """
+    chunk_size, batch_size, task, is_dry_run = args
+    cleaner = ActivityCleaner(chunk_size=chunk_size, batch_size=batch_size)
+    return cleaner.cleanup_task(task=task, is_dry_run=is_dry_run)
+
+
+def _filter_id_range(queryset, field_name, id_start, id_end):
+    """Filters a queryset to the ``[id_start, id_end)`` range of a field.
+
+    :param id_end: the end of the range (exclusive) or None for no upper
+        bound.
+    """
+    queryset = queryset.filter(**{'{0}__gte'.format(field_name): id_start})
+
+    if id_end is not None:
+        queryset = queryset.filter(**{'{0}__lt'.format(field_name): id_end})
+
+    return queryset
@@ -83,7 +83,7 @@ class Action(EnumCheck):
    )
 
 
-class Privacy(object):
+class Privacy(EnumCheck):
     """Privacy for a activity."""
     PUBLIC = 'PUBLIC'  # everyone can see
     PRIVATE = 'PRIVATE'  # only created user can see
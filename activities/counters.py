@@ -0,0 +1,195 @@
+from atexit import register
+from collections import defaultdict
+from threading import Lock
+from threading import Timer
+from time import time
+
+from django.conf import settings
+from django.db import connections
+from django.db import router
+from django.db import transaction
+from django.db.models import F
+
+
+def get_counter_buffer_mode():
+    """Gets how the denormalized counters (``reply_count``, ``share_count``)
+    are updated.  This is controlled by the ``ACTIVITIES_COUNTER_BUFFER``
+    setting:
+
+    * None (default): each change is written immediately.
+    * "commit": changes are accumulated for the transaction and written in
+        batched updates when the transaction commits.
+    * "interval": committed changes are accumulated in-process and written in
+        batched updates every ``ACTIVITIES_COUNTER_FLUSH_INTERVAL`` seconds
+        (default 5).  Changes buffered by a process that's killed before
+        they're flushed are lost.  Run ``update_activity_reply_counts`` and
+        ``update_share_counts`` to repair the counters.
+
+    Django < 1.9 has no transaction on commit hook so changes can't be held
+    until the transaction commits.  There "commit" writes each change
+    immediately (the same as the default) and "interval" buffers each change
+    as soon as it's made, even if its transaction is later rolled back.
+    """
+    return getattr(settings, 'ACTIVITIES_COUNTER_BUFFER', None)
+
+
+def apply_counter_deltas(deltas):
+    """Writes counter changes to the database.  Objects with the same model,
+    field and delta are updated in a single query.  Counters are never
+    decremented below 0.
+
+    :param deltas: dict of the deltas keyed by ``(model, pk, field)``.
+    """
+    pks_by_group = defaultdict(list)
+
+    for (model, pk, field), delta in deltas.items():
+        if delta:
+            pks_by_group[(model, field, delta)].append(pk)
+
+    for (model, field, delta), pks in pks_by_group.items():
+        queryset = model._default_manager.filter(pk__in=pks)
+
+        if delta < 0:
+            # can't have a negative count.  Zero the counters that would go
+            # negative first so they aren't decremented below.
+            queryset.filter(**{
+                '{0}__lt'.format(field): -delta
+            }).update(**{field: 0})
+            queryset = queryset.filter(**{'{0}__gte'.format(field): -delta})
+
+        queryset.update(**{field: F(field) + delta})
+
+
+class CounterBuffer(object):
+    """Accumulates changes to denormalized counters so a busy object (i.e. an
+    activity getting a lot of replies) isn't row locked for every change.
+    See ``get_counter_buffer_mode`` for how the changes are written.
+
+    Changes made inside a transaction (or savepoint) are only kept if it
+    commits.  Transactions are tracked on the database each model is written
+    to.  With the "interval" mode, a timer flushes the buffered changes once
+    the flush interval has passed even if no other changes are added.
+    """
+
+    def __init__(self):
+        self._deltas = defaultdict(int)
+        self._lock = Lock()
+        self._last_flush_time = time()
+        self._timer = None
+
+    def add(self, model, pk, field, delta):
+        """Adds a change to a counter.
+
+        :param model: the model class with the counter field.
+        :param pk: the primary key of the object to update.
+        :param field: the name of the counter field.
+        :param delta: the amount to change the counter by.
+        """
+        key = (model, pk, field)
+
+        if not get_counter_buffer_mode():
+            apply_counter_deltas({key: delta})
+            return
+
+        transaction_deltas = self._get_transaction_deltas(
+            using=router.db_for_write(model)
+        )
+
+        if transaction_deltas is None:
+            self._commit({key: delta})
+        else:
+            transaction_deltas[key] += delta
+
+    def _get_transaction_deltas(self, using):
+        """Gets the deltas for the current transaction (and savepoint) of a
+        database or None if not in a transaction.  The deltas are committed
+        by a transaction on commit callback.  Django discards the callbacks
+        registered in a savepoint that's rolled back so the deltas of each
+        savepoint get their own callback.
+
+        :param using: the database alias.
+        """
+        if not hasattr(transaction, 'on_commit'):
+            # django < 1.9
+            return None
+
+        connection = transaction.get_connection(using=using)
+
+        if not connection.in_atomic_block:
+            return None
+
+        savepoint_ids = set(connection.savepoint_ids)
+
+        for sids, func in connection.run_on_commit:
+            if (getattr(func, 'counter_buffer', None) is self and
+                    sids == savepoint_ids):
+                return func.deltas
+
+        deltas = defaultdict(int)
+
+        def callback():
+            self._commit(deltas)
+
+        callback.counter_buffer = self
+        callback.deltas = deltas
+        transaction.on_commit(callback, using=using)
+        return deltas
+
+    def _commit(self, deltas):
+        """Handles the deltas of a committed change."""
+        if get_counter_buffer_mode() != 'interval':
+            apply_counter_deltas(deltas)
+            return
+
+        flush_interval = getattr(settings, 'ACTIVITIES_COUNTER_FLUSH_INTERVAL',
+                                 5)
+
+        with self._lock:
+            for key, delta in deltas.items():
+                self._deltas[key] += delta
+
+            is_flush_due = time() - self._last_flush_time >= flush_interval
+
+            if not is_flush_due and self._timer is None:
+                # flush even if no other changes are added before the
+                # interval passes.
+                self._timer = Timer(flush_interval, self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if is_flush_due:
+            self.flush()
+
+    def _flush_on_timer(self):
+        """Flushes the buffered changes from the timer thread."""
+        with self._lock:
+            self._timer = None
+
+        try:
+            self.flush()
+        finally:
+            # the timer thread's connections aren't closed by a request
+            for connection in connections.all():
+                connection.close()
+
+    def flush(self):
+        """Writes all the buffered counter changes to the database."""
+        with self._lock:
+            deltas = self._deltas
+            self._deltas = defaultdict(int)
+            self._last_flush_time = time()
+
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        apply_counter_deltas(deltas)
+
+    def __len__(self):
+        return len(self._deltas)
+
+
+counter_buffer = CounterBuffer()
+
+# write any buffered changes before the process exits
+register(counter_buffer.flush)
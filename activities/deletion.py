@@ -0,0 +1,169 @@
+from logging import getLogger
+from threading import Lock
+from threading import Thread
+from threading import current_thread
+
+from django.conf import settings
+from django.db import connections
+from django.db import router
+from django.db import transaction
+
+from . import get_activity_model
+
+
+logger = getLogger(__name__)
+
+
+def get_deferred_delete_mode():
+    """Gets how activities are deleted when their "about" object is deleted.
+    This is controlled by the ``ACTIVITIES_DEFERRED_DELETE`` setting:
+
+    * None (default): the activities are deleted immediately.
+    * "local": the activities are tombstoned immediately and purged by a
+        background thread in the current process once the transaction
+        commits.  Django < 1.9 can't wait for the commit so activities
+        tombstoned inside a transaction are purged immediately instead.
+    * "command": the activities are tombstoned immediately and purged by the
+        ``purge_deleted_activities`` management command.
+    """
+    return getattr(settings, 'ACTIVITIES_DEFERRED_DELETE', None)
+
+
+def delete_activities_about_object(about):
+    """Deletes (or tombstones, see ``get_deferred_delete_mode``) all the
+    activities about an object.
+
+    :param about: the "about" object that was deleted.
+    """
+    Activity = get_activity_model()
+    mode = get_deferred_delete_mode()
+
+    if not mode:
+        return Activity.objects.delete_all_about_object(about=about)
+
+    num_tombstoned = Activity.objects.tombstone_all_about_object(about=about)
+
+    if num_tombstoned and mode == 'local':
+        using = router.db_for_write(Activity)
+
+        if hasattr(transaction, 'on_commit'):
+            transaction.on_commit(local_purge_worker.start, using=using)
+        elif transaction.get_connection(using=using).in_atomic_block:
+            # django < 1.9.  The purge thread wouldn't see the tombstoned
+            # activities until the transaction commits so purge them now.
+            purge_deleted_activities(
+                batch_size=local_purge_worker.get_batch_size()
+            )
+        else:
+            # django < 1.9.  The tombstones are already committed.
+            local_purge_worker.start()
+
+    return num_tombstoned
+
+
+def purge_deleted_activities(batch_size=1000, max_batches=None):
+    """Deletes the tombstoned activities in batches, each in its own short
+    transaction, with ``ActivityManager.fast_delete``.
+
+    :param batch_size: the max number of activities to delete per batch.
+    :param max_batches: (optional) the max number of batches to delete.  If
+        None, batches are deleted until there are no tombstoned activities
+        left.
+    :return: the number of activities deleted.
+    """
+    Activity = get_activity_model()
+    queryset = Activity._base_manager.filter(is_deleted=True)
+    num_deleted = 0
+    num_batches = 0
+
+    while max_batches is None or num_batches < max_batches:
+        activity_ids = list(queryset.order_by().values_list(
+            'id', flat=True
+        )[:batch_size])
+
+        if not activity_ids:
+            break
+
+        num_deleted += Activity.objects.fast_delete(
+            queryset=Activity._base_manager.filter(id__in=activity_ids),
+            batch_size=batch_size
+        )
+        num_batches += 1
+
+    return num_deleted
+
+
+class LocalPurgeWorker(object):
+    """Purges the tombstoned activities in a background thread of the
+    current process.  Only one thread runs at a time.  If a purge is
+    requested while the thread is running, the thread purges again before
+    exiting so no tombstoned activities are left behind.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size
+        self._lock = Lock()
+        self._thread = None
+        self._is_pending = False
+
+    def get_batch_size(self):
+        """Gets the max number of activities to delete per batch.  Defaults
+        to the ``ACTIVITIES_DEFERRED_DELETE_BATCH_SIZE`` setting.
+        """
+        return self.batch_size or getattr(
+            settings, 'ACTIVITIES_DEFERRED_DELETE_BATCH_SIZE', 1000
+        )
+
+    def start(self):
+        """Starts the purge thread if it's not already running."""
+        with self._lock:
+            self._is_pending = True
+
+            if self._thread is not None:
+                return
+
+            self._thread = Thread(target=self.run,
+                                  name='activities-purge-worker')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def run(self):
+        """Purges the tombstoned activities until no more purges are
+        pending.
+        """
+        batch_size = self.get_batch_size()
+
+        try:
+            while True:
+                with self._lock:
+                    if not self._is_pending:
+                        # checked and cleared together so a purge requested
+                        # while the thread is exiting starts a new thread.
+                        self._thread = None
+                        return
+
+                    self._is_pending = False
+
+                num_deleted = purge_deleted_activities(batch_size=batch_size)
+                logger.info('Purged {0} deleted activities.'.format(
+                    num_deleted
+                ))
+        except Exception:
+            logger.exception('Failed to purge the deleted activities.')
+
+            with self._lock:
+                self._thread = None
+        finally:
+            # the thread has its own database connections
+            for connection in connections.all():
+                connection.close()
+
+    def join(self, timeout=None):
+        """Waits for the purge thread to finish."""
+        thread = self._thread
+
+        if thread is not None and thread is not current_thread():
+            thread.join(timeout)
+
+
+local_purge_worker = LocalPurgeWorker()
@@ -0,0 +1,143 @@
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from .cache import CacheStats
+from .instrumentation import get_current_instrumentation
+from .prefetch import get_about_model_spec
+
+
+# hit and miss counts for the activity fragment cache in this process.
+fragment_cache_stats = CacheStats()
+
+
+def is_fragment_cache_enabled():
+    """Boolean indicating if the rendered activity fragments should be
+    cached.  This is controlled by the ``ACTIVITIES_FRAGMENT_CACHE_ENABLED``
+    setting and defaults to False.
+    """
+    return getattr(settings, 'ACTIVITIES_FRAGMENT_CACHE_ENABLED', False)
+
+
+def get_fragment_cache():
+    """Gets the django cache the fragments are stored in.  This is the cache
+    alias in the ``ACTIVITIES_FRAGMENT_CACHE`` setting (default "default").
+    """
+    return caches[getattr(settings, 'ACTIVITIES_FRAGMENT_CACHE', 'default')]
+
+
+def get_fragment_cache_key(activity):
+    """Gets the cache key for the rendered fragments of an activity.  Editing
+    the activity or adding or removing a reply changes the key.
+
+    :param activity: the activity to get the fragment cache key for.
+    """
+    return 'activities:fragment:{0}:{1}:{2}:{3}'.format(
+        activity.id,
+        activity.last_modified_dttm.strftime('%Y%m%d%H%M%S%f'),
+        activity.reply_count,
+        get_language()
+    )
+
+
+def get_about_model(activity):
+    """Gets the model class of the activity's "about" object or None."""
+    if not activity.about_content_type_id:
+        return None
+
+    return ContentType.objects.get_for_id(
+        activity.about_content_type_id
+    ).model_class()
+
+
+def is_activity_cacheable(activity):
+    """Boolean indicating if the activity's rendered fragments can be cached.
+    Activities about models registered with ``cache_fragments=False`` (i.e.
+    models whose activity html depends on the user viewing it) are never
+    cached.
+    """
+    model = get_about_model(activity)
+    return model is None or get_about_model_spec(model)['cache_fragments']
+
+
+def is_header_cacheable(activity):
+    """Boolean indicating if the activity header is the same for every
+    viewer.  "About" models that implement ``get_activity_action_html`` are
+    passed the viewing user so their header is rendered per request.
+    """
+    return not hasattr(get_about_model(activity), 'get_activity_action_html')
+
+
+def is_message_cacheable(activity):
+    """Boolean indicating if the activity message is the same for every
+    viewer.  Messages without text are rendered by ``Activity.get_html``
+    which passes the viewing user and the objects they've shared to the
+    "about" object so they're rendered per request.
+    """
+    return bool(activity.text)
+
+
+def get_activity_fragments(activity, user_cache=None):
+    """Gets the viewer independent rendered html fragments for an activity
+    from the fragment cache, rendering and caching them if they're not
+    cached yet.  Only the fragments that don't depend on the viewing user
+    are cached (see ``is_header_cacheable`` and ``is_message_cacheable``).
+    The rest of the activity (edit/delete actions, reply form, etc) and the
+    fragments that can't be cached must be rendered for each viewer.
+
+    :param activity: the activity to get the fragments for.
+    :param user_cache: (optional) a dict of users keyed by their user id.
+    :return: dict with the "header" and "message" html (None for the
+        fragments that can't be cached) or None if the fragment cache isn't
+        enabled or the activity can't be cached.
+    """
+    if not is_fragment_cache_enabled() or not is_activity_cacheable(activity):
+        return None
+
+    is_header_cached = is_header_cacheable(activity)
+    is_message_cached = is_message_cacheable(activity)
+
+    if not is_header_cached and not is_message_cached:
+        return None
+
+    # avoid circular import
+    from .templatetags.activity_tags import render_activity_message
+
+    cache = get_fragment_cache()
+    cache_key = get_fragment_cache_key(activity)
+    fragments = cache.get(cache_key)
+    instrumentation = get_current_instrumentation()
+
+    if fragments is None:
+        fragment_cache_stats.record_miss()
+
+        if instrumentation is not None:
+            instrumentation.record_miss()
+
+        fragments = {'header': None, 'message': None}
+
+        if is_header_cached:
+            fragments['header'] = render_to_string(
+                'activities/snippets/activity_header.html',
+                context={'activity': activity, 'user_cache': user_cache}
+            ).strip()
+
+        if is_message_cached:
+            fragments['message'] = '{0}'.format(render_activity_message(
+                activity=activity
+            ))
+
+        cache.set(cache_key, fragments,
+                  getattr(settings, 'ACTIVITIES_FRAGMENT_CACHE_TIMEOUT',
+                          3600))
+    else:
+        fragment_cache_stats.record_hit()
+
+        if instrumentation is not None:
+            instrumentation.record_hit()
+
+    return dict((name, mark_safe(html) if html is not None else None)
+                for name, html in fragments.items())
@@ -0,0 +1,93 @@
+from time import time
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+
+
+def is_generations_enabled():
+    """Boolean indicating if the feed generation counters should be
+    maintained.  This is controlled by the ``ACTIVITIES_GENERATIONS_ENABLED``
+    setting and defaults to False.
+    """
+    return getattr(settings, 'ACTIVITIES_GENERATIONS_ENABLED', False)
+
+
+def get_generation_cache():
+    """Gets the django cache the generation counters are stored in.  This is
+    the cache alias in the ``ACTIVITIES_GENERATION_CACHE`` setting (default
+    "default").
+    """
+    return caches[getattr(settings, 'ACTIVITIES_GENERATION_CACHE', 'default')]
+
+
+def get_generation_cache_key(key):
+    """Gets the cache key for an object's generation counter.
+
+    :param key: ``(content_type_id, object_id)`` tuple for the object.
+    """
+    return 'activities:generation:{0}:{1}'.format(*key)
+
+
+def get_object_generation_key(obj):
+    """Gets the ``(content_type_id, object_id)`` generation key for an
+    object.
+    """
+    content_type = ContentType.objects.get_for_model(obj)
+    return content_type.id, obj.id
+
+
+def _get_initial_generation():
+    # counters that were evicted from the cache start again from the current
+    # time so they can't reuse a generation an old feed page was cached with.
+    return int(time() * 1000000)
+
+
+def get_generations(keys):
+    """Gets the current generation of each object.  An object's generation
+    changes any time an activity it's a recipient of (or the "about" object
+    of) is created, edited, replied to or deleted.
+
+    :param keys: iterable of ``(content_type_id, object_id)`` tuples.
+    :return: dict of the generations keyed by the keys passed in.
+    """
+    cache = get_generation_cache()
+    cache_keys = dict((get_generation_cache_key(key), key) for key in keys)
+    cached = cache.get_many(list(cache_keys.keys()))
+    generations = {}
+
+    for cache_key, key in cache_keys.items():
+        generation = cached.get(cache_key)
+
+        if generation is None:
+            generation = _get_initial_generation()
+
+            if not cache.add(cache_key, generation, None):
+                # another process set the generation first
+                generation = cache.get(cache_key, generation)
+
+        generations[key] = generation
+
+    return generations
+
+
+def bump_generations(keys):
+    """Bumps the generation of each object so any feed page cached with the
+    previous generation is no longer used.  This is one cache write per
+    object and never needs to scan cache keys.
+
+    :param keys: iterable of ``(content_type_id, object_id)`` tuples.
+    """
+    if not is_generations_enabled():
+        return
+
+    cache = get_generation_cache()
+
+    for key in set(keys):
+        cache_key = get_generation_cache_key(key)
+
+        try:
+            cache.incr(cache_key)
+        except ValueError:
+            # the counter doesn't exist yet or was evicted
+            cache.set(cache_key, _get_initial_generation(), None)
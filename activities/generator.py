@@ -0,0 +1,329 @@
+from datetime import datetime
+from datetime import timedelta
+from random import Random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+
+from . import get_activity_model
+from .constants import Action
+from .constants import Privacy
+from .constants import Source
+
+
+DEFAULT_ACTION_MIX = {
+    Action.COMMENTED: 0.4,
+    Action.CREATED: 0.2,
+    Action.UPDATED: 0.25,
+    Action.SHARED: 0.1,
+    Action.UPLOADED: 0.05,
+}
+DEFAULT_SOURCE_MIX = {
+    Source.SYSTEM: 0.5,
+    Source.USER: 0.5,
+}
+DEFAULT_PRIVACY_MIX = {
+    Privacy.PUBLIC: 0.6,
+    Privacy.PRIVATE: 0.3,
+    Privacy.CUSTOM: 0.1,
+}
+
+
+def parse_mix(value, enum=None):
+    """Parses a "KEY=weight,KEY=weight" string into a dict of weights.
+
+    >>> parse_mix('COMMENTED=0.7,UPDATED=0.3', enum=Action)
+    {'COMMENTED': 0.7, 'UPDATED': 0.3}
+
+    :param value: the mix string.
+    :param enum: (optional) the enum class (i.e. ``Action``) the keys must be
+        values of.
+    :raises ValueError: if the string can't be parsed or a key isn't a value
+        of the enum.
+    """
+    mix = {}
+
+    for item in value.split(','):
+        key, weight = item.split('=')
+        key = key.strip().upper()
+
+        if enum is not None and enum.check(key) is None:
+            raise ValueError('"{0}" is not a valid {1}'.format(
+                key,
+                enum.__name__.lower()
+            ))
+
+        mix[key] = float(weight)
+
+    return mix
+
+
+class ActivityGenerator(object):
+    """Generates production shaped activity data: users, activities about
+    objects of several content types, recipients, replies and shares.
+
+    Activity creators, recipient fan-out and replies follow power-law
+    distributions so a few users and activities get most of the traffic.
+    Everything is drawn from a seeded random number generator so runs with
+    the same seed and options generate the same data.  Activities are
+    written with ``ActivityManager.bulk_create_activities`` in batches.
+
+    >>> generator = ActivityGenerator(num_users=1000, seed=1)
+    >>> generator.generate(num_activities=100000)
+    """
+
+    def __init__(self, num_users=1000, about_content_types=None,
+                 num_abouts=1000, action_mix=None, source_mix=None,
+                 privacy_mix=None, fan_out_alpha=1.5, max_fan_out=500,
+                 reply_alpha=2.0, max_replies=50, days=365, seed=0,
+                 batch_size=1000, now=None):
+        """
+        :param num_users: the number of users to create activities for.
+            Users are reused by later runs with the same seed.
+        :param about_content_types: (optional) list of "app_label.model"
+            content types.  The "about" objects are the first ``num_abouts``
+            existing objects of each.  If None, the activities are about the
+            generated users.
+        :param num_abouts: the max number of "about" objects per content type.
+        :param action_mix: dict of the action weights.
+        :param source_mix: dict of the source weights.
+        :param privacy_mix: dict of the privacy weights.
+        :param fan_out_alpha: the pareto shape of the number of recipients per
+            activity.  Smaller is a longer tail.
+        :param max_fan_out: the max number of recipients per activity.
+        :param reply_alpha: the pareto shape of the number of replies per
+            activity.
+        :param max_replies: the max number of replies per activity.
+        :param days: activities are spread over this many days before now.
+        :param seed: the random seed.
+        :param batch_size: the number of activities written per batch.
+        :param now: (optional) the datetime the activities are created
+            before.  Defaults to utcnow.  Pass the same datetime to generate
+            the same data on every run.
+        """
+        self.num_users = num_users
+        self.about_content_types = about_content_types
+        self.num_abouts = num_abouts
+        self.action_mix = action_mix or DEFAULT_ACTION_MIX
+        self.source_mix = source_mix or DEFAULT_SOURCE_MIX
+        self.privacy_mix = privacy_mix or DEFAULT_PRIVACY_MIX
+        self.fan_out_alpha = fan_out_alpha
+        self.max_fan_out = max_fan_out
+        self.reply_alpha = reply_alpha
+        self.max_replies = max_replies
+        self.days = days
+        self.seed = seed
+        self.batch_size = batch_size
+        self.now = now or datetime.utcnow()
+        self.random = Random(seed)
+
+    def choose_weighted(self, mix):
+        """Chooses a key from a dict of weights."""
+        # sorted so the choice doesn't depend on the dict order
+        items = sorted(mix.items())
+        value = self.random.random() * sum(weight for key, weight in items)
+
+        for key, weight in items:
+            value -= weight
+
+            if value < 0:
+                return key
+
+        return items[-1][0]
+
+    def choose_skewed(self, population):
+        """Chooses from a population with the first items chosen the most,
+        i.e. a few power users create most of the activities.
+        """
+        return population[int(len(population) * self.random.random() ** 3)]
+
+    def get_power_law_count(self, alpha, max_count):
+        """Gets a pareto distributed count from 0 to ``max_count``."""
+        return min(max_count, int(self.random.paretovariate(alpha)) - 1)
+
+    def get_users(self):
+        """Gets or bulk creates the generated users.
+
+        :return: list of the users (only the primary key is loaded).
+        """
+        User = get_user_model()
+        prefix = 'activities-generated-{0}-'.format(self.seed)
+        username_field = User.USERNAME_FIELD
+        existing = set(User._default_manager.filter(**{
+            '{0}__startswith'.format(username_field): prefix
+        }).values_list(username_field, flat=True))
+        password = make_password(None)
+        new_users = []
+
+        for i in range(self.num_users):
+            username = '{0}{1}'.format(prefix, i)
+
+            if username not in existing:
+                new_users.append(User(password=password,
+                                      **{username_field: username}))
+
+        for i in range(0, len(new_users), self.batch_size):
+            User._default_manager.bulk_create(new_users[i:i + self.batch_size])
+
+        user_ids = User._default_manager.filter(**{
+            '{0}__startswith'.format(username_field): prefix
+        }).order_by('id').values_list('id', flat=True)[:self.num_users]
+        return [User(id=user_id) for user_id in user_ids]
+
+    def get_about_model_classes(self):
+        """Gets the model classes of the ``about_content_types``.
+
+        :raises ValueError: if a content type doesn't exist.
+        """
+        model_classes = []
+
+        for content_type in self.about_content_types or []:
+            try:
+                app_label, model = content_type.lower().split('.')
+                model_class = ContentType.objects.get_by_natural_key(
+                    app_label, model
+                ).model_class()
+            except (ValueError, ContentType.DoesNotExist):
+                model_class = None
+
+            if model_class is None:
+                raise ValueError(
+                    '"{0}" is not an "app_label.model" content type.'.format(
+                        content_type
+                    )
+                )
+
+            model_classes.append(model_class)
+
+        return model_classes
+
+    def get_abouts(self, users):
+        """Gets the "about" objects of the activities.  Only the primary keys
+        are loaded.
+
+        :raises ValueError: if a content type doesn't exist or has no
+            objects.
+        """
+        if not self.about_content_types:
+            return users
+
+        abouts = []
+
+        for model_class in self.get_about_model_classes():
+            pks = list(model_class._default_manager.order_by('pk').values_list(
+                'pk', flat=True
+            )[:self.num_abouts])
+
+            if not pks:
+                raise ValueError('There are no {0}.{1} objects for the '
+                                 'activities to be about.'.format(
+                                     model_class._meta.app_label,
+                                     model_class._meta.model_name
+                                 ))
+
+            abouts.extend(model_class(pk=pk) for pk in pks)
+
+        return abouts
+
+    def get_activity_spec(self, users, abouts):
+        """Gets the ``bulk_create_activities`` spec for a random activity."""
+        created_user = self.choose_skewed(users)
+        action = self.choose_weighted(self.action_mix)
+        num_recipients = min(
+            len(users),
+            self.get_power_law_count(alpha=self.fan_out_alpha,
+                                     max_count=self.max_fan_out)
+        )
+        return {
+            'created_user': created_user,
+            'about': self.random.choice(abouts),
+            'text': 'Generated activity {0}'.format(
+                self.random.randint(0, 1000000)
+            ),
+            'action': action,
+            'source': (Source.USER if action == Action.SHARED
+                       else self.choose_weighted(self.source_mix)),
+            'privacy': self.choose_weighted(self.privacy_mix),
+            'created_dttm': self.now - timedelta(
+                seconds=self.random.randint(0, self.days * 86400)
+            ),
+            'ensure_for_objs': set([created_user] +
+                                   self.random.sample(users, num_recipients))
+        }
+
+    def create_replies(self, activities, users):
+        """Bulk creates the replies for a batch of activities.
+
+        :return: the number of replies created.
+        """
+        Activity = get_activity_model()
+        reply_model = Activity._meta.get_field('replies').related_model
+        replies = []
+
+        for activity in activities:
+            for i in range(self.get_power_law_count(
+                alpha=self.reply_alpha,
+                max_count=self.max_replies
+            )):
+                created_user = self.choose_skewed(users)
+                replies.append(reply_model(
+                    activity_id=activity.id,
+                    created_user_id=created_user.id,
+                    last_modified_user_id=created_user.id,
+                    text='Generated reply {0}'.format(i),
+                    created_dttm=min(self.now, activity.created_dttm +
+                                     timedelta(seconds=self.random.randint(
+                                         0, 86400
+                                     )))
+                ))
+
+        if replies:
+            reply_model._base_manager.bulk_create(replies)
+            # the reply counts are set in one pass instead of per reply.
+            Activity.objects.reconcile_reply_counts(
+                activity_ids=[activity.id for activity in activities]
+            )
+
+        return len(replies)
+
+    def generate(self, num_activities, progress_callback=None):
+        """Generates the activities.
+
+        :param num_activities: the number of activities to generate.  Shares
+            of an object that was already shared by the user are skipped so
+            slightly fewer activities can be created.
+        :param progress_callback: (optional) function called with the number
+            of activities created so far after each batch.
+        :return: dict of the "users", "activities" and "replies" counts.
+        :raises ValueError: if there are no users or "about" objects to
+            generate the activities for.
+        """
+        Activity = get_activity_model()
+        users = self.get_users()
+
+        if not users:
+            raise ValueError('At least one user is needed to generate '
+                             'activities.')
+
+        abouts = self.get_abouts(users=users)
+        num_created = 0
+        num_replies = 0
+
+        for i in range(0, num_activities, self.batch_size):
+            activities = Activity.objects.bulk_create_activities([
+                self.get_activity_spec(users=users, abouts=abouts)
+                for j in range(min(self.batch_size, num_activities - i))
+            ])
+            num_replies += self.create_replies(activities=activities,
+                                               users=users)
+            num_created += len(activities)
+
+            if progress_callback:
+                progress_callback(num_created)
+
+        return {
+            'users': len(users),
+            'activities': num_created,
+            'replies': num_replies,
+        }
@@ -0,0 +1,262 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import local
+from timeit import default_timer
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.utils import CursorWrapper
+from django.dispatch import Signal
+from django_core.utils.loading import get_function_from_settings
+
+from .cache import CacheStats
+
+
+# sent when an instrumented request finishes rendering
+activities_request_instrumented = Signal(providing_args=['request',
+                                                         'instrumentation'])
+
+_local = local()
+
+
+def is_instrumentation_enabled():
+    """Boolean indicating if the activity requests are instrumented.  This is
+    controlled by the ``ACTIVITIES_INSTRUMENTATION_ENABLED`` setting.
+    Instrumentation times every query of the request (the queries aren't
+    kept) which adds a little overhead to each query.
+    """
+    return getattr(settings, 'ACTIVITIES_INSTRUMENTATION_ENABLED', False)
+
+
+def is_server_timing_enabled():
+    """Boolean indicating if the phase timings are added to the response as a
+    ``Server-Timing`` header.  This is controlled by the
+    ``ACTIVITIES_SERVER_TIMING_ENABLED`` setting.
+    """
+    return getattr(settings, 'ACTIVITIES_SERVER_TIMING_ENABLED', False)
+
+
+def get_current_instrumentation():
+    """Gets the instrumentation of the request being handled by the current
+    thread or None.
+    """
+    return getattr(_local, 'instrumentation', None)
+
+
+class QueryTimingCursorWrapper(CursorWrapper):
+    """Cursor wrapper that reports how long each query took.  Unlike django's
+    debug cursor the queries themselves aren't kept.
+    """
+
+    def __init__(self, cursor, db, callback):
+        """
+        :param cursor: the cursor to wrap.
+        :param db: the database connection of the cursor.
+        :param callback: function called with the duration of each query in
+            seconds.
+        """
+        super(QueryTimingCursorWrapper, self).__init__(cursor, db)
+        self.callback = callback
+
+    def execute(self, sql, params=None):
+        start = default_timer()
+
+        try:
+            return super(QueryTimingCursorWrapper, self).execute(sql, params)
+        finally:
+            self.callback(default_timer() - start)
+
+    def executemany(self, sql, param_list):
+        start = default_timer()
+
+        try:
+            return super(QueryTimingCursorWrapper, self).executemany(
+                sql,
+                param_list
+            )
+        finally:
+            self.callback(default_timer() - start)
+
+
+@contextmanager
+def time_queries(callback):
+    """Calls the callback with the duration (in seconds) of every query run
+    on the current thread's database connections while in the context.  The
+    connections' cursor factories are wrapped so this works whether or not
+    the connections are logging their queries (i.e. ``DEBUG``).
+
+    :param callback: function called with the duration of each query.
+    """
+    wrapped = []
+
+    for connection in connections.all():
+        for name in ('make_cursor', 'make_debug_cursor'):
+            # set when already wrapped by an outer context
+            original = connection.__dict__.get(name)
+            setattr(connection, name, _get_timing_cursor_factory(
+                make_cursor=getattr(connection, name),
+                connection=connection,
+                callback=callback
+            ))
+            wrapped.append((connection, name, original))
+
+    try:
+        yield
+    finally:
+        for connection, name, original in reversed(wrapped):
+            if original is None:
+                delattr(connection, name)
+            else:
+                setattr(connection, name, original)
+
+
+def _get_timing_cursor_factory(make_cursor, connection, callback):
+    """Gets a cursor factory that wraps the cursors of ``make_cursor`` in a
+    ``QueryTimingCursorWrapper``.
+    """
+    def make_timing_cursor(cursor):
+        return QueryTimingCursorWrapper(cursor=make_cursor(cursor),
+                                        db=connection,
+                                        callback=callback)
+
+    return make_timing_cursor
+
+
+class RequestInstrumentation(CacheStats):
+    """Records the wall time, query count and query time of each phase of an
+    activity request along with the fragment cache hits and misses.
+
+    >>> instrumentation = RequestInstrumentation()
+    >>> with instrumentation.phase('page'):
+    ...     list(page.object_list)
+    >>> instrumentation.get_stats()
+    """
+
+    def __init__(self):
+        super(RequestInstrumentation, self).__init__()
+        self.phases = OrderedDict()
+
+    @contextmanager
+    def phase(self, name):
+        """Records a phase.  Recording the same phase again adds to it.  The
+        queries of all the database connections are counted.
+        """
+        phase = self.phases.setdefault(name, {'duration_ms': 0.0,
+                                              'queries': 0,
+                                              'query_ms': 0.0})
+
+        def record_query(duration):
+            phase['queries'] += 1
+            phase['query_ms'] += duration * 1000
+
+        start = default_timer()
+
+        try:
+            with time_queries(callback=record_query):
+                yield
+        finally:
+            phase['duration_ms'] += (default_timer() - start) * 1000
+
+    def get_stats(self):
+        """Gets the dict of the "phases" and the "fragment_cache" stats."""
+        return {
+            'phases': self.phases,
+            'fragment_cache': super(RequestInstrumentation, self).get_stats(),
+        }
+
+    def get_server_timing(self):
+        """Gets the ``Server-Timing`` header value of the phases."""
+        return ', '.join(
+            'activities-{0};dur={1:.1f};desc="{2} queries"'.format(
+                name,
+                phase['duration_ms'],
+                phase['queries']
+            )
+            for name, phase in self.phases.items()
+        )
+
+
+def start_request_instrumentation(request):
+    """Starts instrumenting a request if the instrumentation is enabled.
+
+    :return: the ``RequestInstrumentation`` or None.
+    """
+    # never pick up the instrumentation of a request that failed to render
+    clear_request_instrumentation()
+
+    if not is_instrumentation_enabled():
+        return None
+
+    instrumentation = RequestInstrumentation()
+    request.activities_instrumentation = instrumentation
+    _local.instrumentation = instrumentation
+    return instrumentation
+
+
+def clear_request_instrumentation():
+    """Stops instrumenting the request being handled by the current thread
+    without reporting it.
+    """
+    _local.instrumentation = None
+
+
+def finish_request_instrumentation(request, response, sender=None):
+    """Reports the instrumentation of a request once the response is rendered.
+    The instrumentation is sent with the ``activities_request_instrumented``
+    signal, passed to the ``ACTIVITIES_INSTRUMENTATION_CALLBACK`` (dotted path
+    to a function called with the request and the instrumentation) and
+    optionally added to the response as a ``Server-Timing`` header.
+
+    :return: the response.
+    """
+    instrumentation = getattr(request, 'activities_instrumentation', None)
+
+    if instrumentation is None:
+        return response
+
+    def report(response):
+        clear_request_instrumentation()
+        activities_request_instrumented.send(sender=sender,
+                                             request=request,
+                                             instrumentation=instrumentation)
+        callback = get_function_from_settings(
+            'ACTIVITIES_INSTRUMENTATION_CALLBACK'
+        )
+
+        if callback:
+            callback(request=request, instrumentation=instrumentation)
+
+        if is_server_timing_enabled() and instrumentation.phases:
+            response['Server-Timing'] = instrumentation.get_server_timing()
+
+        return response
+
+    if (hasattr(response, 'add_post_render_callback') and
+            not response.is_rendered):
+        # the render phase is recorded while the template response renders
+        response.add_post_render_callback(report)
+        return response
+
+    return report(response)
+
+
+@contextmanager
+def instrument_phase(name, request=None):
+    """Records a phase of the current (or given) request when the request is
+    instrumented.  Does nothing otherwise.
+
+    :param name: the name of the phase.
+    :param request: (optional) the request.  Defaults to the request being
+        instrumented by the current thread.
+    """
+    if request is not None:
+        instrumentation = getattr(request, 'activities_instrumentation', None)
+    else:
+        instrumentation = get_current_instrumentation()
+
+    if instrumentation is None:
+        yield
+        return
+
+    with instrumentation.phase(name):
+        yield
@@ -0,0 +1,85 @@
+from datetime import datetime
+from datetime import timedelta
+from logging import getLogger
+
+from activities.archive import ActivityArchiver
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.utils.dateparse import parse_datetime
+
+
+logger = getLogger(__name__)
+
+class Command(BaseCommand):
+    help = ("Moves the activities created before a cutoff, with their replies "
+            "and recipients, into monthly gzip compressed JSON Lines files and "
+            "deletes them from the database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory',
+                            dest='directory',
+                            required=True,
+                            help='The directory to write the archive files to.')
+        parser.add_argument('--days',
+                            dest='days',
+                            default=None,
+                            type=int,
+                            help=('Archive the activities older than this '
+                                  'number of days.'))
+        parser.add_argument('--before',
+                            dest='before',
+                            default=None,
+                            help=('Archive the activities created before this '
+                                  'ISO 8601 datetime.'))
+        parser.add_argument('--batch_size',
+                            dest='batch_size',
+                            default=1000,
+                            type=int,
+                            help=('The number of activities to archive per '
+                                  'batch.'))
+        parser.add_argument('-d', '--dry_run',
+                            dest='dry_run',
+                            default=False,
+                            type=bool,
+                            help=('boolean indicating if the activities should '
+                                  'actually be archived or if only the number '
+                                  'of activities should be reported.'))
+
+    def handle(self, directory=None, days=None, before=None, batch_size=1000,
+               dry_run=False, *args, **options):
+        """
+        :param directory: the directory to write the archive files to.
+        :param days: archive the activities older than this number of days.
+        :param before: ISO 8601 datetime string.  Archive the activities
+            created before this.
+        :param batch_size: the number of activities to archive per batch.
+        :param dry_run: boolean indicating if the activities should actually
+            be archived or if the function out just wants to be seen.
+        """
+        start = datetime.utcnow()
+
+        if before is not None:
+            cutoff = parse_datetime(before)
+
+            if cutoff is None:
+                raise CommandError('"{0}" is not a valid datetime.'.format(
+                    before
+                ))
+        elif days is not None:
+            cutoff = start - timedelta(days=days)
+        else:
+            raise CommandError('Either "--days" or "--before" is required.')
+
+        if dry_run == True:
+            logger.info('"dry_run" has been set to true. No activities will '
+                        'be archived.')
+
+        archiver = ActivityArchiver(directory=directory, batch_size=batch_size)
+        num_archived = archiver.archive(cutoff=cutoff, is_dry_run=dry_run)
+        end = datetime.utcnow()
+        total_seconds = (end - start).seconds
+        logger.info('{0} {1} activities created before {2} in {3} '
+                    'seconds!'.format('Found' if dry_run else 'Archived',
+                                      num_archived,
+                                      cutoff,
+                                      total_seconds))
@@ -0,0 +1,68 @@
+from datetime import datetime
+from logging import getLogger
+
+from activities import get_activity_model
+from activities.models import ActivityFeedEntry
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.aggregates import Max
+from django.db.models.aggregates import Min
+
+
+logger = getLogger(__name__)
+
+class Command(BaseCommand):
+    help = ("Backfills the materialized activity feed entries from the "
+            "existing activity for_objs data.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk_size',
+                            dest='chunk_size',
+                            default=10000,
+                            type=int,
+                            help=('The number of activity ids to backfill '
+                                  'per transaction.'))
+        parser.add_argument('--start_id',
+                            dest='start_id',
+                            default=None,
+                            type=int,
+                            help=('The activity id to start the backfill '
+                                  'from. If None, this will start from the '
+                                  'first activity.'))
+
+    def handle(self, chunk_size=10000, start_id=None, *args, **options):
+        """
+        :param chunk_size: the number of activity ids to process per
+            transaction.
+        :param start_id: the activity id to start the backfill from.
+        """
+        start = datetime.utcnow()
+        Activity = get_activity_model()
+        id_range = Activity.objects.aggregate(min_id=Min('id'),
+                                              max_id=Max('id'))
+
+        if id_range['min_id'] is None:
+            logger.info('No activities found to backfill.')
+            return
+
+        activity_id = max(start_id or id_range['min_id'], id_range['min_id'])
+        total_entries = 0
+
+        while activity_id <= id_range['max_id']:
+            with transaction.atomic():
+                num_entries = ActivityFeedEntry.objects.backfill(
+                    activity_id_start=activity_id,
+                    activity_id_end=activity_id + chunk_size
+                )
+
+            total_entries += num_entries
+            logger.info('Backfilled {0} feed entries for activity ids {1} to '
+                        '{2}.'.format(num_entries,
+                                      activity_id,
+                                      activity_id + chunk_size - 1))
+            activity_id += chunk_size
+
+        end = datetime.utcnow()
+        total_seconds = (end - start).seconds
+        logger.info('Backfilled {0} activity feed entries in {1} '
+                    'seconds!'.format(total_entries, total_seconds))
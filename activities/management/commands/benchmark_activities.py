@@ -0,0 +1,108 @@
+import json
+from datetime import datetime
+from logging import getLogger
+
+from activities.benchmarks import ActivityBenchmarks
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+
+logger = getLogger(__name__)
+
+class Command(BaseCommand):
+    help = ("Benchmarks creating activities, reading feeds and rendering "
+            "activities over generated datasets of increasing size.  Run it "
+            "with the settings of the database to benchmark (i.e. SQLite or "
+            "a local PostgreSQL).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes',
+                            nargs='+',
+                            dest='sizes',
+                            default=[1000, 10000],
+                            type=int,
+                            help=('Space separated list of the number of '
+                                  'activities in the datasets.'))
+        parser.add_argument('--benchmarks',
+                            nargs='+',
+                            dest='benchmarks',
+                            default=None,
+                            choices=ActivityBenchmarks.benchmark_names,
+                            help=('The benchmarks to run. If None, all '
+                                  'benchmarks are run.'))
+        parser.add_argument('--iterations',
+                            dest='iterations',
+                            default=50,
+                            type=int,
+                            help='The number of timed calls per benchmark.')
+        parser.add_argument('--page_size',
+                            dest='page_size',
+                            default=15,
+                            type=int,
+                            help='The number of activities per feed page.')
+        parser.add_argument('--num_users',
+                            dest='num_users',
+                            default=1000,
+                            type=int,
+                            help='The number of users in the datasets.')
+        parser.add_argument('--seed',
+                            dest='seed',
+                            default=0,
+                            type=int,
+                            help='The random seed of the datasets.')
+        parser.add_argument('--output',
+                            dest='output',
+                            default=None,
+                            help=('The path of the json results file. If '
+                                  'None, the results are written to stdout.'))
+        parser.add_argument('--keep_data',
+                            dest='keep_data',
+                            default=False,
+                            type=bool,
+                            help=('boolean indicating if the generated '
+                                  'datasets should be kept in the database.'))
+
+    def handle(self, sizes=None, benchmarks=None, iterations=50, page_size=15,
+               num_users=1000, seed=0, output=None, keep_data=False, *args,
+               **options):
+        """
+        See the command arguments for the param definitions.
+        """
+        if iterations < 1:
+            raise CommandError('"iterations" must be at least 1.')
+
+        start = datetime.utcnow()
+
+        def log_progress(results):
+            for result in results:
+                if 'error' in result:
+                    logger.info('{size} {name}: {error}'.format(**result))
+                else:
+                    logger.info('{size} {name}: {ops_per_second:.1f} ops/s, '
+                                'p50 {p50_ms:.2f}ms, p95 {p95_ms:.2f}ms, '
+                                '{queries_per_op:.1f} queries/op'.format(
+                                    **result
+                                ))
+
+        results = ActivityBenchmarks(
+            sizes=sizes or [1000, 10000],
+            iterations=iterations,
+            page_size=page_size,
+            num_users=num_users,
+            seed=seed,
+            benchmark_names=benchmarks,
+            keep_data=keep_data
+        ).run(progress_callback=log_progress)
+        results_json = json.dumps(results, indent=2, sort_keys=True)
+
+        if output:
+            with open(output, 'w') as output_file:
+                output_file.write(results_json)
+        else:
+            self.stdout.write(results_json)
+
+        end = datetime.utcnow()
+        total_seconds = (end - start).seconds
+        logger.info('Ran the activity benchmarks in {0} seconds!'.format(
+            total_seconds
+        ))
@@ -19,22 +19,71 @@ class Command(BaseCommand):
                             help=('boolean indicating if the images should '
                                   'actually be processed or if the function '
                                   'out just wants to be seen.'))
+        parser.add_argument('--chunk_size',
+                            dest='chunk_size',
+                            default=100000,
+                            type=int,
+                            help=('The number of distinct "about" ids to '
+                                  'check for each range.'))
+        parser.add_argument('--batch_size',
+                            dest='batch_size',
+                            default=1000,
+                            type=int,
+                            help=('The max number of activities to delete '
+                                  'per transaction.'))
+        parser.add_argument('--workers',
+                            dest='workers',
+                            default=1,
+                            type=int,
+                            help=('The number of worker processes to clean '
+                                  'up the content types and id ranges in.'))
 
-    def handle(self, ids=None, dry_run=False, *args, **options):
+    def handle(self, ids=None, dry_run=False, chunk_size=100000,
+               batch_size=1000, workers=1, *args, **options):
         """
         :param dry_run: boolean indicating if the objects should actually be
             processed or if the function out just wants to be seen.
+        :param chunk_size: the number of distinct "about" ids per range.
+        :param batch_size: the max number of activities to delete per
+            transaction.
+        :param workers: the number of worker processes to use.
         """
         if dry_run == True:
             logging.info('"dry_run" has been set to true. No actual '
                          'objects will be deleted while issuing this '
                          'command.')
 
-        start = datetime.utcnow()
-        cleaner = ActivityCleaner()
-        cleaner.cleanup(is_dry_run=dry_run)
+        self.start = datetime.utcnow()
+        self.total_activities = 0
+        cleaner = ActivityCleaner(chunk_size=chunk_size,
+                                  batch_size=batch_size,
+                                  progress_callback=self.log_progress,
+                                  workers=workers)
+        cleaned_about_ids = cleaner.cleanup(is_dry_run=dry_run)
         end = datetime.utcnow()
-        total_seconds = (end - start).seconds
-        logging.info('Cleaned up activities in {0} seconds!'.format(
-            total_seconds)
-        )
+        total_seconds = (end - self.start).seconds
+        logging.info('Cleaned up {0} activities for {1} stale objects in {2} '
+                     'seconds!'.format(
+            self.total_activities,
+            sum(len(about_ids) for about_ids in cleaned_about_ids.values()),
+            total_seconds
+        ))
+
+    def log_progress(self, progress):
+        """Logs the cleanup progress after each range of "about" ids.
+
+        :param progress: the progress dict from the ``ActivityCleaner``.
+        """
+        self.total_activities += progress['num_activities']
+        total_seconds = (datetime.utcnow() - self.start).total_seconds()
+        logging.info('Checked "{0}" ids {1} to {2}: {3} stale objects, {4} '
+                     'activities ({5} total, {6:.0f} activities/second).'.format(
+            progress['model'],
+            progress['about_id_start'],
+            'end' if progress['about_id_end'] is None
+            else progress['about_id_end'] - 1,
+            progress['num_stale_about_ids'],
+            progress['num_activities'],
+            self.total_activities,
+            self.total_activities / total_seconds if total_seconds else 0
+        ))
@@ -0,0 +1,154 @@
+from datetime import datetime
+from logging import getLogger
+
+from activities.constants import Action
+from activities.constants import Privacy
+from activities.constants import Source
+from activities.generator import ActivityGenerator
+from activities.generator import parse_mix
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.utils.dateparse import parse_datetime
+
+
+logger = getLogger(__name__)
+
+class Command(BaseCommand):
+    help = ("Generates a synthetic, production shaped dataset of users, "
+            "activities, recipients, replies and shares.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--num_activities',
+                            dest='num_activities',
+                            default=10000,
+                            type=int,
+                            help='The number of activities to generate.')
+        parser.add_argument('--num_users',
+                            dest='num_users',
+                            default=1000,
+                            type=int,
+                            help='The number of users to generate.')
+        parser.add_argument('--about_content_types', '--about-content-types',
+                            nargs='+',
+                            dest='about_content_types',
+                            default=None,
+                            help=('Space separated list of "app_label.model" '
+                                  'content types whose existing objects the '
+                                  'activities are about. If None, the '
+                                  'activities are about the generated users.'))
+        parser.add_argument('--num_abouts',
+                            dest='num_abouts',
+                            default=1000,
+                            type=int,
+                            help=('The max number of "about" objects per '
+                                  'content type.'))
+        parser.add_argument('--actions',
+                            dest='actions',
+                            default=None,
+                            help=('The action mix, i.e. '
+                                  '"COMMENTED=0.7,UPDATED=0.2,SHARED=0.1".'))
+        parser.add_argument('--sources',
+                            dest='sources',
+                            default=None,
+                            help='The source mix, i.e. "SYSTEM=0.5,USER=0.5".')
+        parser.add_argument('--privacies',
+                            dest='privacies',
+                            default=None,
+                            help=('The privacy mix, i.e. '
+                                  '"PUBLIC=0.6,PRIVATE=0.3,CUSTOM=0.1".'))
+        parser.add_argument('--max_fan_out',
+                            dest='max_fan_out',
+                            default=500,
+                            type=int,
+                            help='The max number of recipients per activity.')
+        parser.add_argument('--max_replies',
+                            dest='max_replies',
+                            default=50,
+                            type=int,
+                            help='The max number of replies per activity.')
+        parser.add_argument('--days',
+                            dest='days',
+                            default=365,
+                            type=int,
+                            help=('The number of days the activities are '
+                                  'spread over.'))
+        parser.add_argument('--seed',
+                            dest='seed',
+                            default=0,
+                            type=int,
+                            help=('The random seed. Runs with the same '
+                                  'seed, --now and options generate the same '
+                                  'data.'))
+        parser.add_argument('--now',
+                            dest='now',
+                            default=None,
+                            help=('The UTC datetime the activities are '
+                                  'created before, i.e. '
+                                  '"2016-01-01T00:00:00". Defaults to the '
+                                  'current time.'))
+        parser.add_argument('--batch_size',
+                            dest='batch_size',
+                            default=1000,
+                            type=int,
+                            help=('The number of activities to insert per '
+                                  'batch.'))
+
+    def handle(self, num_activities=10000, num_users=1000,
+               about_content_types=None, num_abouts=1000, actions=None,
+               sources=None, privacies=None, max_fan_out=500, max_replies=50,
+               days=365, seed=0, batch_size=1000, now=None, *args,
+               **options):
+        """
+        See the command arguments for the param definitions.
+        """
+        try:
+            action_mix = (parse_mix(actions, enum=Action)
+                          if actions else None)
+            source_mix = (parse_mix(sources, enum=Source)
+                          if sources else None)
+            privacy_mix = (parse_mix(privacies, enum=Privacy)
+                           if privacies else None)
+        except ValueError as e:
+            raise CommandError('Invalid mix: {0}'.format(e))
+
+        if now:
+            try:
+                now = parse_datetime(now)
+            except ValueError:
+                now = None
+
+            if now is None:
+                raise CommandError('Invalid --now datetime.')
+
+        start = datetime.utcnow()
+        generator = ActivityGenerator(num_users=num_users,
+                                      about_content_types=about_content_types,
+                                      num_abouts=num_abouts,
+                                      action_mix=action_mix,
+                                      source_mix=source_mix,
+                                      privacy_mix=privacy_mix,
+                                      max_fan_out=max_fan_out,
+                                      max_replies=max_replies,
+                                      days=days,
+                                      seed=seed,
+                                      batch_size=batch_size,
+                                      now=now)
+
+        def log_progress(num_created):
+            logger.info('Generated {0} of {1} activities.'.format(
+                num_created,
+                num_activities
+            ))
+
+        try:
+            counts = generator.generate(num_activities=num_activities,
+                                        progress_callback=log_progress)
+        except ValueError as e:
+            raise CommandError(e)
+        end = datetime.utcnow()
+        total_seconds = (end - start).seconds
+        logger.info('Generated {0} activities and {1} replies for {2} users in '
+                    '{3} seconds!'.format(counts['activities'],
+                                          counts['replies'],
+                                          counts['users'],
+                                          total_seconds))
@@ -0,0 +1,119 @@
+from datetime import datetime
+from logging import getLogger
+
+from activities.partitions import create_partition
+from activities.partitions import detach_partition
+from activities.partitions import get_convert_sql
+from activities.partitions import get_month_start
+from activities.partitions import get_partition_months
+from activities.partitions import get_partitioned_models
+from activities.partitions import is_partitioned
+from django.core.management.base import BaseCommand
+
+
+logger = getLogger(__name__)
+
+class Command(BaseCommand):
+    help = ("Creates the upcoming monthly partitions of the partitioned "
+            "activity tables and detaches the expired ones.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months_ahead',
+                            dest='months_ahead',
+                            default=3,
+                            type=int,
+                            help=('The number of months after the current '
+                                  'month to create partitions for.'))
+        parser.add_argument('--retain_months',
+                            dest='retain_months',
+                            default=None,
+                            type=int,
+                            help=('Detach the partitions older than this '
+                                  'number of months. If None, no partitions '
+                                  'are detached.'))
+        parser.add_argument('--print_convert_sql',
+                            dest='print_convert_sql',
+                            default=False,
+                            type=bool,
+                            help=('Print the SQL to convert the existing '
+                                  'tables to partitioned tables instead of '
+                                  'managing the partitions.'))
+        parser.add_argument('-d', '--dry_run',
+                            dest='dry_run',
+                            default=False,
+                            type=bool,
+                            help=('boolean indicating if the partitions should '
+                                  'actually be created and detached or if the '
+                                  'function out just wants to be seen.'))
+
+    def handle(self, months_ahead=3, retain_months=None,
+               print_convert_sql=False, dry_run=False, *args, **options):
+        """
+        :param months_ahead: the number of months after the current month to
+            create partitions for.
+        :param retain_months: detach the partitions older than this number of
+            months.
+        :param print_convert_sql: boolean indicating if the SQL to convert the
+            tables should be printed.
+        :param dry_run: boolean indicating if the partitions should actually
+            be changed or if the function out just wants to be seen.
+        """
+        start = datetime.utcnow()
+        current_month = get_month_start(start)
+
+        if print_convert_sql:
+            for model in get_partitioned_models():
+                for statement in get_convert_sql(model=model,
+                                                 first_month_start=current_month):
+                    self.stdout.write(statement)
+
+            return
+
+        if dry_run == True:
+            logger.info('"dry_run" has been set to true. No partitions will '
+                        'be changed.')
+
+        for model in get_partitioned_models():
+            if not is_partitioned(model):
+                logger.info('The "{0}" table is not partitioned. '
+                            'Skipping.'.format(model._meta.db_table))
+                continue
+
+            existing_months = get_partition_months(model)
+
+            for months in range(months_ahead + 1):
+                month_start = get_month_start(current_month, months=months)
+
+                if month_start in existing_months:
+                    continue
+
+                if not dry_run:
+                    create_partition(model=model, month_start=month_start)
+
+                logger.info('Created the "{0}" partition for {1:%Y-%m}.'.format(
+                    model._meta.db_table,
+                    month_start
+                ))
+
+            if retain_months is None:
+                continue
+
+            expired_month = get_month_start(current_month,
+                                            months=-retain_months)
+
+            for month_start in existing_months:
+                if month_start >= expired_month:
+                    continue
+
+                if not dry_run:
+                    detach_partition(model=model, month_start=month_start)
+
+                logger.info('Detached the "{0}" partition for '
+                            '{1:%Y-%m}.'.format(model._meta.db_table,
+                                                month_start))
+
+        end = datetime.utcnow()
+        total_seconds = (end - start).seconds
+        logger.info('Managed the activity partitions in {0} seconds!'.format(
+            total_seconds
+        ))
@@ -0,0 +1,47 @@
+from datetime import datetime
+from logging import getLogger
+
+from activities.models import ActivityFor
+from django.core.management.base import BaseCommand
+
+
+logger = getLogger(__name__)
+
+class Command(BaseCommand):
+    help = ("Merges duplicate ActivityFor rows for the same object and "
+            "repoints their activities to the merged row.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('-d', '--dry_run',
+                            dest='dry_run',
+                            default=False,
+                            type=bool,
+                            help=('boolean indicating if the duplicates '
+                                  'should actually be merged or if the '
+                                  'function out just wants to be seen.'))
+
+    def handle(self, dry_run=False, *args, **options):
+        """
+        :param dry_run: boolean indicating if the objects should actually be
+            processed or if the function out just wants to be seen.
+        """
+        if dry_run == True:
+            logger.info('"dry_run" has been set to true. No actual '
+                        'updates will be made.')
+
+        start = datetime.utcnow()
+        merged_ids = ActivityFor.objects.merge_duplicates(is_dry_run=dry_run)
+
+        for keep_id, duplicate_ids in merged_ids.items():
+            logger.info('Merging ActivityFor ids {0} into {1}'.format(
+                duplicate_ids,
+                keep_id
+            ))
+
+        end = datetime.utcnow()
+        total_seconds = (end - start).seconds
+        logger.info('Merged {0} duplicate ActivityFor rows in {1} '
+                    'seconds!'.format(
+                        sum(len(ids) for ids in merged_ids.values()),
+                        total_seconds
+                    ))
@@ -0,0 +1,66 @@
+from datetime import datetime
+from logging import getLogger
+
+from activities.retention import get_retention_rules
+from activities.retention import prune_rule
+from django.core.management.base import BaseCommand
+
+
+logger = getLogger(__name__)
+
+class Command(BaseCommand):
+    help = ("Deletes the activities that have expired by the "
+            "ACTIVITIES_RETENTION_POLICY rules.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('-d', '--dry_run',
+                            dest='dry_run',
+                            default=False,
+                            type=bool,
+                            help=('boolean indicating if the activities should '
+                                  'actually be deleted or if only the number '
+                                  'of activities each rule would delete should '
+                                  'be reported.'))
+        parser.add_argument('--batch_size',
+                            dest='batch_size',
+                            default=1000,
+                            type=int,
+                            help=('The max number of activities to delete '
+                                  'per transaction.'))
+
+    def handle(self, dry_run=False, batch_size=1000, *args, **options):
+        """
+        :param dry_run: boolean indicating if the activities should actually
+            be deleted or if the function out just wants to be seen.
+        :param batch_size: the max number of activities to delete per
+            transaction.
+        """
+        if dry_run == True:
+            logger.info('"dry_run" has been set to true. No activities will '
+                        'be deleted.')
+
+        start = datetime.utcnow()
+        total_deleted = 0
+
+        rules = get_retention_rules()
+
+        for rule in rules:
+            num_deleted = prune_rule(rule=rule,
+                                     batch_size=batch_size,
+                                     is_dry_run=dry_run,
+                                     now=start,
+                                     rules=rules)
+            total_deleted += num_deleted
+            logger.info('{0} {1} activities for the rule: {2}'.format(
+                'Found' if dry_run else 'Deleted',
+                num_deleted,
+                rule
+            ))
+
+        end = datetime.utcnow()
+        total_seconds = (end - start).seconds
+        logger.info('{0} {1} expired activities in {2} seconds!'.format(
+            'Found' if dry_run else 'Pruned',
+            total_deleted,
+            total_seconds
+        ))
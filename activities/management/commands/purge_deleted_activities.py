@@ -0,0 +1,43 @@
+from datetime import datetime
+from logging import getLogger
+
+from activities.deletion import purge_deleted_activities
+from django.core.management.base import BaseCommand
+
+
+logger = getLogger(__name__)
+
+class Command(BaseCommand):
+    help = ("Purges the activities that were tombstoned when their \"about\" "
+            "object was deleted (see the ACTIVITIES_DEFERRED_DELETE setting).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch_size',
+                            dest='batch_size',
+                            default=1000,
+                            type=int,
+                            help=('The max number of activities to delete '
+                                  'per transaction.'))
+        parser.add_argument('--max_batches',
+                            dest='max_batches',
+                            default=None,
+                            type=int,
+                            help=('The max number of batches to delete. If '
+                                  'None, this will delete batches until there '
+                                  'are no tombstoned activities left.'))
+
+    def handle(self, batch_size=1000, max_batches=None, *args, **options):
+        """
+        :param batch_size: the max number of activities to delete per
+            transaction.
+        :param max_batches: the max number of batches to delete.
+        """
+        start = datetime.utcnow()
+        num_deleted = purge_deleted_activities(batch_size=batch_size,
+                                               max_batches=max_batches)
+        end = datetime.utcnow()
+        total_seconds = (end - start).seconds
+        logger.info('Purged {0} deleted activities in {1} seconds!'.format(
+            num_deleted,
+            total_seconds
+        ))
@@ -0,0 +1,48 @@
+from datetime import datetime
+from logging import getLogger
+
+from activities.archive import ActivityArchiver
+from django.core.management.base import BaseCommand
+
+
+logger = getLogger(__name__)
+
+class Command(BaseCommand):
+    help = ("Restores the activities from archive files written by the "
+            "archive_activities command.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths',
+                            nargs='+',
+                            help='The archive files to restore.')
+        parser.add_argument('--batch_size',
+                            dest='batch_size',
+                            default=1000,
+                            type=int,
+                            help=('The number of activities to restore per '
+                                  'transaction.'))
+
+    def handle(self, paths=None, batch_size=1000, *args, **options):
+        """
+        :param paths: the paths of the archive files to restore.
+        :param batch_size: the number of activities to restore per
+            transaction.
+        """
+        start = datetime.utcnow()
+        archiver = ActivityArchiver(batch_size=batch_size)
+        total_restored = 0
+
+        for path in paths:
+            num_restored = archiver.restore(path=path)
+            total_restored += num_restored
+            logger.info('Restored {0} activities from {1}.'.format(
+                num_restored,
+                path
+            ))
+
+        end = datetime.utcnow()
+        total_seconds = (end - start).seconds
+        logger.info('Restored {0} activities in {1} seconds!'.format(
+            total_restored,
+            total_seconds
+        ))
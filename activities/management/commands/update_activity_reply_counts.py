@@ -1,14 +1,29 @@
 from datetime import datetime
 from logging import getLogger
+from multiprocessing import Pool
 
-from activities.models import Activity
-from activities.models import ActivityReply
+from activities import get_activity_model
 from django.core.management.base import BaseCommand
-from django.db.models.aggregates import Count
+from django.db import connections
+from django.db.models.aggregates import Max
+from django.db.models.aggregates import Min
 
 
 logging = getLogger(__name__)
 
+
+def reconcile_reply_counts(kwargs):
+    """Reconciles the reply counts for a chunk of activities.  This is a
+    module level function so it can be run in the worker processes.
+
+    :param kwargs: the keyword args for
+        ``ActivityManager.reconcile_reply_counts``.
+    :return: tuple of the kwargs and the number of activities changed.
+    """
+    Activity = get_activity_model()
+    return kwargs, Activity.objects.reconcile_reply_counts(**kwargs)
+
+
 class Command(BaseCommand):
     help = "Updates activity reply counts for all activities."
 
@@ -29,55 +44,116 @@ class Command(BaseCommand):
                             help=('boolean indicating if the images should '
                                   'actually be processed or if the function '
                                   'out just wants to be seen.'))
+        parser.add_argument('--chunk_size',
+                            dest='chunk_size',
+                            default=10000,
+                            type=int,
+                            help=('The number of activity ids to reconcile '
+                                  'per update statement.'))
+        parser.add_argument('--workers',
+                            dest='workers',
+                            default=1,
+                            type=int,
+                            help=('The number of worker processes to '
+                                  'reconcile the activity id ranges in.'))
 
-    def handle(self, activity_ids=None, dry_run=False, *args, **options):
+    def handle(self, activity_ids=None, dry_run=False, chunk_size=10000,
+               workers=1, *args, **options):
         """
         :param activity_ids: list of activity id to update the reply counts for.
             If None, this will process all activities.
         :param dry_run: boolean indicating if the objects should actually be
             processed or if the function out just wants to be seen.
+        :param chunk_size: the number of activity ids to reconcile per update
+            statement.
+        :param workers: the number of worker processes to use.
         """
         if dry_run == True:
             logging.info('"dry_run" has been set to true. No actual '
                          'updates will be made.')
 
         start = datetime.utcnow()
+        chunks = self.get_chunks(activity_ids=activity_ids,
+                                 chunk_size=chunk_size,
+                                 dry_run=dry_run)
+        total_activities = 0
+        total_changed = 0
 
-        # get all activity ids that have replies
-        activity_ids = (ActivityReply.objects.all()
-                                             .order_by('activity')
-                                             .distinct('activity')
-                                             .values_list('activity',
-                                                          flat=True))
-
-        logging.info('Updating all activities with no replies to have a '
-                     'reply_count of 0...')
-
-        if not dry_run:
-            # Update all reply counts for other activities to 0
-            Activity.objects.exclude(id__in=activity_ids).update(reply_count=0)
+        logging.info('Starting to update activities...')
 
-        queryset = Activity.objects.filter(
-            id__in=activity_ids
-        ).annotate(reply_count_actual=Count('replies'))
+        if workers > 1:
+            # the worker processes can't share the database connections
+            for connection in connections.all():
+                connection.close()
 
-        logging.info('Starting to update activities...')
+            pool = Pool(processes=workers)
+            results = pool.imap_unordered(reconcile_reply_counts, chunks)
+        else:
+            pool = None
+            results = (reconcile_reply_counts(chunk) for chunk in chunks)
 
-        # update all activities will replies to the correct count
-        for activity in queryset:
-            activity.reply_count = activity.reply_count_actual
-            msg = 'Updating activity id: "{0}" with reply count of "{1}"'.format(
-                activity.id,
-                activity.reply_count_actual
-            )
-            logging.info(msg)
+        try:
+            for chunk, num_changed in results:
+                if chunk.get('activity_ids') is not None:
+                    num_activities = len(chunk['activity_ids'])
+                    chunk_description = '{0} activity ids'.format(
+                        num_activities
+                    )
+                else:
+                    num_activities = (chunk['activity_id_end'] -
+                                      chunk['activity_id_start'])
+                    chunk_description = 'activity ids {0} to {1}'.format(
+                        chunk['activity_id_start'],
+                        chunk['activity_id_end'] - 1
+                    )
 
-            if not dry_run:
-                activity.save()
+                total_activities += num_activities
+                total_changed += num_changed
+                logging.info('{0} reply counts {1} for {2}.'.format(
+                    'Found' if dry_run else 'Updated',
+                    num_changed,
+                    chunk_description
+                ))
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
 
         end = datetime.utcnow()
-        total_seconds = (end - start).seconds
-        logging.info('Updated {0} activities reply counts in {1} seconds!'.format(
-            len(activity_ids),
-            total_seconds
+        total_seconds = (end - start).total_seconds()
+        logging.info('Reconciled {0} activity ids ({1} reply counts {2}) in '
+                     '{3} seconds ({4:.0f} activity ids/second)!'.format(
+            total_activities,
+            total_changed,
+            'wrong' if dry_run else 'changed',
+            int(total_seconds),
+            total_activities / total_seconds if total_seconds else 0
         ))
+
+    def get_chunks(self, activity_ids, chunk_size, dry_run):
+        """Gets the keyword args for each chunk of activities to reconcile.
+
+        :param activity_ids: (optional) list of the activity ids to reconcile.
+            If None, all activities are reconciled by id range.
+        :param chunk_size: the number of activity ids per chunk.
+        :param dry_run: boolean indicating if the counts shouldn't be updated.
+        """
+        if activity_ids:
+            activity_ids = sorted(set(activity_ids))
+            return [{'activity_ids': activity_ids[i:i + chunk_size],
+                     'is_dry_run': dry_run}
+                    for i in range(0, len(activity_ids), chunk_size)]
+
+        Activity = get_activity_model()
+        id_range = Activity.objects.aggregate(min_id=Min('id'),
+                                              max_id=Max('id'))
+
+        if id_range['min_id'] is None:
+            return []
+
+        return [{'activity_id_start': activity_id_start,
+                 'activity_id_end': activity_id_start + chunk_size,
+                 'is_dry_run': dry_run}
+                for activity_id_start in range(id_range['min_id'],
+                                               id_range['max_id'] + 1,
+                                               chunk_size)]
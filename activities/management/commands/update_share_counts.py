@@ -4,7 +4,12 @@ from logging import getLogger
 from activities.constants import Action
 from activities.models import Activity
 from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
 from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db.models.aggregates import Max
+from django.db.models.aggregates import Min
+from django.utils.dateparse import parse_datetime
 
 
 logger = getLogger(__name__)
@@ -20,61 +25,84 @@ class Command(BaseCommand):
                             help=('boolean indicating if the images should '
                                   'actually be processed or if the function '
                                   'out just wants to be seen.'))
-
-    def handle(self, dry_run=False, *args, **options):
+        parser.add_argument('--content_types', '--content-types',
+                            nargs='+',
+                            dest='content_types',
+                            default=None,
+                            help=('Space separated list of "app_label.model" '
+                                  'content types to update the share counts '
+                                  'for. If None, this will update all content '
+                                  'types that have shares.'))
+        parser.add_argument('--since',
+                            dest='since',
+                            default=None,
+                            help=('Only update the objects shared since this '
+                                  'ISO 8601 datetime. Objects whose shares '
+                                  'were all removed are only reset to 0 when '
+                                  'this isn\'t set.'))
+        parser.add_argument('--chunk_size',
+                            dest='chunk_size',
+                            default=10000,
+                            type=int,
+                            help=('The number of object ids to update per '
+                                  'chunk.'))
+
+    def handle(self, dry_run=False, content_types=None, since=None,
+               chunk_size=10000, *args, **options):
         """
         :param dry_run: boolean indicating if the objects should actually be
             processed or if the function out just wants to be seen.
+        :param content_types: list of "app_label.model" content types to
+            update.
+        :param since: ISO 8601 datetime string.  Only objects shared since
+            then are updated.
+        :param chunk_size: the number of object ids to update per chunk.
         """
         if dry_run == True:
             logger.info('"dry_run" has been set to true. No actual '
                          'updates will be made.')
 
-        start = datetime.utcnow()
+        if since is not None:
+            since_dttm = parse_datetime(since)
 
-        # get all content types that have object shares
-        content_types_with_shares = (Activity.objects.filter(
-            action=Action.SHARED
-        ).order_by('about_content_type').distinct(
-            'about_content_type'
-        ).values_list('about_content_type_id', flat=True))
+            if since_dttm is None:
+                raise CommandError('"{0}" is not a valid datetime.'.format(
+                    since
+                ))
+        else:
+            since_dttm = None
 
+        start = datetime.utcnow()
         total_objects_updated = 0
 
-        for content_type_id in content_types_with_shares:
-            content_type = ContentType.objects.get(id=content_type_id)
+        for content_type in self.get_content_types(content_types):
             model = content_type.model_class()
 
-            if not hasattr(model(), 'share_count'):
+            try:
+                model._meta.get_field('share_count')
+            except (AttributeError, FieldDoesNotExist):
                 logger.info('Model "{0}" does not have a "share_count" '
-                            'attribute  Skipping this content type.'.format(
+                            'field.  Skipping this content type.'.format(
                                                                         model))
                 continue
 
-            # get the object ids for the content type that have shares
-            model_ids_with_shares = Activity.objects.filter(
-                about_content_type=content_type,
-                action=Action.SHARED
-            ).order_by('about_id').distinct('about_id').values_list('about_id',
-                                                                    flat=True)
-
-            total_objects_updated += len(model_ids_with_shares)
-
-            for obj in model.objects.filter(id__in=model_ids_with_shares):
-                obj.share_count = Activity.objects.filter(
-                    about_content_type=content_type,
-                    about_id=obj.id,
-                    action=Action.SHARED
-                ).count()
-
-                logger.info('Updating {0} "{1}" with share_count of {2}'.format(
-                    obj.get_verbose_name(),
-                    obj,
-                    obj.share_count
-                ))
-
-                if not dry_run:
-                    obj.save()
+            for chunk in self.get_chunks(model=model,
+                                         content_type=content_type,
+                                         since_dttm=since_dttm,
+                                         chunk_size=chunk_size):
+                num_updated = Activity.objects.reconcile_share_counts(
+                    model=model,
+                    is_dry_run=dry_run,
+                    **chunk
+                )
+                total_objects_updated += num_updated
+
+                if num_updated:
+                    logger.info('{0} {1} "{2}" share_count fields.'.format(
+                        'Found' if dry_run else 'Updated',
+                        num_updated,
+                        content_type
+                    ))
 
         end = datetime.utcnow()
         total_seconds = (end - start).seconds
@@ -82,3 +110,64 @@ class Command(BaseCommand):
             total_objects_updated,
             total_seconds
         ))
+
+    def get_content_types(self, content_types=None):
+        """Gets the content types to update the share counts for.
+
+        :param content_types: list of "app_label.model" strings.  If None, all
+            content types that have shares are returned.
+        """
+        if not content_types:
+            content_type_ids = Activity.objects.filter(
+                action=Action.SHARED
+            ).order_by().values_list('about_content_type_id',
+                                     flat=True).distinct()
+            return [ContentType.objects.get_for_id(content_type_id)
+                    for content_type_id in content_type_ids
+                    if content_type_id is not None]
+
+        results = []
+
+        for content_type in content_types:
+            try:
+                app_label, model = content_type.lower().split('.')
+                results.append(ContentType.objects.get_by_natural_key(
+                    app_label, model
+                ))
+            except (ValueError, ContentType.DoesNotExist):
+                raise CommandError('"{0}" is not a valid content type.'.format(
+                    content_type
+                ))
+
+        return results
+
+    def get_chunks(self, model, content_type, since_dttm, chunk_size):
+        """Gets the ``reconcile_share_counts`` keyword args for each chunk of
+        objects to update.
+
+        :param model: the "about" model.
+        :param content_type: the content type of the model.
+        :param since_dttm: (optional) only objects shared since this datetime
+            are updated.
+        :param chunk_size: the number of object ids per chunk.
+        """
+        if since_dttm is not None:
+            about_ids = sorted(set(Activity.objects.filter(
+                about_content_type=content_type,
+                action=Action.SHARED,
+                created_dttm__gte=since_dttm
+            ).values_list('about_id', flat=True)))
+            return [{'about_ids': about_ids[i:i + chunk_size]}
+                    for i in range(0, len(about_ids), chunk_size)]
+
+        id_range = model._default_manager.aggregate(min_id=Min('pk'),
+                                                    max_id=Max('pk'))
+
+        if id_range['min_id'] is None:
+            return []
+
+        return [{'about_id_start': about_id_start,
+                 'about_id_end': about_id_start + chunk_size}
+                for about_id_start in range(id_range['min_id'],
+                                            id_range['max_id'] + 1,
+                                            chunk_size)]
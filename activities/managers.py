@@ -1,15 +1,75 @@
+from datetime import datetime
+from datetime import timedelta
+
 from activities.constants import Action
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
+from django.db import IntegrityError
+from django.db import connections
+from django.db import transaction
+from django.db.models.aggregates import Count
+from django.db.models.aggregates import Min
+from django.db.models.deletion import CASCADE
+from django.db.models.deletion import DO_NOTHING
+from django.db.models.deletion import PROTECT
+from django.db.models.deletion import ProtectedError
+from django.db.models.deletion import SET_NULL
 from django.db.models.query_utils import Q
 from django_core.db.models import CommonManager
 
+from .cache import activity_for_cache
 from .constants import Privacy
 from .constants import Source
+from .counters import apply_counter_deltas
+from .generations import bump_generations
+from .generations import get_object_generation_key
+from .generations import is_generations_enabled
 from django_core.db.models.managers import GenericManager
 
 
+def is_feed_entries_enabled():
+    """Boolean indicating if the materialized feed entries table should be
+    written to and read from.  This is controlled by the
+    ``ACTIVITIES_FEED_ENTRIES_ENABLED`` setting and defaults to False.
+    """
+    return getattr(settings, 'ACTIVITIES_FEED_ENTRIES_ENABLED', False)
+
+
+def _has_field(model, field_name):
+    """Boolean indicating if the model has a field with the name."""
+    try:
+        model._meta.get_field(field_name)
+    except FieldDoesNotExist:
+        return False
+
+    return True
+
+
+def _supports_window_functions(connection):
+    """Boolean indicating if the database supports window functions (i.e.
+    ``ROW_NUMBER() OVER (...)``).
+    """
+    if connection.vendor == 'sqlite':
+        # the version of the sqlite library the connection uses
+        return connection.Database.sqlite_version_info >= (3, 25, 0)
+
+    if connection.vendor == 'mysql':
+        return getattr(connection, 'mysql_version', (0,)) >= (8, 0, 2)
+
+    return True
+
+
 class ActivityManager(CommonManager):
-    """Manager for Activity model."""
+    """Manager for Activity model.  Tombstoned activities (activities waiting
+    to be purged) are excluded.  Use the model's ``_base_manager`` to include
+    them.
+    """
+
+    def get_queryset(self):
+        return super(ActivityManager, self).get_queryset().filter(
+            is_deleted=False
+        )
 
     def create(self, created_user, text=None, about=None,
                source=Source.SYSTEM, action=Action.CREATED,
@@ -68,6 +128,164 @@ class ActivityManager(CommonManager):
             **kwargs
         )
 
+        for_objs = self._get_for_objs(for_objs=for_objs,
+                                      ensure_for_objs=ensure_for_objs,
+                                      exclude_objs=exclude_objs)
+        for_model = self.model._get_many_to_many_model(field_name='for_objs')
+        for_objs = list(for_model.objects.get_or_create_for_objects(
+            objs=for_objs
+        ).values())
+        activity.for_objs.add(*for_objs)
+
+        if is_feed_entries_enabled():
+            self._get_feed_entry_model().objects.create_for_activity(
+                activity=activity,
+                activity_fors=for_objs
+            )
+
+        self._bump_created_generations(abouts=[about], activity_fors=for_objs)
+        return activity
+
+    def bulk_create_activities(self, activities):
+        """Creates many activities at once.  Instead of the handful of queries
+        per activity that ``create`` makes, the activities, the ``ActivityFor``
+        recipients and the ``for_objs`` through rows are each written in
+        batched statements so the number of queries doesn't grow with the
+        number of activities.
+
+        Since ``post_save`` signals aren't sent for bulk inserts, the
+        denormalized ``share_count`` on the "about" objects is updated in
+        aggregate for all the SHARED activities created.
+
+        >>> Activity.objects.bulk_create_activities([
+        ...     {'created_user': user, 'about': obj_1, 'action': Action.CREATED},
+        ...     {'created_user': user, 'about': obj_2, 'action': Action.SHARED,
+        ...      'ensure_for_objs': [group]}
+        ... ])
+
+        :param activities: iterable of dicts describing the activities to
+            create.  Each dict accepts the same keyword args as ``create``
+            (created_user, about, text, source, action, privacy,
+            ensure_for_objs, exclude_objs, etc).
+        :return: list of the created activities.  SHARED activities that
+            already exist for the user are skipped since an object can only be
+            shared once per user.
+        """
+        activity_specs = [dict(spec) for spec in activities]
+        existing_shares = self._get_existing_shares(
+            activity_specs=activity_specs
+        )
+        utc_now = datetime.utcnow()
+        instances = []
+        instances_for_objs = []
+
+        for spec in activity_specs:
+            created_user = spec.pop('created_user')
+            about = spec.pop('about', None)
+            text = spec.pop('text', None)
+            action = spec.pop('action', Action.CREATED)
+            for_objs = set([about])
+
+            if action == Action.SHARED:
+                share_key = self._get_share_key(created_user=created_user,
+                                                about=about)
+
+                if share_key in existing_shares:
+                    # object can only be shared once per user.
+                    continue
+
+                existing_shares.add(share_key)
+                for_objs.add(created_user)
+
+            if ('privacy' not in spec and
+                about and
+                hasattr(about, 'privacy') and
+                about.privacy in (Privacy.PRIVATE, Privacy.PUBLIC)):
+                spec['privacy'] = about.privacy
+
+            instances_for_objs.append(self._get_for_objs(
+                for_objs=for_objs,
+                ensure_for_objs=spec.pop('ensure_for_objs', None),
+                exclude_objs=spec.pop('exclude_objs', None)
+            ))
+
+            if about is not None:
+                spec['about'] = about
+
+            instances.append(self.model(
+                text=text.strip() if text else text,
+                created_user=created_user,
+                last_modified_user=created_user,
+                source=spec.pop('source', Source.SYSTEM),
+                action=action,
+                created_dttm=spec.pop('created_dttm', utc_now),
+                **spec
+            ))
+
+        if not instances:
+            return []
+
+        with transaction.atomic():
+            self.bulk_create(instances)
+
+            if instances[0].pk is None:
+                # the database backend doesn't return primary keys from bulk
+                # inserts. See: https://code.djangoproject.com/ticket/19527
+                self._set_bulk_created_ids(instances=instances)
+
+            for_model = self.model._get_many_to_many_model(
+                field_name='for_objs'
+            )
+            activity_fors = for_model.objects.get_or_create_for_objects(
+                objs=[obj for for_objs in instances_for_objs
+                      for obj in for_objs]
+            )
+
+            for_objs_field = self.model._meta.get_field('for_objs')
+            through_model = for_objs_field.rel.through
+            activity_attname = '{0}_id'.format(
+                for_objs_field.m2m_field_name()
+            )
+            activity_for_attname = '{0}_id'.format(
+                for_objs_field.m2m_reverse_field_name()
+            )
+            through_rows = []
+            feed_entries = []
+
+            for activity, for_objs in zip(instances, instances_for_objs):
+                for obj in for_objs:
+                    activity_for = activity_fors[for_model.get_key(obj)]
+                    through_rows.append(through_model(**{
+                        activity_attname: activity.id,
+                        activity_for_attname: activity_for.id
+                    }))
+                    feed_entries.append((activity, activity_for))
+
+            through_model.objects.bulk_create(through_rows)
+
+            if is_feed_entries_enabled():
+                self._get_feed_entry_model().objects.bulk_create_for_activities(
+                    feed_entries=feed_entries
+                )
+
+            self.update_about_share_counts(activities=instances, delta=1)
+
+        self._bump_created_generations(
+            abouts=[activity.about for activity in instances],
+            activity_fors=activity_fors.values()
+        )
+        return instances
+
+    def _get_for_objs(self, for_objs, ensure_for_objs=None,
+                      exclude_objs=None):
+        """Gets the set of objects an activity is for.
+
+        :param for_objs: the set of default objects the activity is for.
+        :param ensure_for_objs: object or list of objects to ensure will
+            receive the activity.
+        :param exclude_objs: exclude these objects from receiving the
+            activity.
+        """
         if ensure_for_objs:
             if not isinstance(ensure_for_objs, (list, tuple, set)):
                 ensure_for_objs = set([ensure_for_objs])
@@ -80,19 +298,288 @@ class ActivityManager(CommonManager):
                 if obj in for_objs:
                     for_objs.remove(obj)
 
-        for_model = self.model._get_many_to_many_model(field_name='for_objs')
+        for_objs.discard(None)
+        return for_objs
 
-        # This is a bit annoying.  So I have to loop through these 1 by 1
-        # instead of using the bulk_create from the object manager because the
-        # bulk_create statement doesn't return primary keys which is needed for
-        # for_objs related manager add function call. See:
-        # https://code.djangoproject.com/ticket/19527
-        for_objs = [for_model.objects.get_or_create_generic(
-                                                        content_object=obj)[0]
-                    for obj in for_objs if obj is not None]
+    def _get_share_key(self, created_user, about):
+        """Gets the key that uniquely identifies a user's share."""
+        content_type = ContentType.objects.get_for_model(about)
+        return (created_user.id, content_type.id, about.id)
 
-        activity.for_objs.add(*for_objs)
-        return activity
+    def _get_existing_shares(self, activity_specs):
+        """Gets the set of share keys for the SHARED activity specs that have
+        already been shared by the user.
+        """
+        share_specs = [spec for spec in activity_specs
+                       if spec.get('action') == Action.SHARED]
+
+        if not share_specs:
+            return set()
+
+        share_keys = set(self._get_share_key(created_user=spec['created_user'],
+                                             about=spec['about'])
+                         for spec in share_specs)
+        existing_shares = self.filter(
+            action=Action.SHARED,
+            created_user_id__in=set(key[0] for key in share_keys),
+            about_content_type_id__in=set(key[1] for key in share_keys),
+            about_id__in=set(key[2] for key in share_keys)
+        ).values_list('created_user_id', 'about_content_type_id', 'about_id')
+        return set(existing_shares).intersection(share_keys)
+
+    def _set_bulk_created_ids(self, instances):
+        """Sets the primary keys on activities that were bulk created with a
+        database backend that doesn't return primary keys from bulk inserts.
+        All instances must have been inserted in the same statement.
+
+        :param instances: the activities in the order they were inserted.
+        """
+        rows = self.filter(
+            created_dttm__in=set(instance.created_dttm
+                                 for instance in instances),
+            created_user_id__in=set(instance.created_user_id
+                                    for instance in instances)
+        ).order_by('id').values_list('id', 'created_user_id',
+                                     'about_content_type_id', 'about_id',
+                                     'action')
+        instances_iter = iter(instances)
+        instance = next(instances_iter, None)
+
+        for row in rows:
+            if instance is None:
+                break
+
+            if row[1:] == (instance.created_user_id,
+                           instance.about_content_type_id,
+                           instance.about_id,
+                           instance.action):
+                instance.id = row[0]
+                instance = next(instances_iter, None)
+
+    def update_about_share_counts(self, activities, delta):
+        """Updates the denormalized ``share_count`` on the "about" objects of
+        the SHARED activities in aggregate.  One update is made per "about"
+        model and share count delta instead of one per activity.
+
+        :param activities: iterable of activities.  Only SHARED activities
+            with "about" objects that have a ``share_count`` are counted.
+        :param delta: the number of shares each activity adds (1) or
+            removes (-1).
+        """
+        deltas = {}
+
+        for activity in activities:
+            if (activity.action != Action.SHARED or
+                not activity.about_content_type_id or
+                not activity.about_id):
+                continue
+
+            model = ContentType.objects.get_for_id(
+                activity.about_content_type_id
+            ).model_class()
+
+            if model is None or not _has_field(model, 'share_count'):
+                continue
+
+            key = (model, activity.about_id, 'share_count')
+            deltas[key] = deltas.get(key, 0) + delta
+
+        apply_counter_deltas(deltas)
+
+    def _bump_created_generations(self, abouts, activity_fors):
+        """Bumps the feed generations of the "about" objects and recipients of
+        newly created activities.
+        """
+        if not is_generations_enabled():
+            return
+
+        keys = set((activity_for.content_type_id, activity_for.object_id)
+                   for activity_for in activity_fors)
+        keys.update(get_object_generation_key(about)
+                    for about in abouts if about is not None)
+        bump_generations(keys)
+
+    def bump_feed_generations(self, activity_ids):
+        """Bumps the feed generations of the "about" objects and recipients of
+        the activities so cached feed pages showing them are invalidated (see
+        ``activities.generations``).  This is a no-op unless the
+        ``ACTIVITIES_GENERATIONS_ENABLED`` setting is True.
+
+        :param activity_ids: list or queryset of the activity ids.
+        """
+        if not is_generations_enabled():
+            return
+
+        for_objs_field = self.model._meta.get_field('for_objs')
+        activity_field = for_objs_field.m2m_field_name()
+        activity_for_field = for_objs_field.m2m_reverse_field_name()
+        keys = set(for_objs_field.rel.through.objects.filter(**{
+            '{0}_id__in'.format(activity_field): activity_ids
+        }).values_list(
+            '{0}__content_type_id'.format(activity_for_field),
+            '{0}__object_id'.format(activity_for_field)
+        ).distinct())
+        keys.update(self.filter(
+            id__in=activity_ids,
+            about_content_type__isnull=False
+        ).values_list('about_content_type_id', 'about_id').distinct())
+        bump_generations(keys)
+
+    def reconcile_reply_counts(self, activity_id_start=None,
+                               activity_id_end=None, activity_ids=None,
+                               is_dry_run=False):
+        """Sets the denormalized ``reply_count`` of the activities to the
+        actual number of replies.  This is a single set based update and only
+        rows whose count is wrong are written.
+
+        :param activity_id_start: (optional) the first activity id to
+            reconcile (inclusive).
+        :param activity_id_end: (optional) the last activity id to reconcile
+            (exclusive).
+        :param activity_ids: (optional) list of the activity ids to reconcile.
+        :param is_dry_run: if True, the number of activities with the wrong
+            count is returned but nothing is updated.
+        :return: the number of activities whose reply count was (or would be)
+            changed.
+        """
+        connection = connections[self.db]
+        quote_name = connection.ops.quote_name
+        reply_model = self.model._meta.get_field('replies').related_model
+        activity_table = quote_name(self.model._meta.db_table)
+        activity_id_column = quote_name(self.model._meta.pk.column)
+        reply_count_column = quote_name(
+            self.model._meta.get_field('reply_count').column
+        )
+        reply_table = quote_name(reply_model._meta.db_table)
+        reply_id_column = quote_name(reply_model._meta.pk.column)
+        reply_activity_column = quote_name(
+            reply_model._meta.get_field('activity').column
+        )
+        conditions = []
+        params = []
+
+        if activity_id_start is not None:
+            conditions.append('{id} >= %s')
+            params.append(activity_id_start)
+
+        if activity_id_end is not None:
+            conditions.append('{id} < %s')
+            params.append(activity_id_end)
+
+        if activity_ids is not None:
+            activity_ids = list(activity_ids)
+
+            if not activity_ids:
+                return 0
+
+            conditions.append('{{id}} IN ({0})'.format(
+                ', '.join(['%s'] * len(activity_ids))
+            ))
+            params.extend(activity_ids)
+
+        conditions = ' AND '.join(conditions) or '1 = 1'
+        reply_count_sql = (
+            '(SELECT COUNT(*) FROM {reply} WHERE {reply}.{reply_activity} = '
+            '{activity}.{id})'
+        ).format(reply=reply_table,
+                 reply_activity=reply_activity_column,
+                 activity=activity_table,
+                 id=activity_id_column)
+
+        if is_dry_run:
+            sql = ('SELECT COUNT(*) FROM {activity} WHERE {conditions} AND '
+                   '{reply_count} <> {reply_count_sql}')
+        elif connection.vendor == 'postgresql':
+            # count all the replies for the range in one aggregate instead of
+            # a subquery per activity.
+            conditions = conditions.replace('{id}', 'a.{id}')
+            sql = ('UPDATE {activity} SET {reply_count} = counts.reply_count '
+                   'FROM (SELECT a.{id} AS activity_id, COUNT(r.{reply_id}) '
+                   'AS reply_count FROM {activity} a LEFT JOIN {reply} r ON '
+                   'r.{reply_activity} = a.{id} WHERE {conditions} GROUP BY '
+                   'a.{id}) counts WHERE {activity}.{id} = counts.activity_id '
+                   'AND {activity}.{reply_count} <> counts.reply_count')
+        else:
+            sql = ('UPDATE {activity} SET {reply_count} = {reply_count_sql} '
+                   'WHERE {conditions} AND {reply_count} <> {reply_count_sql}')
+
+        sql = sql.replace('{conditions}', conditions).format(
+            activity=activity_table,
+            id=activity_id_column,
+            reply_count=reply_count_column,
+            reply_count_sql=reply_count_sql,
+            reply=reply_table,
+            reply_id=reply_id_column,
+            reply_activity=reply_activity_column
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+            if is_dry_run:
+                return cursor.fetchone()[0]
+
+            return cursor.rowcount
+
+    def reconcile_share_counts(self, model, about_ids=None,
+                               about_id_start=None, about_id_end=None,
+                               is_dry_run=False):
+        """Sets the denormalized ``share_count`` of the "about" objects to the
+        actual number of SHARED activities.  The share counts are computed in
+        one grouped aggregate and only objects whose count is wrong are
+        updated, with one ``UPDATE`` of just the ``share_count`` field per
+        distinct count.  Objects with no remaining shares are reset to 0.
+
+        :param model: the "about" model with the ``share_count`` field.
+        :param about_ids: (optional) list of the object ids to reconcile.
+        :param about_id_start: (optional) the first object id to reconcile
+            (inclusive).
+        :param about_id_end: (optional) the last object id to reconcile
+            (exclusive).
+        :param is_dry_run: if True, nothing is updated.
+        :return: the number of objects whose share count was (or would be)
+            changed.
+        """
+        content_type = ContentType.objects.get_for_model(model)
+        objects = model._default_manager.all()
+        shares = self.filter(about_content_type=content_type,
+                             action=Action.SHARED)
+
+        if about_ids is not None:
+            objects = objects.filter(pk__in=about_ids)
+            shares = shares.filter(about_id__in=about_ids)
+
+        if about_id_start is not None:
+            objects = objects.filter(pk__gte=about_id_start)
+            shares = shares.filter(about_id__gte=about_id_start)
+
+        if about_id_end is not None:
+            objects = objects.filter(pk__lt=about_id_end)
+            shares = shares.filter(about_id__lt=about_id_end)
+
+        share_counts = dict(shares.order_by().values_list(
+            'about_id'
+        ).annotate(share_count=Count('id')))
+        ids_by_share_count = {}
+
+        for pk, share_count in objects.values_list('pk', 'share_count'):
+            actual_share_count = share_counts.get(pk, 0)
+
+            if share_count != actual_share_count:
+                ids_by_share_count.setdefault(actual_share_count,
+                                              []).append(pk)
+
+        if not is_dry_run:
+            for share_count, ids in ids_by_share_count.items():
+                model._default_manager.filter(pk__in=ids).update(
+                    share_count=share_count
+                )
+
+        return sum(len(ids) for ids in ids_by_share_count.values())
+
+    def _get_feed_entry_model(self):
+        """Gets the materialized feed entry model for the activities."""
+        return self.model._meta.get_field('feed_entries').related_model
 
     def get_about_object(self, about, **kwargs):
         """Gets all activities about the "about" object."""
@@ -109,7 +596,40 @@ class ActivityManager(CommonManager):
         """
         return self.get_for_object(obj=user, for_user=user, **kwargs)
 
-    def get_for_object(self, obj, for_user=None, **kwargs):
+    def _get_time_bounds(self, since=None, until=None):
+        """Gets the ``created_dttm`` bounds for a feed query.  If ``since``
+        isn't provided and the ``ACTIVITIES_FEED_MAX_AGE_DAYS`` setting is
+        set, feeds only go back that number of days.  Bounded feed queries let
+        the database skip the older activities entirely (i.e. prune the
+        partitions, see ``activities.partitions``).
+
+        :return: tuple of the since and until datetimes.  Either can be None.
+        """
+        max_age_days = getattr(settings, 'ACTIVITIES_FEED_MAX_AGE_DAYS', None)
+
+        if since is None and max_age_days is not None:
+            since = datetime.utcnow() - timedelta(days=max_age_days)
+
+        return since, until
+
+    def _get_time_bound_kwargs(self, since=None, until=None, prefix=''):
+        """Gets the filter kwargs for the ``created_dttm`` bounds.
+
+        :param prefix: the lookup prefix of the ``created_dttm`` field (i.e.
+            "feed_entries__").
+        """
+        kwargs = {}
+
+        if since is not None:
+            kwargs['{0}created_dttm__gte'.format(prefix)] = since
+
+        if until is not None:
+            kwargs['{0}created_dttm__lt'.format(prefix)] = until
+
+        return kwargs
+
+    def get_for_object(self, obj, for_user=None, since=None, until=None,
+                       **kwargs):
         """Gets activities for a specific object.
 
         If ``for_user`` is provided, this will return all activities for the
@@ -124,8 +644,75 @@ class ActivityManager(CommonManager):
 
         :param obj: the object the activities are for
         :param for_user: only activities that this user can see
+        :param since: (optional) only activities created at or after this
+            datetime.  Defaults to the ``ACTIVITIES_FEED_MAX_AGE_DAYS``
+            setting.
+        :param until: (optional) only activities created before this datetime.
         :param kwargs: any key value pair fields that are on the model.
 
+        """
+        since, until = self._get_time_bounds(since=since, until=until)
+
+        if is_feed_entries_enabled():
+            return self.get_for_object_from_feed_entries(obj=obj,
+                                                         for_user=for_user,
+                                                         since=since,
+                                                         until=until,
+                                                         **kwargs)
+
+        kwargs.update(self._get_time_bound_kwargs(since=since, until=until))
+
+        if getattr(settings, 'ACTIVITIES_FEED_QUERY_USE_DISTINCT', False):
+            return self.get_for_object_distinct(obj=obj, for_user=for_user,
+                                                **kwargs)
+
+        # The recipient and visibility checks are semi-joins (``id IN
+        # (subquery)``) instead of joins so the result never needs to be
+        # made distinct and the database can stop once it has a page.
+        content_type = ContentType.objects.get_for_model(obj)
+        queryset = self.filter(
+            id__in=self._get_for_object_activity_ids(content_type=content_type,
+                                                     object_id=obj.id),
+            **kwargs
+        )
+
+        if for_user is None or not for_user.is_authenticated():
+            if 'privacy' not in kwargs:
+                queryset = queryset.filter(privacy=Privacy.PUBLIC)
+
+            return queryset
+
+        if for_user and for_user == obj:
+            return queryset
+
+        user_content_type = ContentType.objects.get_for_model(for_user)
+        for_user_activity_ids = self._get_for_object_activity_ids(
+            content_type=user_content_type,
+            object_id=for_user.id
+        )
+        return queryset.filter(Q(created_user=for_user) |
+                               Q(privacy=Privacy.PUBLIC) |
+                               Q(privacy__in=[Privacy.CUSTOM, Privacy.PRIVATE],
+                                 id__in=for_user_activity_ids))
+
+    def get_for_object_ordering(self):
+        """Gets the newest first ordering to use for the activities returned
+        by ``get_for_object``.  When the feed entries are read this orders by
+        the feed entry's ``created_dttm`` so the feed entry index is used for
+        the ordering.
+        """
+        if is_feed_entries_enabled():
+            return ('-feed_entries__created_dttm', '-id')
+
+        return ('-created_dttm', '-id')
+
+    def get_for_object_distinct(self, obj, for_user=None, **kwargs):
+        """Gets activities for a specific object by joining through the
+        ``for_objs`` table and making the results distinct.  This is the
+        original query and is used instead of the semi-join query when the
+        ``ACTIVITIES_FEED_QUERY_USE_DISTINCT`` setting is True.
+
+        See ``get_for_object`` for the param definitions.
         """
         content_type = ContentType.objects.get_for_model(obj)
         queryset = self.filter(for_objs__content_type=content_type,
@@ -148,6 +735,78 @@ class ActivityManager(CommonManager):
                                  for_objs__content_type=user_content_type,
                                  for_objs__object_id=for_user.id)).distinct()
 
+    def _get_for_object_activity_ids(self, content_type, object_id):
+        """Gets the subquery of activity ids the object is a recipient of.
+
+        :param content_type: the content type of the recipient object.
+        :param object_id: the id of the recipient object.
+        """
+        for_objs_field = self.model._meta.get_field('for_objs')
+        activity_for_field = for_objs_field.m2m_reverse_field_name()
+        return for_objs_field.rel.through.objects.filter(**{
+            '{0}__content_type'.format(activity_for_field): content_type,
+            '{0}__object_id'.format(activity_for_field): object_id
+        }).values('{0}_id'.format(for_objs_field.m2m_field_name()))
+
+    def get_for_object_from_feed_entries(self, obj, for_user=None, since=None,
+                                         until=None, **kwargs):
+        """Gets activities for a specific object by reading from the
+        materialized feed entries instead of the ``for_objs`` join.  Feed
+        entries are unique per activity and recipient so no ``distinct()`` is
+        needed.
+
+        The activities are ordered by the feed entry's ``created_dttm`` (the
+        same value as the activity's) so the database can walk the
+        ``(content_type, object_id, created_dttm)`` index backwards and stop
+        once it has a page.  Ordering by the activity's ``created_dttm``
+        instead makes the database join and sort every entry of the feed
+        before the limit is applied so keep this ordering (see
+        ``get_for_object_ordering``).
+
+        See ``get_for_object`` for the param definitions.
+        """
+        content_type = ContentType.objects.get_for_model(obj)
+        # all feed entry filters must be in the same filter call so only a
+        # single join to the feed entries table is made.
+        feed_entry_kwargs = {
+            'feed_entries__content_type': content_type,
+            'feed_entries__object_id': obj.id
+        }
+        # the bounds are on both tables so both can be pruned by time.
+        feed_entry_kwargs.update(self._get_time_bound_kwargs(
+            since=since,
+            until=until,
+            prefix='feed_entries__'
+        ))
+        kwargs.update(self._get_time_bound_kwargs(since=since, until=until))
+
+        if ((for_user is None or not for_user.is_authenticated()) and
+            'privacy' not in kwargs):
+            feed_entry_kwargs['feed_entries__privacy'] = Privacy.PUBLIC
+
+        kwargs.update(feed_entry_kwargs)
+        # order_by reuses the feed entries join of the filter above.
+        queryset = self.filter(**kwargs).order_by(
+            *self.get_for_object_ordering()
+        )
+
+        if for_user is None or not for_user.is_authenticated():
+            return queryset
+
+        if for_user and for_user == obj:
+            return queryset
+
+        user_content_type = ContentType.objects.get_for_model(for_user)
+        for_user_activity_ids = self._get_feed_entry_model().objects.filter(
+            content_type=user_content_type,
+            object_id=for_user.id,
+            privacy__in=[Privacy.CUSTOM, Privacy.PRIVATE],
+            **self._get_time_bound_kwargs(since=since, until=until)
+        ).values('activity_id')
+        return queryset.filter(Q(created_user=for_user) |
+                               Q(privacy=Privacy.PUBLIC) |
+                               Q(id__in=for_user_activity_ids))
+
     def delete_all_about_object(self, about, **kwargs):
         """Deletes all activities about an object.
 
@@ -158,6 +817,128 @@ class ActivityManager(CommonManager):
         return self.filter(about_content_type=content_type,
                            about_id=about.id).delete()
 
+    def fast_delete(self, queryset, batch_size=1000):
+        """Deletes the activities in the queryset without loading them
+        through django's delete collector or sending per row signals.  Each
+        batch is deleted in its own transaction with one raw delete per table
+        (replies, recipients, feed entries and activities) and the
+        ``share_count`` of the "about" objects of the deleted SHARED
+        activities is decremented with grouped updates.
+
+        Activities grouped under the deleted activities are handled like the
+        delete collector handles the ``group`` foreign key's ``on_delete``:
+        ``SET_NULL`` (the default) ungroups them, ``CASCADE`` deletes them
+        with their group, ``PROTECT`` raises ``ProtectedError`` and
+        ``DO_NOTHING`` leaves them.  Other ``on_delete`` handlers aren't
+        supported.
+
+        The ``ActivityFor`` recipients are shared by many activities so
+        they're never deleted here (and ``activity_for_cache`` stays valid).
+        Rows of other apps that reference the activities aren't deleted.
+
+        :param queryset: the queryset of activities to delete.  Use the
+            model's ``_base_manager`` to include tombstoned activities.
+        :param batch_size: the max number of activities to delete per batch.
+        :return: the number of activities deleted.
+        """
+        num_deleted = 0
+        for_objs_field = self.model._meta.get_field('for_objs')
+        through_model = for_objs_field.rel.through
+        reply_model = self.model._meta.get_field('replies').related_model
+        base_manager = self.model._base_manager
+        on_delete = self.model._meta.get_field('group').rel.on_delete
+
+        if on_delete not in (CASCADE, DO_NOTHING, PROTECT, SET_NULL):
+            raise ValueError('fast_delete doesn\'t support the "group" '
+                             'on_delete handler {0}.'.format(on_delete))
+
+        while True:
+            activities = list(queryset.order_by().only(
+                'id', 'action', 'about_content_type', 'about_id'
+            )[:batch_size])
+
+            if not activities:
+                return num_deleted
+
+            if on_delete is CASCADE:
+                activities.extend(self._get_grouped_activities(
+                    activities=activities
+                ))
+
+            activity_ids = [activity.id for activity in activities]
+
+            with transaction.atomic(using=queryset.db):
+                grouped = base_manager.filter(
+                    group_id__in=activity_ids
+                ).exclude(id__in=activity_ids)
+
+                if on_delete is PROTECT and grouped.exists():
+                    raise ProtectedError(
+                        'Cannot delete activities that other activities are '
+                        'grouped under.',
+                        list(grouped)
+                    )
+
+                self.bump_feed_generations(activity_ids=activity_ids)
+                self.update_about_share_counts(activities=activities,
+                                               delta=-1)
+                # the querysets are deleted with raw deletes since the rows
+                # don't need to be loaded for the collector.
+                reply_model._base_manager.filter(
+                    activity_id__in=activity_ids
+                )._raw_delete(queryset.db)
+                through_model._base_manager.filter(**{
+                    '{0}_id__in'.format(for_objs_field.m2m_field_name()):
+                        activity_ids
+                })._raw_delete(queryset.db)
+                self._get_feed_entry_model()._base_manager.filter(
+                    activity_id__in=activity_ids
+                )._raw_delete(queryset.db)
+                if on_delete is SET_NULL:
+                    grouped.update(group=None)
+
+                base_manager.filter(id__in=activity_ids)._raw_delete(
+                    queryset.db
+                )
+
+            num_deleted += len(activity_ids)
+
+    def _get_grouped_activities(self, activities):
+        """Gets the activities grouped (directly or indirectly) under the
+        activities, for cascading deletes of the ``group`` foreign key.
+        """
+        activity_ids = set(activity.id for activity in activities)
+        group_ids = activity_ids
+        grouped_activities = []
+
+        while group_ids:
+            grouped = list(self.model._base_manager.filter(
+                group_id__in=group_ids
+            ).exclude(id__in=activity_ids).only(
+                'id', 'action', 'about_content_type', 'about_id'
+            ))
+            grouped_activities.extend(grouped)
+            group_ids = set(activity.id for activity in grouped)
+            activity_ids |= group_ids
+
+        return grouped_activities
+
+    def tombstone_all_about_object(self, about):
+        """Tombstones all activities about an object instead of deleting them.
+        Tombstoned activities immediately disappear from the feeds and are
+        deleted later in batches by ``activities.deletion``.
+
+        :param about: the "about" object of the activities to tombstone.
+        :return: the number of activities tombstoned.
+        """
+        content_type = ContentType.objects.get_for_model(about)
+        activities_queryset = self.filter(about_content_type=content_type,
+                                          about_id=about.id)
+        self.bump_feed_generations(
+            activity_ids=activities_queryset.values('id')
+        )
+        return activities_queryset.update(is_deleted=True)
+
     def updates_for_about_objects_queryset(self, about_objects_queryset,
                                             **updates):
         """Update activites for "about" objects from a queryset of "about"
@@ -183,6 +964,11 @@ class ActivityManager(CommonManager):
             # have the one change needed
             activities_queryset = activities_queryset.exclude(**updates)
 
+        self._update_feed_entries(activities_queryset=activities_queryset,
+                                  updates=updates)
+        self.bump_feed_generations(
+            activity_ids=activities_queryset.values('id')
+        )
         return activities_queryset.update(**updates)
 
     def updates_for_about_object(self, about, **updates):
@@ -194,11 +980,44 @@ class ActivityManager(CommonManager):
             return None
 
         content_type = ContentType.objects.get_for_model(about)
-
-        return self.filter(
+        activities_queryset = self.filter(
             about_content_type=content_type,
             about_id=about.id
-        ).update(**updates)
+        )
+        self._update_feed_entries(activities_queryset=activities_queryset,
+                                  updates=updates)
+        self.bump_feed_generations(
+            activity_ids=activities_queryset.values('id')
+        )
+        return activities_queryset.update(**updates)
+
+    def _update_feed_entries(self, activities_queryset, updates):
+        """Keeps the denormalized privacy on the feed entries in sync with
+        the activities being updated.  This must be called before the
+        activities themselves are updated since the queryset may exclude
+        activities that already have the updated values.
+        """
+        if 'privacy' not in updates or not is_feed_entries_enabled():
+            return
+
+        self._get_feed_entry_model().objects.filter(
+            activity__in=activities_queryset.values('id')
+        ).update(privacy=updates['privacy'])
+
+    def sync_feed_entry_privacy(self, activity):
+        """Updates the denormalized privacy of an activity's feed entries
+        when the activity's privacy was changed with ``save()`` (i.e. when it
+        is edited).  Only entries with a stale privacy are updated.
+
+        :param activity: the saved activity.
+        :return: the number of feed entries updated.
+        """
+        if not is_feed_entries_enabled():
+            return 0
+
+        return self._get_feed_entry_model().objects.filter(
+            activity_id=activity.id
+        ).exclude(privacy=activity.privacy).update(privacy=activity.privacy)
 
 
 class ActivityReplyManager(CommonManager):
@@ -221,6 +1040,146 @@ class ActivityReplyManager(CommonManager):
             **kwargs
         )
 
+    def get_latest_by_activity(self, activity_ids, count):
+        """Gets the newest replies for each activity.  Only the newest
+        ``count`` replies of each activity are loaded no matter how many
+        replies the activities have.  The reply ids are selected in a single
+        query ranking the replies of each activity with ``ROW_NUMBER()`` and
+        the replies are then loaded with their created users.
+
+        :param activity_ids: the ids of the activities to get the replies for.
+        :param count: the max number of replies to get per activity.
+        :return: dict of the lists of replies, newest first, keyed by the
+            activity id.  Every activity id is included in the dict.
+        """
+        activity_ids = list(activity_ids)
+        replies_by_activity_id = dict((activity_id, [])
+                                      for activity_id in activity_ids)
+
+        if not activity_ids or count < 1:
+            return replies_by_activity_id
+
+        connection = connections[self.db]
+
+        with connection.cursor() as cursor:
+            cursor.execute(*self._get_latest_ids_sql(
+                connection=connection,
+                activity_ids=activity_ids,
+                count=count
+            ))
+            reply_ids = [row[0] for row in cursor.fetchall()]
+
+        if not reply_ids:
+            return replies_by_activity_id
+
+        replies = self.filter(id__in=reply_ids).select_related(
+            'created_user'
+        ).order_by('-created_dttm', '-id')
+
+        for reply in replies:
+            replies_by_activity_id[reply.activity_id].append(reply)
+
+        return replies_by_activity_id
+
+    def _get_latest_ids_sql(self, connection, activity_ids, count):
+        """Gets the sql and params for selecting the ids of the newest
+        ``count`` replies of each activity.  Databases without window
+        functions get a ``UNION ALL`` of one limited, index ordered select per
+        activity instead.
+        """
+        opts = self.model._meta
+        quote_name = connection.ops.quote_name
+        table = quote_name(opts.db_table)
+        id_column = quote_name(opts.pk.column)
+        activity_column = quote_name(opts.get_field('activity').column)
+        created_column = quote_name(opts.get_field('created_dttm').column)
+
+        if _supports_window_functions(connection):
+            sql = (
+                'SELECT {id} FROM ('
+                'SELECT {id}, ROW_NUMBER() OVER ('
+                'PARTITION BY {activity} ORDER BY {created} DESC, {id} DESC'
+                ') AS row_num FROM {table} WHERE {activity} IN ({placeholders})'
+                ') latest_replies WHERE row_num <= %s'
+            ).format(id=id_column,
+                     activity=activity_column,
+                     created=created_column,
+                     table=table,
+                     placeholders=', '.join(['%s'] * len(activity_ids)))
+            return sql, activity_ids + [count]
+
+        selects = []
+        params = []
+
+        for i, activity_id in enumerate(activity_ids):
+            selects.append(
+                'SELECT {id} FROM (SELECT {id} FROM {table} '
+                'WHERE {activity} = %s ORDER BY {created} DESC, {id} DESC '
+                'LIMIT %s) latest_replies_{i}'.format(id=id_column,
+                                                      table=table,
+                                                      activity=activity_column,
+                                                      created=created_column,
+                                                      i=i)
+            )
+            params.extend([activity_id, count])
+
+        return ' UNION ALL '.join(selects), params
+
+    def fast_delete(self, queryset, batch_size=1000):
+        """Deletes the replies in the queryset without loading them through
+        django's delete collector or sending per row signals.  Each batch is
+        deleted in its own transaction with a raw delete and the
+        ``reply_count`` of the activities is decremented with grouped updates
+        (one update per distinct number of replies removed).  Replies to the
+        deleted replies are deleted as well.
+
+        :param queryset: the queryset of replies to delete.
+        :param batch_size: the max number of replies to delete per batch.
+        :return: the number of replies deleted.
+        """
+        activity_model = self.model._meta.get_field('activity').related_model
+        num_deleted = 0
+
+        while True:
+            replies = list(queryset.order_by().values_list(
+                'id', 'activity_id'
+            )[:batch_size])
+
+            if not replies:
+                return num_deleted
+
+            reply_ids = set(reply_id for reply_id, activity_id in replies)
+            child_replies = replies
+
+            while child_replies:
+                # replies to the replies being deleted are cascaded
+                child_replies = list(self.model._base_manager.filter(
+                    reply_to_id__in=[reply_id
+                                     for reply_id, activity_id
+                                     in child_replies]
+                ).exclude(id__in=reply_ids).values_list('id', 'activity_id'))
+                reply_ids.update(reply_id
+                                 for reply_id, activity_id in child_replies)
+                replies.extend(child_replies)
+
+            deltas = {}
+
+            for reply_id, activity_id in replies:
+                key = (activity_model, activity_id, 'reply_count')
+                deltas[key] = deltas.get(key, 0) - 1
+
+            with transaction.atomic(using=queryset.db):
+                apply_counter_deltas(deltas)
+                activity_model.objects.bump_feed_generations(
+                    activity_ids=list(set(activity_id for reply_id, activity_id
+                                          in replies))
+                )
+                self.model._base_manager.filter(
+                    id__in=reply_ids
+                )._raw_delete(queryset.db)
+
+            num_deleted += len(reply_ids)
+
     def get_by_activity(self, activity):
         """Gets all objects for a activity object."""
         try:
@@ -239,15 +1198,319 @@ class ActivityReplyManager(CommonManager):
 class ActivityForManager(GenericManager, CommonManager):
     """Model manager for the ActivityFor model."""
 
+    def get_or_create_for_objects(self, objs):
+        """Gets or creates the ActivityFor instances for many objects at once.
+        All the objects are resolved in one or two batched statements instead
+        of a get or create per object.  Objects that don't exist yet are
+        inserted ignoring conflicts so concurrent writers creating the same
+        ActivityFor don't create duplicates or fail.
+
+        When the ``ACTIVITIES_FOR_CACHE_SIZE`` setting is on, primary keys of
+        recently used ActivityFor rows are kept in the per-process
+        ``activity_for_cache`` so repeat recipients don't need to be looked up
+        at all.
+
+        :param objs: iterable of objects to get the ActivityFor instances for.
+        :return: dict of ActivityFor instances keyed by
+            ``(content_type_id, object_id)``.
+        """
+        return self.get_or_create_for_keys(
+            keys=set(self.model.get_key(obj) for obj in objs)
+        )
+
+    def get_or_create_for_keys(self, keys):
+        """Gets or creates the ActivityFor instances for many
+        ``(content_type_id, object_id)`` keys at once.  See
+        ``get_or_create_for_objects``.
+
+        :param keys: set of ``(content_type_id, object_id)`` tuples.
+        :return: dict of ActivityFor instances keyed by
+            ``(content_type_id, object_id)``.
+        """
+        activity_fors = {}
+
+        for key in keys:
+            pk = activity_for_cache.get(key)
+
+            if pk is not None:
+                activity_fors[key] = self.model(id=pk,
+                                                content_type_id=key[0],
+                                                object_id=key[1])
+
+        missing_keys = keys.difference(activity_fors)
+        found = self._get_by_keys(keys=missing_keys)
+        missing_keys = missing_keys.difference(found)
+
+        if missing_keys:
+            self._insert_ignore_conflicts(keys=missing_keys)
+            found.update(self._get_by_keys(keys=missing_keys))
+
+        if found:
+            self._cache_on_commit(activity_fors=found)
+            activity_fors.update(found)
+
+        return activity_fors
+
+    def _cache_on_commit(self, activity_fors):
+        """Adds the ActivityFor primary keys to the ``activity_for_cache`` once
+        the current transaction commits so primary keys of rows that get
+        rolled back are never cached.
+
+        :param activity_fors: dict of ActivityFor instances keyed by
+            ``(content_type_id, object_id)``.
+        """
+        if not hasattr(transaction, 'on_commit'):
+            # django < 1.9 can't wait for the commit so don't cache anything.
+            return
+
+        pks = dict((key, activity_for.id)
+                   for key, activity_for in activity_fors.items())
+        transaction.on_commit(lambda: activity_for_cache.set_many(pks),
+                              using=self.db)
+
+    def _get_by_keys(self, keys):
+        """Gets the ActivityFor instances for the
+        ``(content_type_id, object_id)`` keys in a single query.
+
+        :return: dict of ActivityFor instances keyed by
+            ``(content_type_id, object_id)``.
+        """
+        if not keys:
+            return {}
+
+        object_ids_by_content_type = {}
+
+        for content_type_id, object_id in keys:
+            object_ids_by_content_type.setdefault(content_type_id,
+                                                  set()).add(object_id)
+
+        keys_filter = None
+
+        for content_type_id, object_ids in object_ids_by_content_type.items():
+            key_filter = Q(content_type_id=content_type_id,
+                           object_id__in=object_ids)
+
+            if keys_filter:
+                keys_filter |= key_filter
+            else:
+                keys_filter = key_filter
+
+        return dict(((activity_for.content_type_id, activity_for.object_id),
+                     activity_for)
+                    for activity_for in self.filter(keys_filter))
+
+    def _insert_ignore_conflicts(self, keys):
+        """Inserts ActivityFor rows for the ``(content_type_id, object_id)``
+        keys ignoring any rows that already exist.
+
+        :param keys: iterable of ``(content_type_id, object_id)`` tuples.
+        """
+        keys = sorted(keys)
+        connection = connections[self.db]
+
+        if connection.vendor == 'postgresql':
+            opts = self.model._meta
+            sql = ('INSERT INTO {table} ({content_type}, {object_id}) '
+                   'VALUES {values} '
+                   'ON CONFLICT ({content_type}, {object_id}) '
+                   'DO NOTHING').format(
+                table=connection.ops.quote_name(opts.db_table),
+                content_type=connection.ops.quote_name(
+                    opts.get_field('content_type').column
+                ),
+                object_id=connection.ops.quote_name(
+                    opts.get_field('object_id').column
+                ),
+                values=', '.join(['(%s, %s)'] * len(keys))
+            )
+
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [value for key in keys for value in key])
+
+            return
+
+        try:
+            with transaction.atomic(using=self.db):
+                self.bulk_create([self.model(content_type_id=content_type_id,
+                                             object_id=object_id)
+                                  for content_type_id, object_id in keys])
+        except IntegrityError:
+            # a concurrent writer created some of the rows. Fall back to
+            # creating them one at a time.
+            for content_type_id, object_id in keys:
+                self.get_or_create(content_type_id=content_type_id,
+                                   object_id=object_id)
+
+    def merge_duplicates(self, is_dry_run=False):
+        """Merges duplicate ActivityFor rows that have the same content type
+        and object id into a single row.  The ``for_objs`` through rows of the
+        duplicates are pointed at the row being kept before the duplicates
+        are deleted.
+
+        :param is_dry_run: if True, the duplicates are only found and
+            nothing is changed.
+        :return: dict of the ids of the rows being kept mapped to the list of
+            duplicate ids merged into it.
+        """
+        duplicates = (self.order_by()
+                          .values('content_type_id', 'object_id')
+                          .annotate(num_rows=Count('id'), keep_id=Min('id'))
+                          .filter(num_rows__gt=1))
+        merged_ids = {}
+
+        for duplicate in duplicates:
+            duplicate_ids = list(self.filter(
+                content_type_id=duplicate['content_type_id'],
+                object_id=duplicate['object_id']
+            ).exclude(id=duplicate['keep_id']).values_list('id', flat=True))
+            merged_ids[duplicate['keep_id']] = duplicate_ids
+
+            if is_dry_run:
+                continue
+
+            with transaction.atomic(using=self.db):
+                self._merge_into(keep_id=duplicate['keep_id'],
+                                 duplicate_ids=duplicate_ids)
+
+        return merged_ids
+
+    def _merge_into(self, keep_id, duplicate_ids):
+        """Repoints the through rows from the duplicates to the ActivityFor
+        being kept and deletes the duplicates.
+        """
+        for_objs_field = self.model._meta.get_field('for_objs').field
+        through_model = for_objs_field.rel.through
+        activity_attname = '{0}_id'.format(for_objs_field.m2m_field_name())
+        activity_for_attname = '{0}_id'.format(
+            for_objs_field.m2m_reverse_field_name()
+        )
+        through_rows = through_model.objects.filter(**{
+            '{0}__in'.format(activity_for_attname): duplicate_ids
+        })
+
+        # activities already linked to the row being kept only need the
+        # duplicate through rows removed.
+        through_rows.filter(**{
+            '{0}__in'.format(activity_attname): through_model.objects.filter(**{
+                activity_for_attname: keep_id
+            }).values(activity_attname)
+        }).delete()
+
+        # an activity can be linked to more than one of the duplicates so
+        # only repoint one through row per activity.
+        repoint_ids = (through_rows.order_by()
+                                   .values(activity_attname)
+                                   .annotate(through_id=Min('id'))
+                                   .values('through_id'))
+        through_model.objects.filter(
+            id__in=list(repoint_ids)
+        ).update(**{activity_for_attname: keep_id})
+        through_model.objects.filter(**{
+            '{0}__in'.format(activity_for_attname): duplicate_ids
+        }).delete()
+        self.filter(id__in=duplicate_ids).delete()
+
     def get_for_object(self, obj, **kwargs):
         """Gets instance for the obj.
 
         :param obj: the object to get the ActivityFor instances for.
         """
         content_type = ContentType.objects.get_for_model(obj)
+        pk = activity_for_cache.get((content_type.id, obj.id))
+
+        if pk is not None:
+            # filter by the primary key instead of the generic object
+            return self.filter(id=pk, **kwargs)
 
         return self.filter(
             content_type=content_type,
             object_id=obj.id,
             **kwargs
         )
+
+
+class ActivityFeedEntryManager(CommonManager):
+    """Model manager for the ActivityFeedEntry model."""
+
+    def create_for_activity(self, activity, activity_fors):
+        """Creates the feed entries for an activity.  One entry is created per
+        recipient.
+
+        :param activity: the activity to create the feed entries for.
+        :param activity_fors: iterable of ActivityFor objects the activity is
+            for.
+        """
+        return self.bulk_create([
+            self.model(activity=activity,
+                       content_type_id=activity_for.content_type_id,
+                       object_id=activity_for.object_id,
+                       created_dttm=activity.created_dttm,
+                       privacy=activity.privacy)
+            for activity_for in activity_fors
+        ])
+
+    def bulk_create_for_activities(self, feed_entries):
+        """Creates the feed entries for many activities at once.
+
+        :param feed_entries: iterable of ``(activity, activity_for)`` tuples.
+        """
+        return self.bulk_create([
+            self.model(activity_id=activity.id,
+                       content_type_id=activity_for.content_type_id,
+                       object_id=activity_for.object_id,
+                       created_dttm=activity.created_dttm,
+                       privacy=activity.privacy)
+            for activity, activity_for in feed_entries
+        ])
+
+    def remove_for_object(self, activity, obj):
+        """Removes an object's feed entry for an activity.
+
+        :param activity: the activity to remove the feed entry from.
+        :param obj: the recipient object to remove.
+        """
+        content_type = ContentType.objects.get_for_model(obj)
+        return self.filter(activity=activity,
+                           content_type=content_type,
+                           object_id=obj.id).delete()
+
+    def backfill(self, activity_id_start, activity_id_end):
+        """Rebuilds the feed entries for the activities in the id range from
+        the existing ``for_objs`` data.  Any existing feed entries for the
+        range are replaced so the backfill can safely be run more than once.
+
+        :param activity_id_start: the first activity id (inclusive).
+        :param activity_id_end: the last activity id (exclusive).
+        :return: the number of feed entries created.
+        """
+        activity_model = self.model._meta.get_field('activity').related_model
+        for_objs_field = activity_model._meta.get_field('for_objs')
+        through_model = for_objs_field.rel.through
+        activity_field = for_objs_field.m2m_field_name()
+        activity_for_field = for_objs_field.m2m_reverse_field_name()
+
+        rows = through_model.objects.filter(**{
+            '{0}_id__gte'.format(activity_field): activity_id_start,
+            '{0}_id__lt'.format(activity_field): activity_id_end
+        }).values_list(
+            '{0}_id'.format(activity_field),
+            '{0}__created_dttm'.format(activity_field),
+            '{0}__privacy'.format(activity_field),
+            '{0}__content_type_id'.format(activity_for_field),
+            '{0}__object_id'.format(activity_for_field)
+        )
+
+        feed_entries = [
+            self.model(activity_id=activity_id,
+                       created_dttm=created_dttm,
+                       privacy=privacy,
+                       content_type_id=content_type_id,
+                       object_id=object_id)
+            for activity_id, created_dttm, privacy, content_type_id, object_id
+            in rows
+        ]
+
+        self.filter(activity_id__gte=activity_id_start,
+                    activity_id__lt=activity_id_end).delete()
+        self.bulk_create(feed_entries)
+        return len(feed_entries)
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('activities', '0013_auto_20160301_1930'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityFeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('created_dttm', models.DateTimeField()),
+                ('privacy', models.CharField(choices=[('PUBLIC', 'Public - everyone can see'), ('PRIVATE', 'Private - only created user can see'), ('CUSTOM', 'Custom - users must be granted visibility')], max_length=20)),
+                ('activity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='activities.Activity')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='activityfeedentry',
+            unique_together=set([('activity', 'content_type', 'object_id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='activityfeedentry',
+            index_together=set([('content_type', 'object_id', 'created_dttm')]),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.db.models.aggregates import Count
+from django.db.models.aggregates import Min
+
+
+def merge_duplicate_activity_fors(apps, schema_editor):
+    """Merges duplicate ActivityFor rows so the unique constraint can be
+    added.  See ``ActivityForManager.merge_duplicates``.
+
+    The constraint is added in the next migration.  PostgreSQL foreign keys
+    are deferred so deleting the duplicates queues trigger events until the
+    transaction commits and an ALTER TABLE in the same transaction fails.
+    """
+    ActivityFor = apps.get_model('activities', 'ActivityFor')
+    Activity = apps.get_model('activities', 'Activity')
+    Through = Activity.for_objs.through
+
+    duplicates = (ActivityFor.objects.order_by()
+                                     .values('content_type_id', 'object_id')
+                                     .annotate(num_rows=Count('id'),
+                                               keep_id=Min('id'))
+                                     .filter(num_rows__gt=1))
+
+    for duplicate in duplicates:
+        keep_id = duplicate['keep_id']
+        duplicate_ids = list(ActivityFor.objects.filter(
+            content_type_id=duplicate['content_type_id'],
+            object_id=duplicate['object_id']
+        ).exclude(id=keep_id).values_list('id', flat=True))
+        linked_activity_ids = set(Through.objects.filter(
+            activityfor_id=keep_id
+        ).values_list('activity_id', flat=True))
+
+        for through in Through.objects.filter(
+                activityfor_id__in=duplicate_ids).order_by('id'):
+            if through.activity_id in linked_activity_ids:
+                through.delete()
+                continue
+
+            through.activityfor_id = keep_id
+            through.save()
+            linked_activity_ids.add(through.activity_id)
+
+        ActivityFor.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0014_activityfeedentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_activity_fors,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0015_merge_duplicate_activityfors'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='activityfor',
+            unique_together=set([('content_type', 'object_id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='activityfor',
+            index_together=set([]),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0017_activity_is_deleted'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='activity',
+            index_together=set([('created_user', 'action', 'privacy', 'created_dttm'), ('about_id', 'about_content_type', 'created_dttm'), ('created_dttm', 'id')]),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from activities import get_activity_model
 from activities.constants import Privacy
+from activities.deletion import delete_activities_about_object
 from django.contrib.contenttypes.fields import GenericRelation
 from django.db import models
 
@@ -48,5 +49,6 @@ class AbstractActivityModelMixin(models.Model):
         """
         super(AbstractActivityModelMixin, cls).post_delete(sender, instance,
                                                            **kwargs)
-        # need to delete any notifications about this object
-        get_activity_model().objects.delete_all_about_object(about=instance)
+        # need to delete any notifications about this object.  This may be
+        # deferred to a background purge (see ``activities.deletion``).
+        delete_activities_about_object(about=instance)
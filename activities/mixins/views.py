@@ -1,22 +1,36 @@
+from hashlib import md5
+
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import PermissionDenied
 from django.core.paginator import EmptyPage
-from django.core.paginator import Paginator
 from django.db.models import Q
 from django.http.response import HttpResponse
 from django.http.response import HttpResponseForbidden
 from django.shortcuts import render_to_response
 from django.template.context import RequestContext
+from django.utils.translation import get_language
 from django.views.generic.detail import SingleObjectMixin
 from django.views.generic.edit import FormView
+from django_core.utils.urls import build_url
 from django_core.views.mixins.auth import LoginRequiredViewMixin
 
 from .. import get_activity_model
 from ..constants import Action
 from ..constants import Source
 from ..forms import ActivityActionForm
+from ..generations import get_generations
+from ..generations import get_object_generation_key
 from ..http import ActivityResponse
+from ..instrumentation import clear_request_instrumentation
+from ..instrumentation import finish_request_instrumentation
+from ..instrumentation import instrument_phase
+from ..instrumentation import start_request_instrumentation
 from ..models import ActivityReply
+from ..paging import CursorPaginator
+from ..paging import HasMorePage
+from ..paging import HasMorePaginator
+from ..prefetch import prefetch_about_objects
+from ..prefetch import prefetch_latest_replies
 
 
 Activity = get_activity_model()
@@ -145,6 +159,29 @@ class ActivitiesViewMixin(object):
     * as: activity source.  Can be one of .contants.Source.
     * aa: activity action.  Can be one of .contants.Action.
 
+    Cursor paging:
+
+    When ``activities_cursor_paging`` is True, the activities are paged using
+    opaque ``(created_dttm, id)`` cursor tokens instead of page numbers so
+    every page costs the same regardless of depth and no count query is
+    issued.  The following query string params are used:
+
+    * before: cursor token to get the activities older than the cursor.
+    * after: cursor token to get the activities newer than the cursor.
+
+    Page number paging:
+
+    The ``activities_paginator_class`` is used for page number paging.  The
+    default ``HasMorePaginator`` never issues a count query.  Set this to
+    ``django.core.paginator.Paginator`` if the total count or number of pages
+    is needed.
+
+    Reply previews:
+
+    Only the newest ``activities_reply_preview_count`` replies of each
+    activity on the page are loaded and rendered as the activity's
+    ``activity_replies``.
+
     Note: This mixin requires the django_core.mixins.paging.PagingViewMixin
     to be called before this view is called.
     """
@@ -153,6 +190,11 @@ class ActivitiesViewMixin(object):
     activities_paginate_by = activities_page_size
     activities_page_kwarg = 'ap'
     activities_page_size_kwarg = 'aps'
+    activities_paginator_class = HasMorePaginator
+    activities_cursor_paging = False
+    activities_before_kwarg = 'before'
+    activities_after_kwarg = 'after'
+    activities_reply_preview_count = 3
 
     def dispatch(self, *args, **kwargs):
 
@@ -163,33 +205,165 @@ class ActivitiesViewMixin(object):
         self.activities_page_num, self.activities_page_size = \
             self.get_activities_paging()
         self.activities_paginate_by = self.activities_page_size
-        return super(ActivitiesViewMixin, self).dispatch(*args, **kwargs)
+        start_request_instrumentation(request=self.request)
+        response = None
+
+        try:
+            response = super(ActivitiesViewMixin, self).dispatch(*args,
+                                                                 **kwargs)
+        finally:
+            if response is None:
+                # the view raised so the request is never reported
+                clear_request_instrumentation()
+
+        return finish_request_instrumentation(request=self.request,
+                                              response=response,
+                                              sender=self.__class__)
 
     def get_context_data(self, **kwargs):
         context = super(ActivitiesViewMixin,
                         self).get_context_data(**kwargs)
 
-        activities = self.get_activities_queryset()
+        with instrument_phase('queryset', request=self.request):
+            activities = self.get_activities_queryset()
 
-        paginator = Paginator(activities, self.activities_page_size)
-        context['activities_paginator'] = paginator
+        with instrument_phase('page', request=self.request):
+            page = self.get_activities_page(activities=activities,
+                                            context=context)
 
-        try:
-            context['activities_page'] = \
-                paginator.page(self.activities_page_num)
-        except EmptyPage:
-            context['activities_page'] = paginator.page(paginator.num_pages)
+        with instrument_phase('prefetch', request=self.request):
+            page.object_list = prefetch_about_objects(
+                activities=page.object_list
+            )
+            prefetch_latest_replies(activities=page.object_list,
+                                    count=self.activities_reply_preview_count)
 
         about = self.get_activities_about_object()
         context['activities_about_object'] = about
 
-        self.get_user_shared_objects(context=context)
+        with instrument_phase('shared_objects', request=self.request):
+            self.get_user_shared_objects(context=context)
 
         if 'activity_url' not in context:
             context['activity_url'] = self.get_activity_url()
 
+        context['activities_next_url'] = self.get_activities_next_url(
+            page=context['activities_page'],
+            activity_url=context['activity_url']
+        )
+
         return context
 
+    def get_activities_page(self, activities, context):
+        """Gets the current page of activities and adds the
+        "activities_paginator" and "activities_page" to the context.  The
+        page's activities are fetched as a list.
+
+        :param activities: the queryset of activities to page.
+        :param context: the template context.
+        :return: the page.
+        """
+        if self.activities_cursor_paging:
+            paginator = CursorPaginator(activities, self.activities_page_size)
+            context['activities_paginator'] = paginator
+            context['activities_page'] = paginator.page(
+                before=self.request.GET.get(self.activities_before_kwarg),
+                after=self.request.GET.get(self.activities_after_kwarg)
+            )
+        else:
+            paginator = self.activities_paginator_class(
+                activities,
+                self.activities_page_size
+            )
+            context['activities_paginator'] = paginator
+
+            try:
+                context['activities_page'] = \
+                    paginator.page(self.activities_page_num)
+            except EmptyPage:
+                if hasattr(paginator, 'num_pages'):
+                    context['activities_page'] = \
+                        paginator.page(paginator.num_pages)
+                else:
+                    # the paginator doesn't count so it can't know what the
+                    # last page is.  Serve an empty last page so infinite
+                    # scrolling stops instead of re-serving the first page.
+                    context['activities_page'] = HasMorePage(
+                        object_list=[],
+                        number=self.activities_page_num,
+                        paginator=paginator,
+                        has_next=False
+                    )
+
+        page = context['activities_page']
+        page.object_list = list(page.object_list)
+        return page
+
+    def get_activities_next_url(self, page, activity_url):
+        """Gets the url for the next page of activities or None if there
+        isn't a next page.
+
+        :param page: the current page of activities.
+        :param activity_url: the url for the object's activities.
+        """
+        if not page.has_next():
+            return None
+
+        querystring_params = {
+            self.activities_page_size_kwarg: self.activities_page_size
+        }
+
+        if self.activities_cursor_paging:
+            querystring_params[self.activities_before_kwarg] = \
+                page.next_cursor
+        else:
+            querystring_params[self.activities_page_kwarg] = \
+                page.next_page_number()
+
+        # keep the source and action filters for the next page
+        for key in ('as', 'aa'):
+            value = self.request.GET.get(key)
+
+            if value:
+                querystring_params[key] = value.lower()
+
+        return build_url(url=activity_url,
+                         querystring_params=querystring_params)
+
+    def get_activities_cache_key(self, prefix='activities:feed'):
+        """Gets a cache key for the current page of activities that can be
+        used to cache the rendered feed.  The key includes the feed
+        generation of the activities "about" objects (see
+        ``activities.generations``) so creating, editing, replying to or
+        deleting an activity in the feed changes the key and the stale page is
+        never read again.  The key also varies by the viewing user, language
+        and the query string (paging and filters).
+
+        The ``ACTIVITIES_GENERATIONS_ENABLED`` setting must be True for the
+        generations to be maintained.
+
+        :param prefix: the prefix for the cache key.
+        """
+        about = self.get_activities_about_object()
+
+        if not isinstance(about, (list, tuple, set)):
+            about = [about]
+
+        keys = sorted(get_object_generation_key(obj) for obj in about)
+        generations = get_generations(keys)
+        key_parts = ['{0}:{1}:{2}'.format(content_type_id, object_id,
+                                          generations[(content_type_id,
+                                                       object_id)])
+                     for content_type_id, object_id in keys]
+        key_parts.extend([
+            '{0}'.format(self.request.user.id
+                         if self.request.user.is_authenticated() else ''),
+            get_language() or '',
+            self.request.get_full_path()
+        ])
+        key_hash = md5('|'.join(key_parts).encode('utf-8')).hexdigest()
+        return '{0}:{1}'.format(prefix, key_hash)
+
     def get_user_shared_objects(self, context):
         """Gets the dict of object shares by content type so the user can know
         if they have already shared that object.
@@ -280,12 +454,17 @@ class ActivitiesViewMixin(object):
         return queryset
 
     def get_activity_prefetch_related_fields(self):
-        """Returns a list of the activity fields to prefetch."""
+        """Returns a list of the activity fields to prefetch.  The "about"
+        objects aren't prefetched here since the generic prefetch can't follow
+        the "about" object's relations.  They're loaded with
+        ``activities.prefetch.prefetch_about_objects`` once the page of
+        activities has been fetched.  The replies aren't prefetched either
+        since only the newest ``activities_reply_preview_count`` replies are
+        shown.  They're loaded with
+        ``activities.prefetch.prefetch_latest_replies``.
+        """
         return [
-            'about',
             'about_content_type',
-            'replies',
-            'replies__created_user',
             'created_user'
         ]
 
@@ -1,18 +1,21 @@
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
-from django.db.models import F
 from django.db.models.deletion import SET_NULL
 from django.db.models.signals import post_delete
 from django.db.models.signals import post_save
+from django.db.models.signals import pre_delete
 from django.utils.translation import ugettext as _
 from django_core.db.models.mixins.base import AbstractBaseModel
 from django_core.db.models.mixins.generic import AbstractGenericObject
 from django_core.db.models.mixins.urls import AbstractUrlLinkModelMixin
 
+from .cache import activity_for_cache
 from .constants import Action
 from .constants import Privacy
 from .constants import Source
+from .counters import counter_buffer
+from .managers import ActivityFeedEntryManager
 from .managers import ActivityForManager
 from .managers import ActivityManager
 from .managers import ActivityReplyManager
@@ -54,6 +57,9 @@ class AbstractActivity(AbstractBaseModel):
         reference when listing out activities instead of listing 100 out
         individually.
     * reply_count: the denormalized number of replies to this activity
+    * is_deleted: boolean indicating if the activity has been tombstoned and
+        is waiting to be purged (see ``activities.deletion``).  Tombstoned
+        activities are excluded from the default manager.
     """
     text = models.TextField(blank=True, null=True)
     about = GenericForeignKey(ct_field='about_content_type',
@@ -61,6 +67,7 @@ class AbstractActivity(AbstractBaseModel):
     about_content_type = models.ForeignKey(ContentType, null=True, blank=True)
     about_id = models.PositiveIntegerField(null=True, blank=True)
     reply_count = models.IntegerField(default=0)
+    is_deleted = models.BooleanField(default=False, db_index=True)
     for_objs = models.ManyToManyField('ActivityFor',
                                       related_name='for_objs',
                                       blank=True)
@@ -272,7 +279,8 @@ class Activity(AbstractUrlLinkModelMixin, AbstractActivity):
     class Meta:
         index_together = (
             ('about_id', 'about_content_type', 'created_dttm'),
-            ('created_user', 'action', 'privacy', 'created_dttm')
+            ('created_user', 'action', 'privacy', 'created_dttm'),
+            ('created_dttm', 'id')
         )
 
     def get_absolute_url(self):
@@ -287,6 +295,15 @@ class Activity(AbstractUrlLinkModelMixin, AbstractActivity):
     def get_delete_url(self):
         return '{0}/delete'.format(self.get_absolute_url())
 
+    @classmethod
+    def pre_delete(cls, sender, instance, **kwargs):
+        """Pre delete fires before the object is deleted.  The recipients are
+        still available here.
+        """
+        type(instance).objects.bump_feed_generations(
+            activity_ids=[instance.id]
+        )
+
     @classmethod
     def post_delete(cls, sender, instance, **kwargs):
         """Post delete fires after the object is deleted."""
@@ -294,20 +311,23 @@ class Activity(AbstractUrlLinkModelMixin, AbstractActivity):
             instance.about and
             hasattr(instance.about, 'share_count')):
             # check to see if the share count has been denormalized on the
-            # about object.  If so, increment the value.
-            if instance.about.share_count > 0:
-                share_count = F('share_count') - 1
-            else:
-                # can't have a negative share count
-                share_count = 0
-
-            type(instance.about).objects.filter(id=instance.about.id).update(
-                share_count=share_count
-            )
+            # about object.  If so, decrement the value.
+            counter_buffer.add(model=type(instance.about),
+                               pk=instance.about.id,
+                               field='share_count',
+                               delta=-1)
 
     @classmethod
     def post_save(cls, sender, instance, created, **kwargs):
         """Post save signal that fires after saved."""
+        if not created:
+            # the activity was edited.  New activities bump the generations
+            # once their recipients have been added.
+            type(instance).objects.bump_feed_generations(
+                activity_ids=[instance.id]
+            )
+            # the privacy may have been changed by the edit.
+            type(instance).objects.sync_feed_entry_privacy(activity=instance)
 
         if (created and
             instance.action == Action.SHARED and
@@ -315,12 +335,14 @@ class Activity(AbstractUrlLinkModelMixin, AbstractActivity):
             hasattr(instance.about, 'share_count')):
             # check to see if the share count has been denormalized on the
             # about object.  If so, increment the value.
-            type(instance.about).objects.filter(id=instance.about.id).update(
-                share_count=F('share_count') + 1
-            )
+            counter_buffer.add(model=type(instance.about),
+                               pk=instance.about.id,
+                               field='share_count',
+                               delta=1)
 
 
 post_save.connect(Activity.post_save, sender=Activity)
+pre_delete.connect(Activity.pre_delete, sender=Activity)
 post_delete.connect(Activity.post_delete, sender=Activity)
 
 
@@ -360,17 +382,28 @@ class ActivityReply(AbstractUrlLinkModelMixin, AbstractBaseModel):
         """Post save signal that fires after saved."""
 
         if created:
-            Activity.objects.filter(id=instance.activity.id).update(
-                reply_count=F('reply_count') + 1
-            )
+            counter_buffer.add(model=Activity,
+                               pk=instance.activity_id,
+                               field='reply_count',
+                               delta=1)
+
+        Activity.objects.bump_feed_generations(
+            activity_ids=[instance.activity_id]
+        )
 
     @classmethod
     def post_delete(cls, sender, instance, **kwargs):
         """Post delete fires after the object is deleted."""
-        if instance.activity and instance.activity.reply_count > 0:
-            Activity.objects.filter(id=instance.activity.id).update(
-                reply_count=F('reply_count') - 1
-            )
+        # buffered increments aren't in the database yet so always decrement.
+        # The counter is never decremented below 0.
+        counter_buffer.add(model=Activity,
+                           pk=instance.activity_id,
+                           field='reply_count',
+                           delta=-1)
+
+        Activity.objects.bump_feed_generations(
+            activity_ids=[instance.activity_id]
+        )
 
 
 post_save.connect(ActivityReply.post_save, sender=ActivityReply)
@@ -378,11 +411,59 @@ post_delete.connect(ActivityReply.post_delete, sender=ActivityReply)
 
 
 class ActivityFor(AbstractGenericObject):
-    """Defines the generic object a activity is for."""
+    """Defines the generic object a activity is for.  There is only ever one
+    instance per generic object.
+    """
     objects = ActivityForManager()
 
     class Meta:
-        index_together = (('object_id', 'content_type'),)
+        unique_together = (('content_type', 'object_id'),)
 
     def __str__(self):
         return '{0} {1}'.format(self.content_type, self.object_id)
+
+    @classmethod
+    def get_key(cls, obj):
+        """Gets the ``(content_type_id, object_id)`` key for an object."""
+        content_type = ContentType.objects.get_for_model(obj)
+        return content_type.id, obj.id
+
+    @classmethod
+    def post_delete(cls, sender, instance, **kwargs):
+        """Post delete fires after the object is deleted."""
+        activity_for_cache.delete((instance.content_type_id,
+                                   instance.object_id))
+
+
+post_delete.connect(ActivityFor.post_delete, sender=ActivityFor)
+
+
+class ActivityFeedEntry(models.Model):
+    """Materialized feed entry for an activity.  There is one entry per
+    activity recipient (the ``for_objs`` of the activity) which allows feed
+    reads to be done without joining through the ``for_objs`` table.  Entries
+    are only written when the ``ACTIVITIES_FEED_ENTRIES_ENABLED`` setting is
+    True.
+
+    Attributes:
+
+    * activity: the activity the feed entry is for.
+    * content_type: the content type of the recipient object.
+    * object_id: the id of the recipient object.
+    * created_dttm: the denormalized created datetime of the activity.
+    * privacy: the denormalized privacy of the activity.
+    """
+    activity = models.ForeignKey('Activity', related_name='feed_entries')
+    content_type = models.ForeignKey(ContentType)
+    object_id = models.PositiveIntegerField()
+    created_dttm = models.DateTimeField()
+    privacy = models.CharField(max_length=20, choices=Privacy.CHOICES)
+    objects = ActivityFeedEntryManager()
+
+    class Meta:
+        unique_together = (('activity', 'content_type', 'object_id'),)
+        index_together = (('content_type', 'object_id', 'created_dttm'),)
+
+    def __str__(self):
+        return '{0} {1} {2}'.format(self.activity_id, self.content_type,
+                                    self.object_id)
@@ -0,0 +1,269 @@
+import binascii
+from base64 import urlsafe_b64decode
+from base64 import urlsafe_b64encode
+
+from django.core.paginator import EmptyPage
+from django.core.paginator import PageNotAnInteger
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(obj):
+    """Encodes an opaque cursor token for an object.  The token is keyed on
+    the object's ``(created_dttm, id)`` which matches the order activities
+    are returned in.
+
+    :param obj: the object to encode the cursor for.
+    """
+    value = '{0}|{1}'.format(obj.created_dttm.isoformat(), obj.id)
+    return urlsafe_b64encode(value.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Decodes a cursor token into a ``(created_dttm, id)`` tuple.
+
+    :param token: the cursor token created by ``encode_cursor``.
+    :return: tuple of the created datetime and id or None if the token isn't
+        valid.
+    """
+    if not token:
+        return None
+
+    try:
+        padding = '=' * (-len(token) % 4)
+        value = urlsafe_b64decode((token + padding).encode('ascii'))
+        created_dttm, obj_id = value.decode('utf-8').split('|')
+        created_dttm = parse_datetime(created_dttm)
+        obj_id = int(obj_id)
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        return None
+
+    if created_dttm is None:
+        return None
+
+    return created_dttm, obj_id
+
+
+class CursorPaginator(object):
+    """Paginator that pages through a queryset using ``(created_dttm, id)``
+    cursors instead of offsets.  No count query is issued and every page
+    costs the same regardless of how deep the user has paged.  New objects
+    added while paging don't shift objects between pages.
+
+    >>> paginator = CursorPaginator(Activity.objects.all(), per_page=15)
+    >>> page = paginator.page()
+    >>> next_page = paginator.page(before=page.next_cursor)
+    """
+
+    def __init__(self, object_list, per_page, order_field='created_dttm'):
+        """
+        :param object_list: the queryset to page through.
+        :param per_page: the number of objects per page.
+        :param order_field: (optional) the field the objects are ordered by.
+            This must have the same value as the object's ``created_dttm``
+            (i.e. "feed_entries__created_dttm" for activities read from the
+            feed entries) since the cursors are keyed on ``created_dttm``.
+        """
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.order_field = order_field
+
+    def page(self, before=None, after=None):
+        """Gets a page of objects.
+
+        :param before: cursor token.  Gets the page of objects older than the
+            object the cursor was created from.
+        :param after: cursor token.  Gets the page of objects newer than the
+            object the cursor was created from.
+        """
+        before = decode_cursor(before)
+        after = None if before else decode_cursor(after)
+        queryset = self.object_list
+
+        if after:
+            created_dttm, obj_id = after
+            queryset = queryset.filter(
+                Q(created_dttm__gt=created_dttm) |
+                Q(created_dttm=created_dttm, id__gt=obj_id)
+            ).order_by(self.order_field, 'id')
+        else:
+            if before:
+                created_dttm, obj_id = before
+                queryset = queryset.filter(
+                    Q(created_dttm__lt=created_dttm) |
+                    Q(created_dttm=created_dttm, id__lt=obj_id)
+                )
+
+            queryset = queryset.order_by('-{0}'.format(self.order_field),
+                                         '-id')
+
+        # fetch one extra object to know if there's another page without
+        # having to count.
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+
+        if after:
+            object_list.reverse()
+            return CursorPage(object_list=object_list,
+                              paginator=self,
+                              has_next=True,
+                              has_previous=has_more)
+
+        return CursorPage(object_list=object_list,
+                          paginator=self,
+                          has_next=has_more,
+                          has_previous=before is not None)
+
+
+class CursorPage(object):
+    """A page of objects returned from the ``CursorPaginator``."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<CursorPage: {0} objects>'.format(len(self.object_list))
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next and len(self.object_list) > 0
+
+    def has_previous(self):
+        return self._has_previous and len(self.object_list) > 0
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        """The ``before`` cursor token for the next (older) page."""
+        if not self.has_next():
+            return None
+
+        return encode_cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        """The ``after`` cursor token for the previous (newer) page."""
+        if not self.has_previous():
+            return None
+
+        return encode_cursor(self.object_list[0])
+
+
+class HasMorePaginator(object):
+    """Paginator that never counts the objects being paged.  Each page
+    fetches ``per_page + 1`` objects to know if there's a next page.  This is
+    a drop in replacement for ``django.core.paginator.Paginator`` for views
+    and templates that only need to know if there are more objects (i.e.
+    ``has_next``) and not the total number of objects or pages.
+
+    >>> paginator = HasMorePaginator(Activity.objects.all(), per_page=15)
+    >>> page = paginator.page(2)
+    >>> page.has_next()
+    """
+
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True):
+        """
+        :param object_list: the queryset to page through.
+        :param per_page: the number of objects per page.
+        :param orphans: not used.  Accepted for compatibility with django's
+            Paginator.
+        :param allow_empty_first_page: if False, an EmptyPage error is raised
+            when the first page has no objects.
+        """
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.orphans = int(orphans)
+        self.allow_empty_first_page = allow_empty_first_page
+
+    def validate_number(self, number):
+        """Validates the given 1-based page number."""
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+
+        return number
+
+    def page(self, number):
+        """Returns a page for the given 1-based page number."""
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+
+        # fetch one extra object to know if there's another page without
+        # having to count.
+        object_list = list(self.object_list[bottom:top + 1])
+        has_next = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+
+        if not object_list and (number > 1 or
+                                not self.allow_empty_first_page):
+            raise EmptyPage('That page contains no results')
+
+        return HasMorePage(object_list=object_list,
+                           number=number,
+                           paginator=self,
+                           has_next=has_next)
+
+
+class HasMorePage(object):
+    """A page of objects returned from the ``HasMorePaginator``."""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._has_next = has_next
+
+    def __repr__(self):
+        return '<HasMorePage {0}>'.format(self.number)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    def next_page_number(self):
+        if not self.has_next():
+            raise EmptyPage('That page contains no results')
+
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.paginator.validate_number(self.number - 1)
+
+    def start_index(self):
+        """Returns the 1-based index of the first object on this page."""
+        if not self.object_list:
+            return 0
+
+        return (self.paginator.per_page * (self.number - 1)) + 1
+
+    def end_index(self):
+        """Returns the 1-based index of the last object on this page."""
+        return self.start_index() + len(self.object_list) - 1
@@ -0,0 +1,307 @@
+import re
+from datetime import datetime
+
+from django.db import connections
+from django.db import router
+
+from . import get_activity_model
+
+
+def get_partitioned_models():
+    """Gets the models whose tables can be range partitioned by month on
+    ``created_dttm``: the activities and their materialized recipients (the
+    feed entries).  The ``for_objs`` through table has no ``created_dttm`` so
+    it isn't partitioned.  Enable ``ACTIVITIES_FEED_ENTRIES_ENABLED`` to read
+    the recipients from the partitioned feed entries instead.
+    """
+    Activity = get_activity_model()
+    return [Activity, Activity.objects._get_feed_entry_model()]
+
+
+def get_month_start(dttm, months=0):
+    """Gets the first day of the month of ``dttm``, offset by a number of
+    months.
+
+    :param dttm: the date or datetime.
+    :param months: the number of months to add (or subtract when negative).
+    """
+    month_index = dttm.year * 12 + dttm.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def get_partition_name(table, month_start):
+    """Gets the name of the partition of a table for a month."""
+    return '{0}_p{1:%Y%m}'.format(table, month_start)
+
+
+def get_connection(model):
+    """Gets the connection for the model's database."""
+    return connections[router.db_for_write(model)]
+
+
+def supports_partitioning(connection):
+    """Boolean indicating if the database supports declarative range
+    partitioning (PostgreSQL 10+).  Other databases (i.e. SQLite in tests)
+    use plain tables.
+    """
+    return (connection.vendor == 'postgresql' and
+            connection.pg_version >= 100000)
+
+
+def is_partitioned(model):
+    """Boolean indicating if the model's table is partitioned."""
+    connection = get_connection(model)
+
+    if not supports_partitioning(connection):
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE oid = %s::regclass',
+                       [model._meta.db_table])
+        row = cursor.fetchone()
+
+    return row is not None and row[0] == 'p'
+
+
+def get_partition_months(model):
+    """Gets the months of the existing monthly partitions of the model's
+    table.  Partitions that weren't created by ``create_partition`` (i.e. the
+    legacy partition) aren't included.
+
+    :return: sorted list of the month start datetimes.
+    """
+    if not is_partitioned(model):
+        return []
+
+    table = model._meta.db_table
+    name_pattern = re.compile(r'^{0}_p(\d{{4}})(\d{{2}})$'.format(
+        re.escape(table)
+    ))
+
+    with get_connection(model).cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i '
+            'JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass',
+            [table]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    months = []
+
+    for name in names:
+        match = name_pattern.match(name)
+
+        if match:
+            months.append(datetime(int(match.group(1)),
+                                   int(match.group(2)), 1))
+
+    return sorted(months)
+
+
+def create_partition(model, month_start):
+    """Creates the partition of the model's table for a month if it doesn't
+    exist.
+
+    :return: boolean indicating if the partition was created.
+    """
+    if not is_partitioned(model) or month_start in get_partition_months(model):
+        return False
+
+    connection = get_connection(model)
+    table = model._meta.db_table
+    quote_name = connection.ops.quote_name
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TABLE {0} PARTITION OF {1} '
+            'FOR VALUES FROM (%s) TO (%s)'.format(
+                quote_name(get_partition_name(table, month_start)),
+                quote_name(table)
+            ),
+            [month_start, get_month_start(month_start, months=1)]
+        )
+
+    return True
+
+
+def detach_partition(model, month_start):
+    """Detaches the partition of the model's table for a month.  The detached
+    table keeps its rows so it can be archived or dropped separately.
+
+    :return: boolean indicating if the partition was detached.
+    """
+    if month_start not in get_partition_months(model):
+        return False
+
+    connection = get_connection(model)
+    quote_name = connection.ops.quote_name
+
+    with connection.cursor() as cursor:
+        cursor.execute('ALTER TABLE {0} DETACH PARTITION {1}'.format(
+            quote_name(model._meta.db_table),
+            quote_name(get_partition_name(model._meta.db_table, month_start))
+        ))
+
+    return True
+
+
+def get_index_column_sql(column, option=0):
+    """Gets the SQL of an index column with its sort order.
+
+    :param column: the column (or expression) definition.
+    :param option: the ``pg_index.indoption`` flags of the column.
+    """
+    is_desc = bool(option & 1)
+    is_nulls_first = bool(option & 2)
+
+    if is_desc:
+        column = '{0} DESC'.format(column)
+
+    if is_nulls_first != is_desc:
+        # not the default nulls order for the sort order
+        column = '{0} NULLS {1}'.format(column,
+                                        'FIRST' if is_nulls_first else 'LAST')
+
+    return column
+
+
+def get_index_sql(name, table, method, columns, num_key_columns,
+                  predicate=None, is_unique=False):
+    """Gets the CREATE INDEX statement for an index of a partitioned table.
+    Unique indexes have ``created_dttm`` added to their key columns since
+    PostgreSQL requires the partition key in them.
+
+    :param name: the quoted index name.
+    :param table: the quoted table name.
+    :param method: the index access method (i.e. "btree").
+    :param columns: the column definitions, key columns first followed by
+        the INCLUDE columns.
+    :param num_key_columns: the number of key columns.
+    :param predicate: (optional) the WHERE clause of a partial index.
+    :param is_unique: boolean indicating if the index is unique.
+    """
+    key_columns = list(columns[:num_key_columns])
+    include_columns = columns[num_key_columns:]
+
+    if is_unique and 'created_dttm' not in [column.split(' ')[0].strip('"')
+                                            for column in key_columns]:
+        key_columns.append('created_dttm')
+
+    sql = 'CREATE {0}INDEX {1} ON {2} USING {3} ({4})'.format(
+        'UNIQUE ' if is_unique else '',
+        name,
+        table,
+        method,
+        ', '.join(key_columns)
+    )
+
+    if include_columns:
+        sql = '{0} INCLUDE ({1})'.format(sql, ', '.join(include_columns))
+
+    if predicate:
+        sql = '{0} WHERE {1}'.format(sql, predicate)
+
+    return '{0};'.format(sql)
+
+
+def get_convert_sql(model, first_month_start):
+    """Gets the SQL statements that convert the model's existing table into a
+    table partitioned by month on ``created_dttm``.  This is an opt-in, one
+    time migration that should be reviewed and run by hand during a
+    maintenance window:
+
+    1. the existing table is renamed to ``<table>_legacy``.
+    2. a partitioned table is created in its place with the same columns and
+       indexes.  Unique indexes (including the primary key) include
+       ``created_dttm`` since PostgreSQL requires the partition key in them.
+    3. the legacy table is attached as the partition of everything before
+       ``first_month_start``.
+    4. the foreign keys referencing the table are dropped since a partitioned
+       table can't be referenced by ``id`` alone.  Related rows are still
+       deleted by the managers (see ``ActivityManager.fast_delete``).
+
+    :param model: the model to partition.
+    :param first_month_start: the month of the first monthly partition.
+        Create it (and the following ones) with ``create_partition`` after the
+        conversion.
+    :return: list of SQL statements.
+    """
+    connection = get_connection(model)
+    quote_name = connection.ops.quote_name
+    table = model._meta.db_table
+    legacy_table = '{0}_legacy'.format(table)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT conname, conrelid::regclass::text FROM pg_constraint '
+            'WHERE confrelid = %s::regclass AND contype = %s',
+            [table, 'f']
+        )
+        foreign_keys = cursor.fetchall()
+        # the index definitions are rebuilt from their parts instead of
+        # editing the pg_get_indexdef output since partial and covering
+        # (INCLUDE) indexes don't end with the key columns.
+        cursor.execute(
+            'SELECT c.relname, i.indisunique, i.indisprimary, am.amname, '
+            'ARRAY(SELECT pg_get_indexdef(i.indexrelid, k + 1, true) '
+            '      FROM generate_subscripts(i.indkey, 1) AS k ORDER BY k), '
+            'ARRAY(SELECT i.indoption[k] '
+            '      FROM generate_subscripts(i.indkey, 1) AS k ORDER BY k), '
+            '{0}, pg_get_expr(i.indpred, i.indrelid) FROM pg_index i '
+            'JOIN pg_class c ON c.oid = i.indexrelid '
+            'JOIN pg_am am ON am.oid = c.relam '
+            'WHERE i.indrelid = %s::regclass'.format(
+                # INCLUDE columns were added in PostgreSQL 11
+                'i.indnkeyatts' if connection.pg_version >= 110000
+                else 'i.indnatts'
+            ),
+            [table]
+        )
+        indexes = cursor.fetchall()
+
+    statements = [
+        'ALTER TABLE {0} DROP CONSTRAINT {1};'.format(quote_name(related_table),
+                                                       quote_name(name))
+        for name, related_table in foreign_keys
+    ]
+    statements.append('ALTER TABLE {0} RENAME TO {1};'.format(
+        quote_name(table),
+        quote_name(legacy_table)
+    ))
+    statements.append(
+        'CREATE TABLE {0} (LIKE {1} INCLUDING DEFAULTS) '
+        'PARTITION BY RANGE (created_dttm);'.format(quote_name(table),
+                                                   quote_name(legacy_table))
+    )
+    statements.append(
+        'ALTER TABLE {0} ADD PRIMARY KEY (id, created_dttm);'.format(
+            quote_name(table)
+        )
+    )
+
+    for (name, is_unique, is_primary, method, columns, options,
+         num_key_columns, predicate) in indexes:
+        if is_primary:
+            continue
+
+        statements.append(get_index_sql(
+            name=quote_name('p_{0}'.format(name)[:63]),
+            table=quote_name(table),
+            method=method,
+            columns=[get_index_column_sql(column, option)
+                     for column, option in zip(columns, options)],
+            num_key_columns=num_key_columns,
+            predicate=predicate,
+            is_unique=is_unique
+        ))
+
+    statements.append(
+        "ALTER TABLE {0} ATTACH PARTITION {1} "
+        "FOR VALUES FROM (MINVALUE) TO ('{2:%Y-%m-%d}');".format(
+            quote_name(table),
+            quote_name(legacy_table),
+            first_month_start
+        )
+    )
+    return statements
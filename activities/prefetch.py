@@ -0,0 +1,143 @@
+from django.contrib.contenttypes.models import ContentType
+
+
+_about_model_specs = {}
+
+
+def register_about_model(model, select_related=None, prefetch_related=None,
+                         cache_fragments=True):
+    """Registers how the "about" objects of a model should be loaded when
+    activities are rendered.  This lets the "about" object's own relations
+    (the ones used by ``get_absolute_url``, ``get_activity_action_html``,
+    etc) be loaded with the "about" objects instead of one query per
+    activity.
+
+    >>> register_about_model(Image, select_related=['album'],
+    ...                      prefetch_related=['tags'])
+
+    Instead of registering the model, the model can also declare the
+    ``activity_about_select_related``, ``activity_about_prefetch_related``
+    and ``activity_cache_fragments`` class attributes.
+
+    :param model: the "about" model class.
+    :param select_related: list of related fields to select with the "about"
+        objects.
+    :param prefetch_related: list of related fields to prefetch for the
+        "about" objects.
+    :param cache_fragments: boolean indicating if the rendered html of
+        activities about this model can be cached (see
+        ``activities.fragments``).  Set this to False if the model's
+        ``get_activity_*_html`` methods render differently depending on the
+        user viewing the activity.
+    """
+    _about_model_specs[model] = {
+        'select_related': list(select_related or []),
+        'prefetch_related': list(prefetch_related or []),
+        'cache_fragments': cache_fragments
+    }
+
+
+def unregister_about_model(model):
+    """Removes a registered "about" model."""
+    _about_model_specs.pop(model, None)
+
+
+def get_about_model_spec(model):
+    """Gets the dict of ``select_related`` and ``prefetch_related`` fields to
+    use when loading "about" objects of the model and whether the rendered
+    activity html can be cached.
+
+    :param model: the "about" model class.
+    """
+    if model in _about_model_specs:
+        return _about_model_specs[model]
+
+    return {
+        'select_related': list(getattr(model,
+                                       'activity_about_select_related',
+                                       None) or []),
+        'prefetch_related': list(getattr(model,
+                                         'activity_about_prefetch_related',
+                                         None) or []),
+        'cache_fragments': getattr(model, 'activity_cache_fragments', True)
+    }
+
+
+def prefetch_about_objects(activities):
+    """Loads the "about" objects for the activities.  The "about" objects are
+    grouped by content type and loaded with one query per content type (plus
+    any prefetch queries) using the registered ``select_related`` and
+    ``prefetch_related`` for each model.  The loaded objects are cached on
+    the activities so accessing ``activity.about`` won't query the database.
+
+    :param activities: list of activities to load the "about" objects for.
+    :return: the list of activities.
+    """
+    about_ids_by_content_type_id = {}
+
+    for activity in activities:
+        if activity.about_content_type_id and activity.about_id:
+            about_ids_by_content_type_id.setdefault(
+                activity.about_content_type_id, set()
+            ).add(activity.about_id)
+
+    about_objects = {}
+
+    for content_type_id, about_ids in about_ids_by_content_type_id.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+
+        if model is None:
+            # the model no longer exists.
+            continue
+
+        spec = get_about_model_spec(model)
+        queryset = model._default_manager.filter(pk__in=about_ids)
+
+        if spec['select_related']:
+            queryset = queryset.select_related(*spec['select_related'])
+
+        if spec['prefetch_related']:
+            queryset = queryset.prefetch_related(*spec['prefetch_related'])
+
+        for about in queryset:
+            about_objects[(content_type_id, about.pk)] = about
+
+    for activity in activities:
+        if activity.about_content_type_id in about_ids_by_content_type_id:
+            # objects that no longer exist are cached as None so they aren't
+            # queried for again.
+            setattr(activity, type(activity).about.cache_attr,
+                    about_objects.get((activity.about_content_type_id,
+                                       activity.about_id)))
+
+    return activities
+
+
+def prefetch_latest_replies(activities, count):
+    """Loads the newest ``count`` replies for each of the activities instead
+    of every reply.  The replies are set on each activity as the
+    ``latest_replies`` list (newest first) and are rendered as the activity
+    reply preview.
+
+    :param activities: list of activities to load the replies for.
+    :param count: the max number of replies to load per activity.
+    :return: the list of activities.
+    """
+    if not activities:
+        return activities
+
+    reply_model = type(activities[0])._meta.get_field('replies').related_model
+    replies_by_activity_id = reply_model.objects.get_latest_by_activity(
+        activity_ids=[activity.id for activity in activities],
+        count=count
+    )
+
+    for activity in activities:
+        activity.latest_replies = replies_by_activity_id[activity.id]
+
+        for reply in activity.latest_replies:
+            # the reply urls are built from the activity's url so reuse the
+            # activity (and its prefetched "about" object).
+            reply.activity = activity
+
+    return activities
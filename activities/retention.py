@@ -0,0 +1,248 @@
+from datetime import datetime
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+
+from . import get_activity_model
+
+
+def get_retention_rules():
+    """Gets the retention rules from the ``ACTIVITIES_RETENTION_POLICY``
+    setting.  The setting is a list of dicts with the following keys:
+
+    * days: (required) the number of days the matching activities are kept.
+    * action: (optional) the activity action (i.e. "UPDATED").
+    * source: (optional) the activity source (i.e. "SYSTEM").
+    * about_content_type: (optional) the "app_label.model" content type of
+        the activity's "about" object.
+
+    When an activity matches more than one rule, only the most specific rule
+    (the one matching the most of action, source and about_content_type)
+    applies to it.  Ties go to the rule listed first.
+
+    Example that drops SYSTEM "UPDATED" activities after 90 days, keeps
+    comments for 5 years and drops all other activities after 2 years:
+
+        ACTIVITIES_RETENTION_POLICY = [
+            {'source': 'SYSTEM', 'action': 'UPDATED', 'days': 90},
+            {'action': 'COMMENTED', 'days': 1825},
+            {'days': 730},
+        ]
+    """
+    return [RetentionRule.from_dict(rule) for rule in
+            getattr(settings, 'ACTIVITIES_RETENTION_POLICY', None) or []]
+
+
+class RetentionRule(object):
+    """A rule for how long the activities matching it are kept."""
+
+    def __init__(self, days, action=None, source=None,
+                 about_content_type=None):
+        """
+        :param days: the number of days the matching activities are kept.
+        :param action: (optional) the activity action to match.
+        :param source: (optional) the activity source to match.
+        :param about_content_type: (optional) the "app_label.model" content
+            type of the "about" object to match.
+        """
+        self.days = days
+        self.action = action
+        self.source = source
+        self.about_content_type = about_content_type
+
+    def __str__(self):
+        return ', '.join(
+            ['{0}={1}'.format(attr, getattr(self, attr))
+             for attr in ('source', 'action', 'about_content_type')
+             if getattr(self, attr)] +
+            ['days={0}'.format(self.days)]
+        )
+
+    @classmethod
+    def from_dict(cls, rule):
+        """Creates a rule from a ``ACTIVITIES_RETENTION_POLICY`` dict."""
+        if not isinstance(rule.get('days'), int) or rule['days'] < 0:
+            raise ImproperlyConfigured(
+                'ACTIVITIES_RETENTION_POLICY rules must have a non-negative '
+                'number of "days": {0}'.format(rule)
+            )
+
+        unknown_keys = set(rule) - set(('days', 'action', 'source',
+                                        'about_content_type'))
+
+        if unknown_keys:
+            raise ImproperlyConfigured(
+                'Unknown ACTIVITIES_RETENTION_POLICY rule keys: {0}'.format(
+                    ', '.join(sorted(unknown_keys))
+                )
+            )
+
+        return cls(**rule)
+
+    def get_cutoff(self, now=None):
+        """Gets the datetime before which the matching activities expire."""
+        return (now or datetime.utcnow()) - timedelta(days=self.days)
+
+    def get_specificity(self):
+        """Gets the number of criteria the rule matches on.  More specific
+        rules take precedence over less specific ones.
+        """
+        return len([attr for attr in ('action', 'source', 'about_content_type')
+                    if getattr(self, attr)])
+
+    def get_filter(self):
+        """Gets the ``Q`` of the activities matching the rule's criteria."""
+        rule_filter = Q()
+
+        if self.action:
+            rule_filter &= Q(action=self.action)
+
+        if self.source:
+            rule_filter &= Q(source=self.source)
+
+        if self.about_content_type:
+            app_label, model = self.about_content_type.lower().split('.')
+            rule_filter &= Q(
+                about_content_type=ContentType.objects.get_by_natural_key(
+                    app_label, model
+                )
+            )
+
+        return rule_filter
+
+    def get_queryset(self, now=None, overriding_rules=None):
+        """Gets the queryset of the expired activities matching the rule.
+
+        :param now: (optional) the current datetime.  Defaults to utcnow.
+        :param overriding_rules: (optional) the rules that take precedence
+            over this rule (see ``get_overriding_rules``).  Activities matching
+            them are excluded.
+        """
+        Activity = get_activity_model()
+        queryset = Activity._base_manager.filter(
+            self.get_filter(),
+            created_dttm__lt=self.get_cutoff(now=now)
+        )
+
+        for rule in overriding_rules or []:
+            queryset = queryset.exclude(rule.get_filter())
+
+        return queryset
+
+
+def get_overriding_rules(rule, rules):
+    """Gets the rules that take precedence over a rule for the activities
+    they both match: the more specific rules and the equally specific rules
+    listed before it.
+
+    :param rule: the ``RetentionRule``.
+    :param rules: the list of all the ``RetentionRule``s.
+    """
+    specificity = rule.get_specificity()
+    overriding_rules = []
+
+    for other in rules:
+        if other is rule:
+            # rules listed after this one only win if they're more specific
+            specificity += 1
+            continue
+
+        if other.get_specificity() >= specificity:
+            overriding_rules.append(other)
+
+    return overriding_rules
+
+
+def get_expired_batches(queryset, batch_size=1000):
+    """Gets the ids of the activities in the queryset in batches walked in
+    ``(created_dttm, id)`` order.  Each batch starts after the last
+    ``(created_dttm, id)`` of the previous batch so the walk uses the
+    ``created_dttm`` index and doesn't depend on the ids increasing with
+    ``created_dttm`` (i.e. backdated or restored activities).  Only one batch
+    of ids is held in memory at a time and the activities of a batch can be
+    deleted before the next batch is read.
+
+    :param queryset: the queryset of activities.
+    :param batch_size: the max number of ids per batch.
+    """
+    last_created_dttm = last_id = None
+
+    while True:
+        batch_queryset = queryset
+
+        if last_id is not None:
+            batch_queryset = batch_queryset.filter(
+                Q(created_dttm__gt=last_created_dttm) |
+                Q(created_dttm=last_created_dttm, id__gt=last_id)
+            )
+
+        rows = list(batch_queryset.order_by('created_dttm', 'id').values_list(
+            'created_dttm', 'id'
+        )[:batch_size])
+
+        if not rows:
+            return
+
+        yield [activity_id for created_dttm, activity_id in rows]
+        last_created_dttm, last_id = rows[-1]
+
+
+def prune_rule(rule, batch_size=1000, is_dry_run=True, now=None,
+               rules=None):
+    """Deletes the activities that expired by a retention rule in batches of
+    ``(created_dttm, id)`` order, along with their replies, recipient through
+    rows and feed entries (see ``ActivityManager.fast_delete``).
+
+    :param rule: the ``RetentionRule``.
+    :param batch_size: the max number of activities to delete per batch.
+    :param is_dry_run: if True, the activities are counted but not deleted.
+    :param now: (optional) the current datetime.  Defaults to utcnow.
+    :param rules: (optional) all the rules of the policy.  Activities that a
+        rule taking precedence over this one matches aren't deleted.
+    :return: the number of activities deleted (or that would be deleted).
+    """
+    Activity = get_activity_model()
+    queryset = rule.get_queryset(
+        now=now,
+        overriding_rules=get_overriding_rules(rule=rule, rules=rules or [])
+    )
+
+    if is_dry_run:
+        return queryset.count()
+
+    num_deleted = 0
+
+    for activity_ids in get_expired_batches(queryset=queryset,
+                                            batch_size=batch_size):
+        num_deleted += Activity.objects.fast_delete(
+            queryset=Activity._base_manager.filter(id__in=activity_ids),
+            batch_size=batch_size
+        )
+
+    return num_deleted
+
+
+def prune_activities(rules=None, batch_size=1000, is_dry_run=True, now=None):
+    """Deletes the expired activities for all the retention rules.
+
+    :param rules: (optional) the list of ``RetentionRule``s.  Defaults to the
+        ``ACTIVITIES_RETENTION_POLICY`` rules.
+    :param batch_size: the max number of activities to delete per batch.
+    :param is_dry_run: if True, the activities are counted but not deleted.
+    :param now: (optional) the current datetime.  Defaults to utcnow.
+    :return: list of tuples of the rule and the number of activities deleted
+        (or that would be deleted) by it.
+    """
+    if rules is None:
+        rules = get_retention_rules()
+
+    now = now or datetime.utcnow()
+    return [(rule, prune_rule(rule=rule,
+                              batch_size=batch_size,
+                              is_dry_run=is_dry_run,
+                              now=now,
+                              rules=rules))
+            for rule in rules]
@@ -1,4 +1,6 @@
 from activities.constants import Action
+from activities.fragments import get_activity_fragments
+from activities.instrumentation import instrument_phase
 from django.template import Library
 from django.template.loader import render_to_string
 from django.utils.html import escape
@@ -39,19 +41,34 @@ def render_activities(context, page, obj, activity_url, activity_source=None,
     if activity_source is not None:
         context['activity_source'] = activity_source
 
-    return render_to_string('activities/snippets/activities.html',
-                            context=context)
+    with instrument_phase('render', request=context.get('request')):
+        return render_to_string('activities/snippets/activities.html',
+                                context=context)
 
 
 @register.simple_tag(takes_context=True)
 def render_activity(context, activity, activity_url, show_reference_obj=False,
                     **kwargs):
-    """Renders an activity to html."""
+    """Renders an activity to html.  When the fragment cache is enabled the
+    viewer independent header and message html are read from the cache (see
+    ``activities.fragments``).
+    """
+    fragments = get_activity_fragments(activity=activity,
+                                       user_cache=context.get('user_cache'))
     kwargs.update({
         'activity': activity,
         'show_reference_obj': show_reference_obj,
-        'activity_url': activity_url
+        'activity_url': activity_url,
+        # always set so fragments from the previously rendered activity
+        # aren't reused.
+        'activity_header_html': fragments['header'] if fragments else None,
+        'activity_message_html': fragments['message'] if fragments else None
     })
+
+    if hasattr(activity, 'latest_replies'):
+        # the reply preview loaded by ``prefetch_latest_replies``
+        kwargs['activity_replies'] = activity.latest_replies
+
     context.update(kwargs)
 
     return render_to_string('activities/snippets/activity.html',
@@ -1,9 +1,11 @@
 from datetime import datetime
 
 from activities.mixins.views import ActivityViewMixin
+from activities.models import ActivityFeedEntry
 from activities.models import ActivityReply
 from django.contrib import messages
 from django.core.urlresolvers import reverse
+from django.http import Http404
 from django.http import HttpResponse
 from django.utils.translation import ugettext_lazy as _
 from django.views.generic.base import TemplateView
@@ -19,12 +21,16 @@ from django_core.views.mixins.generic import GenericObjectViewMixin
 from .forms import ActivityDeleteForm
 from .forms import ActivityEditForm
 from .forms import ActivityReplyEditForm
+from .generations import bump_generations
+from .generations import get_object_generation_key
+from .managers import is_feed_entries_enabled
 from .mixins.views import ActivitiesViewMixin
 from .mixins.views import ActivityCreatedUserRequiredViewMixin
 from .mixins.views import ActivityFormView
 from .mixins.views import ActivityReplySingleObjectViewMixin
 from .mixins.views import ActivitySingleObjectViewMixin
 from .mixins.views import UserActivitiesViewMixin
+from .paging import HasMorePaginator
 
 
 class ActivitiesView(PagingViewMixin, ActivitiesViewMixin, ActivityFormView):
@@ -67,9 +73,20 @@ class ActivityView(PagingViewMixin, ActivityViewMixin, AjaxViewMixin, ListView):
     ajax_template_name = 'activities/snippets/activity_replies.html'
     model = ActivityReply
     context_object_name = 'activity_replies'
+    paginator_class = HasMorePaginator
 
     def get_context_data(self, **kwargs):
         context = super(ActivityView, self).get_context_data(**kwargs)
+        activity_replies = list(context['page_obj'].object_list)
+
+        for activity_reply in activity_replies:
+            # the reply urls are built from the activity's url so reuse the
+            # view's activity instead of loading it for every reply.
+            activity_reply.activity = self.activity
+
+        context['page_obj'].object_list = activity_replies
+        context['object_list'] = activity_replies
+        context[self.context_object_name] = activity_replies
         has_more = context['page_obj'].has_next()
         context['activity_replies_has_more'] = has_more
 
@@ -95,6 +112,20 @@ class ActivityView(PagingViewMixin, ActivityViewMixin, AjaxViewMixin, ListView):
 
         return context
 
+    def paginate_queryset(self, queryset, page_size):
+        page = (self.kwargs.get(self.page_kwarg) or
+                self.request.GET.get(self.page_kwarg))
+
+        if page == 'last' and not hasattr(self.get_paginator(queryset,
+                                                             page_size),
+                                          'num_pages'):
+            # the paginator doesn't count the replies so there's no last page
+            # to go to.
+            raise Http404(_('The last page is not available.'))
+
+        return super(ActivityView, self).paginate_queryset(queryset,
+                                                           page_size)
+
     def get_queryset(self, **kwargs):
         queryset = super(ActivityView, self).get_queryset(**kwargs)
         filter_kwargs = {
@@ -108,7 +139,7 @@ class ActivityView(PagingViewMixin, ActivityViewMixin, AjaxViewMixin, ListView):
 
         return queryset.filter(
             **filter_kwargs
-        ).order_by('-created_dttm').prefetch_related('activity', 'created_user')
+        ).order_by('-created_dttm').select_related('created_user')
 
     def get_query_timestamp_datetime(self):
         """Gets the timestamp from the url and converts it to a datetime."""
@@ -155,6 +186,14 @@ class ActivityDeleteView(ActivityCreatedUserRequiredViewMixin,
             if activity_for:
                 self.activity.for_objs.remove(activity_for)
 
+            if is_feed_entries_enabled():
+                ActivityFeedEntry.objects.remove_for_object(
+                    activity=self.activity,
+                    obj=self.request.user
+                )
+
+            bump_generations([get_object_generation_key(self.request.user)])
+
         if self.request.is_ajax():
             return HttpResponse('success', status=200)
 
@@ -46,6 +46,9 @@ here = lambda *x: os.path.join(os.path.abspath(os.path.dirname(__file__)), *x)
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': here('test_db.db')
+        'NAME': here('test_db.db'),
+        # a file (not in-memory) test database so the rows committed by
+        # TransactionTestCases are visible to worker processes.
+        'TEST': {'NAME': here('test_db_test.db')}
     }
 }
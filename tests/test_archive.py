@@ -0,0 +1,107 @@
+from datetime import datetime
+from datetime import timedelta
+from shutil import rmtree
+from tempfile import mkdtemp
+import os
+
+from activities.archive import ActivityArchiver
+from activities.archive import get_archive_path
+from activities.models import Activity
+from activities.models import ActivityReply
+from django.test import TestCase
+from django_testing.user_utils import create_user
+
+from .utils import create_activity
+
+
+class ActivityArchiverTests(TestCase):
+    """Tests for archiving and restoring activities."""
+
+    def setUp(self):
+        super(ActivityArchiverTests, self).setUp()
+        self.directory = mkdtemp()
+        self.user = create_user()
+        self.recipient = create_user()
+        self.old_dttm = datetime(2015, 1, 15, 12, 30, 45, 123456)
+        self.old_activity = create_activity(about=self.user,
+                                            created_user=self.user,
+                                            ensure_for_objs=[self.recipient])
+        self.old_activity.add_reply(user=self.user, text='a reply')
+        Activity.objects.filter(id=self.old_activity.id).update(
+            created_dttm=self.old_dttm
+        )
+        self.new_activity = create_activity(about=self.user,
+                                            created_user=self.user)
+
+    def tearDown(self):
+        super(ActivityArchiverTests, self).tearDown()
+        rmtree(self.directory)
+
+    def test_archive_and_restore(self):
+        """Test the old activity is moved to its monthly archive file and is
+        restored with its replies and recipients.
+        """
+        archiver = ActivityArchiver(directory=self.directory, batch_size=1)
+        cutoff = datetime.utcnow() - timedelta(days=1)
+
+        self.assertEqual(archiver.archive(cutoff=cutoff, is_dry_run=True), 1)
+        self.assertEqual(archiver.archive(cutoff=cutoff, is_dry_run=False), 1)
+
+        path = get_archive_path(directory=self.directory,
+                                created_dttm=self.old_dttm)
+        self.assertTrue(os.path.exists(path))
+        self.assertFalse(Activity.objects.filter(
+            id=self.old_activity.id
+        ).exists())
+        self.assertTrue(Activity.objects.filter(
+            id=self.new_activity.id
+        ).exists())
+
+        self.assertEqual(archiver.restore(path=path), 1)
+        # restoring twice doesn't duplicate the activities
+        self.assertEqual(archiver.restore(path=path), 0)
+
+        activity = Activity.objects.get(id=self.old_activity.id)
+        self.assertEqual(activity.created_dttm, self.old_dttm)
+        self.assertEqual(activity.reply_count, 1)
+        self.assertEqual(ActivityReply.objects.filter(
+            activity=activity
+        ).count(), 1)
+        self.assertIn(self.recipient.id,
+                      [activity_for.object_id
+                       for activity_for in activity.for_objs.all()])
+
+    def test_archive_group(self):
+        """Test activities grouped under an archived activity are archived
+        with it and restored with their group.
+        """
+        grouped = create_activity(about=self.user, created_user=self.user,
+                                  group=self.old_activity)
+        archiver = ActivityArchiver(directory=self.directory, batch_size=1)
+        archiver.archive(cutoff=datetime.utcnow() - timedelta(days=1),
+                         is_dry_run=False)
+
+        self.assertFalse(Activity.objects.filter(id=grouped.id).exists())
+
+        path = get_archive_path(directory=self.directory,
+                                created_dttm=self.old_dttm)
+        self.assertEqual(archiver.restore(path=path), 2)
+        self.assertEqual(Activity.objects.get(id=grouped.id).group_id,
+                         self.old_activity.id)
+
+    def test_archive_backdated(self):
+        """Test activities with newer ids than unexpired activities (i.e.
+        backdated activities) are archived.
+        """
+        backdated = create_activity(about=self.user, created_user=self.user)
+        Activity.objects.filter(id=backdated.id).update(
+            created_dttm=self.old_dttm
+        )
+        archiver = ActivityArchiver(directory=self.directory, batch_size=1)
+
+        self.assertEqual(
+            archiver.archive(cutoff=datetime.utcnow() - timedelta(days=1),
+                             is_dry_run=False),
+            2
+        )
+        self.assertFalse(Activity.objects.filter(id=backdated.id).exists())
@@ -0,0 +1,38 @@
+from activities.benchmarks import ActivityBenchmarks
+from activities.benchmarks import percentile
+from activities.models import Activity
+from django.test import TestCase
+
+
+class ActivityBenchmarksTests(TestCase):
+    """Tests for the benchmark suite."""
+
+    def test_percentile(self):
+        """Test the nearest rank percentile."""
+        values = list(range(1, 101))
+
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertIsNone(percentile([], 50))
+
+    def test_run(self):
+        """Test the benchmarks report their results and the datasets are
+        rolled back.
+        """
+        results = ActivityBenchmarks(
+            sizes=[10],
+            iterations=2,
+            num_users=5,
+            benchmark_names=['create', 'get_for_object']
+        ).run()
+
+        self.assertEqual(results['metadata']['iterations'], 2)
+        self.assertEqual([result['name'] for result in results['results']],
+                         ['create', 'get_for_object'])
+
+        for result in results['results']:
+            self.assertNotIn('error', result)
+            self.assertEqual(result['size'], 10)
+            self.assertGreater(result['queries_per_op'], 0)
+
+        self.assertEqual(Activity.objects.count(), 0)
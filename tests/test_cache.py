@@ -0,0 +1,95 @@
+from activities.cache import ActivityForCache
+from activities.cache import LRUCache
+from activities.cache import activity_for_cache
+from activities.models import ActivityFor
+from django.test import TestCase
+from django.test.utils import override_settings
+from django_testing.user_utils import create_user
+
+
+class LRUCacheTests(TestCase):
+    """Tests for the in-process LRU cache."""
+
+    def test_get_set(self):
+        """Test getting and setting items counts hits and misses."""
+        cache = LRUCache(max_size=2)
+        cache.set('a', 1)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.get_stats()['hit_rate'], 0.5)
+
+    def test_evicts_least_recently_used(self):
+        """Test the least recently used item is evicted when full."""
+        cache = LRUCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        # "a" is now the most recently used
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+
+    def test_disabled(self):
+        """Test a max size of 0 disables the cache."""
+        cache = LRUCache(max_size=0)
+        cache.set('a', 1)
+
+        self.assertEqual(len(cache), 0)
+
+    def test_activity_for_cache_disabled_by_default(self):
+        """Test the ActivityFor cache is off unless it's configured."""
+        cache = ActivityForCache()
+        cache.set('a', 1)
+
+        self.assertEqual(cache.get_max_size(), 0)
+        self.assertEqual(len(cache), 0)
+
+    def test_activity_for_cache_size_setting(self):
+        """Test the ActivityFor cache size comes from the settings."""
+        cache = ActivityForCache()
+
+        with self.settings(ACTIVITIES_FOR_CACHE_SIZE=5):
+            self.assertEqual(cache.get_max_size(), 5)
+
+
+@override_settings(ACTIVITIES_FOR_CACHE_SIZE=1000)
+class ActivityForCacheTests(TestCase):
+    """Tests for the ActivityFor primary key cache."""
+
+    def tearDown(self):
+        super(ActivityForCacheTests, self).tearDown()
+        activity_for_cache.clear()
+
+    def test_get_or_create_for_objects_cache_hit(self):
+        """Test cached ActivityFor primary keys skip the lookup query."""
+        user = create_user()
+        activity_for = ActivityFor.objects.get_or_create_generic(
+            content_object=user
+        )[0]
+        key = ActivityFor.get_key(user)
+        activity_for_cache.set(key, activity_for.id)
+
+        with self.assertNumQueries(0):
+            activity_fors = ActivityFor.objects.get_or_create_for_objects(
+                objs=[user]
+            )
+
+        self.assertEqual(activity_fors[key].id, activity_for.id)
+
+    def test_delete_invalidates_cache(self):
+        """Test deleting an ActivityFor removes it from the cache."""
+        user = create_user()
+        activity_for = ActivityFor.objects.get_or_create_generic(
+            content_object=user
+        )[0]
+        key = ActivityFor.get_key(user)
+        activity_for_cache.set(key, activity_for.id)
+        activity_for.delete()
+
+        self.assertNotIn(key, activity_for_cache)
@@ -5,7 +5,10 @@ from activities.constants import Source
 from activities.models import Activity
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.transaction import TransactionManagementError
 from django.test.testcases import TestCase
+from django.test.testcases import TransactionTestCase
 from django_testing.user_utils import create_user
 
 from activities.cleanup import ActivityCleaner
@@ -57,3 +60,152 @@ class ActivityCleanupTestCase(TestCase):
         for model, cleaned_ids in cleaned_objects.items():
             num_objs = model.objects.filter(id__in=cleaned_ids).count()
             self.assertEqual(num_objs, 0, '{0}: {1}'.format(model, cleaned_ids))
+
+    def test_cleanup_ranges(self):
+        """Test the stale activities are cleaned up across many "about" id
+        ranges and delete batches.
+        """
+        user_content_type = ContentType.objects.get_for_model(
+            model=get_user_model()
+        )
+        user = create_user()
+        stale_user_ids = [user.id + i for i in range(1000, 1005)]
+
+        for user_id in stale_user_ids + stale_user_ids:
+            Activity.objects.create(about_id=user_id,
+                                    about_content_type=user_content_type,
+                                    created_user=user,
+                                    source=Source.SYSTEM,
+                                    action=Action.CREATED)
+
+        progress = []
+        cleaner = ActivityCleaner(chunk_size=2, batch_size=3,
+                                  progress_callback=progress.append)
+        cleaned_objects = cleaner.cleanup(is_dry_run=False)
+
+        self.assertEqual(sorted(cleaned_objects[get_user_model()]),
+                         stale_user_ids)
+        self.assertEqual(
+            Activity.objects.filter(about_id__in=stale_user_ids).count(), 0
+        )
+        self.assertEqual(sum(p['num_activities'] for p in progress), 10)
+
+    def test_get_stale_activities(self):
+        """Test the stale activities of a range are found with an anti-join
+        bounded to the range.
+        """
+        user_content_type = ContentType.objects.get_for_model(
+            model=get_user_model()
+        )
+        user = create_user()
+        stale_user_ids = [user.id + 1000, user.id + 2000]
+
+        for about_id in [user.id] + stale_user_ids:
+            Activity.objects.create(about_id=about_id,
+                                    about_content_type=user_content_type,
+                                    created_user=user,
+                                    source=Source.SYSTEM,
+                                    action=Action.CREATED)
+
+        cleaner = ActivityCleaner()
+        activities = cleaner.get_stale_activities(
+            content_type=user_content_type,
+            model=get_user_model(),
+            about_id_start=0,
+            about_id_end=user.id + 1500
+        )
+
+        self.assertEqual(list(activities.values_list('about_id', flat=True)),
+                         stale_user_ids[:1])
+        self.assertEqual(
+            list(cleaner.get_existing_about_ids(
+                model=get_user_model(),
+                about_id_start=user.id + 1,
+                about_id_end=user.id + 1500
+            )),
+            []
+        )
+
+    def test_get_tasks(self):
+        """Test the cleanup is split into tasks of "about" id ranges that
+        can be run by separate workers.
+        """
+        user_content_type = ContentType.objects.get_for_model(
+            model=get_user_model()
+        )
+        user = create_user()
+        about_ids = [user.id + i for i in range(1000, 1005)]
+
+        for about_id in about_ids:
+            Activity.objects.create(about_id=about_id,
+                                    about_content_type=user_content_type,
+                                    created_user=user,
+                                    source=Source.SYSTEM,
+                                    action=Action.CREATED)
+
+        cleaner = ActivityCleaner(chunk_size=2)
+        tasks = list(cleaner.get_tasks())
+        self.assertEqual(
+            [(task['about_id_start'], task['about_id_end']) for task in tasks],
+            [(0, about_ids[1] + 1),
+             (about_ids[1] + 1, about_ids[3] + 1),
+             (about_ids[3] + 1, None)]
+        )
+
+        cleaned_about_ids = []
+
+        for task in tasks:
+            task, stale_about_ids, num_activities = cleaner.cleanup_task(
+                task=task,
+                is_dry_run=True
+            )
+            cleaned_about_ids.extend(stale_about_ids)
+
+        self.assertEqual(sorted(cleaned_about_ids), about_ids)
+
+    def test_cleanup_workers_in_transaction(self):
+        """Test the cleanup refuses to run in parallel workers inside a
+        transaction since the workers need the connections closed.
+        """
+        cleaner = ActivityCleaner(workers=2)
+
+        with transaction.atomic():
+            with self.assertRaises(TransactionManagementError):
+                cleaner.cleanup(is_dry_run=True)
+
+
+class ActivityCleanupWorkersTestCase(TransactionTestCase):
+    """Testcase for the activity cleanup in parallel worker processes.  The
+    workers read the committed rows with their own connections.
+    """
+
+    def test_cleanup_workers(self):
+        """Test the stale activities are cleaned up by worker processes."""
+        user_content_type = ContentType.objects.get_for_model(
+            model=get_user_model()
+        )
+        user = create_user()
+        stale_user_ids = [user.id + i for i in range(1000, 1005)]
+
+        for about_id in stale_user_ids + [user.id]:
+            Activity.objects.create(about_id=about_id,
+                                    about_content_type=user_content_type,
+                                    created_user=user,
+                                    source=Source.SYSTEM,
+                                    action=Action.CREATED)
+
+        progress = []
+        cleaner = ActivityCleaner(chunk_size=2, batch_size=2,
+                                  progress_callback=progress.append,
+                                  workers=2)
+        cleaned_objects = cleaner.cleanup(is_dry_run=False)
+
+        self.assertEqual(sorted(cleaned_objects[get_user_model()]),
+                         stale_user_ids)
+        self.assertEqual(sum(p['num_activities'] for p in progress), 5)
+        self.assertEqual(
+            list(Activity.objects.filter(
+                about_id__in=stale_user_ids + [user.id]
+            ).values_list('about_id', flat=True)),
+            [user.id]
+        )
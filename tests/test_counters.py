@@ -0,0 +1,161 @@
+from time import sleep
+from unittest import skipUnless
+
+from activities.counters import apply_counter_deltas
+from activities.counters import counter_buffer
+from activities.models import Activity
+from django.db import transaction
+from django.test import TestCase
+from django.test import TransactionTestCase
+from django.test.utils import override_settings
+from django_testing.user_utils import create_user
+
+from .utils import create_activity
+
+
+class ApplyCounterDeltasTests(TestCase):
+    """Tests for writing counter changes."""
+
+    def setUp(self):
+        super(ApplyCounterDeltasTests, self).setUp()
+        self.user = create_user()
+        self.activities = [create_activity(about=self.user,
+                                           created_user=self.user)
+                           for i in range(3)]
+        Activity.objects.filter(id=self.activities[0].id).update(reply_count=5)
+
+    def test_apply_counter_deltas(self):
+        """Test objects with the same delta are updated in one query."""
+        deltas = dict(((Activity, activity.id, 'reply_count'), 2)
+                      for activity in self.activities)
+
+        with self.assertNumQueries(1):
+            apply_counter_deltas(deltas)
+
+        self.assertEqual(
+            list(Activity.objects.filter(
+                id__in=[activity.id for activity in self.activities]
+            ).order_by('id').values_list('reply_count', flat=True)),
+            [7, 2, 2]
+        )
+
+    def test_apply_negative_counter_deltas(self):
+        """Test counters are never decremented below 0."""
+        apply_counter_deltas(dict(((Activity, activity.id, 'reply_count'), -3)
+                                  for activity in self.activities[:2]))
+
+        self.assertEqual(
+            Activity.objects.get(id=self.activities[0].id).reply_count, 2
+        )
+        self.assertEqual(
+            Activity.objects.get(id=self.activities[1].id).reply_count, 0
+        )
+
+
+class CounterBufferTests(TransactionTestCase):
+    """Tests for buffering the counter changes."""
+
+    def setUp(self):
+        super(CounterBufferTests, self).setUp()
+        self.user = create_user()
+        self.activity = create_activity(about=self.user,
+                                        created_user=self.user)
+
+    def tearDown(self):
+        super(CounterBufferTests, self).tearDown()
+        counter_buffer.flush()
+
+    def get_reply_count(self):
+        return Activity.objects.get(id=self.activity.id).reply_count
+
+    def test_sync(self):
+        """Test the counters are written immediately by default."""
+        self.activity.add_reply(user=self.user, text='a reply')
+        self.assertEqual(self.get_reply_count(), 1)
+
+    @skipUnless(hasattr(transaction, 'on_commit'),
+                'django < 1.9 writes the changes immediately')
+    @override_settings(ACTIVITIES_COUNTER_BUFFER='commit')
+    def test_commit(self):
+        """Test the counters are written when the transaction commits."""
+        with transaction.atomic():
+            for i in range(3):
+                self.activity.add_reply(user=self.user, text='a reply')
+
+            self.assertEqual(self.get_reply_count(), 0)
+
+        self.assertEqual(self.get_reply_count(), 3)
+
+    @override_settings(ACTIVITIES_COUNTER_BUFFER='commit')
+    def test_rollback(self):
+        """Test the counter changes are discarded on rollback."""
+        try:
+            with transaction.atomic():
+                self.activity.add_reply(user=self.user, text='a reply')
+                raise ValueError
+        except ValueError:
+            pass
+
+        self.activity.add_reply(user=self.user, text='a reply')
+        self.assertEqual(self.get_reply_count(), 1)
+
+    @override_settings(ACTIVITIES_COUNTER_BUFFER='commit')
+    def test_savepoint_rollback(self):
+        """Test the counter changes of a savepoint that's rolled back are
+        discarded when the transaction commits.
+        """
+        with transaction.atomic():
+            self.activity.add_reply(user=self.user, text='a reply')
+
+            try:
+                with transaction.atomic():
+                    self.activity.add_reply(user=self.user, text='a reply')
+                    raise ValueError
+            except ValueError:
+                pass
+
+        self.assertEqual(self.get_reply_count(), 1)
+
+    @override_settings(ACTIVITIES_COUNTER_BUFFER='interval',
+                       ACTIVITIES_COUNTER_FLUSH_INTERVAL=0.1)
+    def test_interval_timer(self):
+        """Test the buffered counters are flushed once the interval passes
+        even if no other changes are added.
+        """
+        counter_buffer.flush()
+        self.activity.add_reply(user=self.user, text='a reply')
+
+        for i in range(50):
+            if self.get_reply_count():
+                break
+
+            sleep(0.1)
+
+        self.assertEqual(self.get_reply_count(), 1)
+
+    @override_settings(ACTIVITIES_COUNTER_BUFFER='interval',
+                       ACTIVITIES_COUNTER_FLUSH_INTERVAL=3600)
+    def test_interval(self):
+        """Test the counters are buffered until they're flushed."""
+        counter_buffer.flush()
+
+        for i in range(3):
+            self.activity.add_reply(user=self.user, text='a reply')
+
+        self.assertEqual(self.get_reply_count(), 0)
+        counter_buffer.flush()
+        self.assertEqual(self.get_reply_count(), 3)
+
+    @override_settings(ACTIVITIES_COUNTER_BUFFER='interval',
+                       ACTIVITIES_COUNTER_FLUSH_INTERVAL=3600)
+    def test_interval_delete(self):
+        """Test deleting a reply before its increment is flushed leaves the
+        counter at 0.
+        """
+        counter_buffer.flush()
+        activity_reply = self.activity.add_reply(user=self.user,
+                                                 text='a reply')
+        activity_reply.delete()
+        counter_buffer.flush()
+
+        self.assertEqual(self.get_reply_count(), 0)
@@ -0,0 +1,81 @@
+from activities import deletion
+from activities.deletion import delete_activities_about_object
+from activities.deletion import purge_deleted_activities
+from activities.models import Activity
+from django.db import transaction
+from django.test import TestCase
+from django.test.utils import override_settings
+from django_testing.user_utils import create_user
+from mock import MagicMock
+from mock import patch
+
+from .utils import create_activity
+
+
+@override_settings(ACTIVITIES_DEFERRED_DELETE='command')
+class DeferredDeleteTests(TestCase):
+    """Tests for the deferred deletion of activities."""
+
+    def setUp(self):
+        super(DeferredDeleteTests, self).setUp()
+        self.user = create_user()
+        self.about = create_user()
+        self.activities = [create_activity(about=self.about,
+                                           created_user=self.user)
+                           for i in range(3)]
+        self.activities[0].add_reply(user=self.user, text='a reply')
+        self.activity_ids = [activity.id for activity in self.activities]
+
+    def test_tombstone_and_purge(self):
+        """Test the activities disappear immediately and are deleted by the
+        purge.
+        """
+        num_tombstoned = delete_activities_about_object(about=self.about)
+
+        self.assertEqual(num_tombstoned, 3)
+        self.assertEqual(
+            Activity.objects.filter(id__in=self.activity_ids).count(), 0
+        )
+        self.assertEqual(
+            Activity.objects.get_for_object(obj=self.about,
+                                            for_user=self.user).count(),
+            0
+        )
+        self.assertEqual(
+            Activity._base_manager.filter(id__in=self.activity_ids).count(), 3
+        )
+
+        self.assertEqual(purge_deleted_activities(batch_size=2,
+                                                  max_batches=1), 2)
+        self.assertEqual(purge_deleted_activities(batch_size=2), 1)
+        self.assertEqual(
+            Activity._base_manager.filter(id__in=self.activity_ids).count(), 0
+        )
+
+    @override_settings(ACTIVITIES_DEFERRED_DELETE=None)
+    def test_delete_immediately(self):
+        """Test the activities are deleted immediately by default."""
+        delete_activities_about_object(about=self.about)
+        self.assertEqual(
+            Activity._base_manager.filter(id__in=self.activity_ids).count(), 0
+        )
+
+    @override_settings(ACTIVITIES_DEFERRED_DELETE='local')
+    def test_local_without_on_commit(self):
+        """Test activities tombstoned in a transaction are purged immediately
+        when django can't wait for the commit (django < 1.9).
+        """
+        django_18_transaction = MagicMock(
+            spec=['get_connection'],
+            get_connection=transaction.get_connection
+        )
+
+        with patch.object(deletion, 'transaction', django_18_transaction):
+            with patch.object(deletion.local_purge_worker,
+                              'start') as start:
+                delete_activities_about_object(about=self.about)
+
+        self.assertFalse(start.called)
+        self.assertEqual(
+            Activity._base_manager.filter(id__in=self.activity_ids).count(), 0
+        )
@@ -0,0 +1,90 @@
+from activities.fragments import fragment_cache_stats
+from activities.fragments import get_activity_fragments
+from activities.fragments import get_fragment_cache
+from activities.fragments import get_fragment_cache_key
+from activities.models import Activity
+from activities.prefetch import register_about_model
+from activities.prefetch import unregister_about_model
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.test.utils import override_settings
+from django_testing.user_utils import create_user
+from mock import patch
+
+from .utils import create_activity
+
+
+@override_settings(ACTIVITIES_FRAGMENT_CACHE_ENABLED=True)
+class ActivityFragmentCacheTests(TestCase):
+    """Tests for caching the rendered activity fragments."""
+
+    def setUp(self):
+        super(ActivityFragmentCacheTests, self).setUp()
+        get_fragment_cache().clear()
+        fragment_cache_stats.reset_stats()
+        self.user = create_user()
+        self.activity = create_activity(about=self.user,
+                                        created_user=self.user,
+                                        text='hello world')
+
+    def tearDown(self):
+        super(ActivityFragmentCacheTests, self).tearDown()
+        get_fragment_cache().clear()
+        unregister_about_model(get_user_model())
+
+    def test_get_activity_fragments(self):
+        """Test the fragments are rendered once and then read from the
+        cache.
+        """
+        fragments = get_activity_fragments(activity=self.activity)
+        self.assertIn('hello world', fragments['message'])
+        self.assertIn('class="action-text"', fragments['header'])
+        self.assertEqual(fragment_cache_stats.misses, 1)
+
+        self.assertEqual(get_activity_fragments(activity=self.activity),
+                         fragments)
+        self.assertEqual(fragment_cache_stats.hits, 1)
+
+    def test_message_without_text_not_cached(self):
+        """Test messages rendered by ``Activity.get_html`` aren't cached since
+        the "about" object is passed the viewing user.
+        """
+        activity = create_activity(about=self.user,
+                                   created_user=self.user,
+                                   text='')
+        fragments = get_activity_fragments(activity=activity)
+
+        self.assertIsNone(fragments['message'])
+        self.assertIn('class="action-text"', fragments['header'])
+
+    def test_header_with_action_html_not_cached(self):
+        """Test headers of "about" models that render their own action html
+        aren't cached since the model is passed the viewing user.
+        """
+        with patch.object(get_user_model(), 'get_activity_action_html',
+                          create=True):
+            fragments = get_activity_fragments(activity=self.activity)
+
+        self.assertIsNone(fragments['header'])
+        self.assertIn('hello world', fragments['message'])
+
+    def test_fragment_cache_key_changes(self):
+        """Test editing the activity or replying to it changes the fragment
+        cache key.
+        """
+        cache_key = get_fragment_cache_key(self.activity)
+        self.activity.add_reply(user=self.user, text='a reply')
+        activity = Activity.objects.get(id=self.activity.id)
+        self.assertNotEqual(get_fragment_cache_key(activity), cache_key)
+
+    def test_fragment_cache_opt_out(self):
+        """Test activities about models registered with
+        ``cache_fragments=False`` aren't cached.
+        """
+        register_about_model(get_user_model(), cache_fragments=False)
+        self.assertIsNone(get_activity_fragments(activity=self.activity))
+
+    @override_settings(ACTIVITIES_FRAGMENT_CACHE_ENABLED=False)
+    def test_fragment_cache_disabled(self):
+        """Test nothing is cached when the fragment cache isn't enabled."""
+        self.assertIsNone(get_activity_fragments(activity=self.activity))
@@ -0,0 +1,94 @@
+from activities.generations import bump_generations
+from activities.generations import get_generation_cache
+from activities.generations import get_generations
+from activities.generations import get_object_generation_key
+from activities.models import Activity
+from activities.models import ActivityReply
+from django.test import TestCase
+from django.test.utils import override_settings
+from django_testing.user_utils import create_user
+
+from .utils import create_activity
+
+
+@override_settings(ACTIVITIES_GENERATIONS_ENABLED=True)
+class FeedGenerationTests(TestCase):
+    """Tests for the feed generation counters."""
+
+    def setUp(self):
+        super(FeedGenerationTests, self).setUp()
+        get_generation_cache().clear()
+        self.user = create_user()
+        self.recipient = create_user()
+        self.user_key = get_object_generation_key(self.user)
+        self.recipient_key = get_object_generation_key(self.recipient)
+
+    def tearDown(self):
+        super(FeedGenerationTests, self).tearDown()
+        get_generation_cache().clear()
+
+    def get_generation(self, key):
+        return get_generations([key])[key]
+
+    def test_get_generations(self):
+        """Test the generations are stable until they're bumped."""
+        generation = self.get_generation(self.user_key)
+        self.assertEqual(self.get_generation(self.user_key), generation)
+
+        bump_generations([self.user_key])
+        self.assertNotEqual(self.get_generation(self.user_key), generation)
+
+    def test_create_bumps_generations(self):
+        """Test creating an activity bumps the "about" object and recipient
+        generations.
+        """
+        user_generation = self.get_generation(self.user_key)
+        recipient_generation = self.get_generation(self.recipient_key)
+        create_activity(about=self.user, created_user=self.user,
+                        ensure_for_objs=[self.recipient])
+
+        self.assertNotEqual(self.get_generation(self.user_key),
+                            user_generation)
+        self.assertNotEqual(self.get_generation(self.recipient_key),
+                            recipient_generation)
+
+    def test_reply_and_delete_bump_generations(self):
+        """Test replying to and deleting an activity bumps the recipient
+        generations.
+        """
+        activity = create_activity(about=self.user, created_user=self.user,
+                                   ensure_for_objs=[self.recipient])
+        generation = self.get_generation(self.recipient_key)
+
+        reply = activity.add_reply(user=self.user, text='a reply')
+        self.assertNotEqual(self.get_generation(self.recipient_key),
+                            generation)
+
+        generation = self.get_generation(self.recipient_key)
+        ActivityReply.objects.get(id=reply.id).delete()
+        self.assertNotEqual(self.get_generation(self.recipient_key),
+                            generation)
+
+        generation = self.get_generation(self.recipient_key)
+        Activity.objects.get(id=activity.id).delete()
+        self.assertNotEqual(self.get_generation(self.recipient_key),
+                            generation)
+
+    def test_updates_for_about_object_bumps_generations(self):
+        """Test updating the activities about an object bumps the
+        generations.
+        """
+        create_activity(about=self.user, created_user=self.user,
+                        ensure_for_objs=[self.recipient])
+        generation = self.get_generation(self.recipient_key)
+        Activity.objects.updates_for_about_object(about=self.user,
+                                                  text='updated')
+        self.assertNotEqual(self.get_generation(self.recipient_key),
+                            generation)
+
+    @override_settings(ACTIVITIES_GENERATIONS_ENABLED=False)
+    def test_generations_disabled(self):
+        """Test the generations aren't bumped when they're disabled."""
+        generation = self.get_generation(self.user_key)
+        create_activity(about=self.user, created_user=self.user)
+        self.assertEqual(self.get_generation(self.user_key), generation)
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+from activities.constants import Action
+from activities.constants import Privacy
+from activities.generator import ActivityGenerator
+from activities.generator import parse_mix
+from activities.models import Activity
+from activities.models import ActivityReply
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+
+class ActivityGeneratorTests(TestCase):
+    """Tests for the synthetic activity generator."""
+
+    def test_parse_mix(self):
+        """Test parsing the mix option."""
+        self.assertEqual(parse_mix('commented=0.7, UPDATED=0.3'),
+                         {'COMMENTED': 0.7, 'UPDATED': 0.3})
+        self.assertEqual(parse_mix('PUBLIC=1', enum=Privacy),
+                         {'PUBLIC': 1.0})
+
+        with self.assertRaises(ValueError):
+            parse_mix('COMENTED=1', enum=Action)
+
+    def test_command_invalid_options(self):
+        """Test invalid mixes and content types are command errors."""
+        for options in ({'actions': 'COMENTED=1'},
+                        {'privacies': 'PUBLC=1'},
+                        {'now': 'yesterday'},
+                        {'about_content_types': ['activities.nothing']},
+                        {'about_content_types': ['activities']},
+                        {'about_content_types': ['activities.activity']}):
+            with self.assertRaises(CommandError):
+                call_command('generate_activities', num_activities=1,
+                             num_users=1, **options)
+
+    def test_generate(self):
+        """Test the activities, replies and reply counts are generated."""
+        generator = ActivityGenerator(num_users=10,
+                                      action_mix={Action.COMMENTED: 1},
+                                      max_fan_out=5,
+                                      batch_size=7)
+        counts = generator.generate(num_activities=20)
+
+        self.assertEqual(counts['users'], 10)
+        self.assertEqual(counts['activities'], 20)
+        self.assertEqual(Activity.objects.count(), 20)
+        self.assertEqual(ActivityReply.objects.count(), counts['replies'])
+        self.assertEqual(
+            sum(Activity.objects.values_list('reply_count', flat=True)),
+            counts['replies']
+        )
+
+        # the users are reused by later runs with the same seed
+        self.assertEqual(ActivityGenerator(num_users=10).get_users(),
+                         generator.get_users())
+
+    def test_seeded(self):
+        """Test generators with the same seed generate the same specs."""
+        now = datetime.utcnow()
+        specs = []
+
+        for i in range(2):
+            generator = ActivityGenerator(num_users=10, seed=5, now=now)
+            users = generator.get_users()
+            specs.append([generator.get_activity_spec(users=users,
+                                                      abouts=users)
+                          for j in range(5)])
+
+        self.assertEqual(specs[0], specs[1])
@@ -0,0 +1,186 @@
+from activities.constants import Privacy
+from activities.instrumentation import RequestInstrumentation
+from activities.instrumentation import activities_request_instrumented
+from activities.instrumentation import get_current_instrumentation
+from activities.instrumentation import time_queries
+from activities.views import ActivitiesGenericObjectView
+from django.contrib.contenttypes.models import ContentType
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connection
+from django.db import connections
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from django_testing.user_utils import create_user
+from mock import patch
+
+from .utils import create_activity
+
+
+instrumented_requests = []
+
+
+def record_instrumentation(request, instrumentation):
+    """Instrumentation callback used by the tests."""
+    instrumented_requests.append((request, instrumentation))
+
+
+class RequestInstrumentationTests(TestCase):
+    """Tests for recording the phases of a request."""
+
+    def test_phase(self):
+        """Test a phase records its duration and queries."""
+        user = create_user()
+        instrumentation = RequestInstrumentation()
+
+        with instrumentation.phase('page'):
+            list(ContentType.objects.filter(id=user.id))
+
+        with instrumentation.phase('page'):
+            list(ContentType.objects.filter(id=user.id))
+
+        phase = instrumentation.get_stats()['phases']['page']
+        self.assertEqual(phase['queries'], 2)
+        self.assertGreaterEqual(phase['duration_ms'], phase['query_ms'])
+
+    def test_phase_nested(self):
+        """Test the queries of a nested phase count for both phases and the
+        cursor factories are restored afterwards.
+        """
+        user = create_user()
+        instrumentation = RequestInstrumentation()
+
+        with instrumentation.phase('render'):
+            list(ContentType.objects.filter(id=user.id))
+
+            with instrumentation.phase('page'):
+                list(ContentType.objects.filter(id=user.id))
+
+        self.assertEqual(instrumentation.phases['render']['queries'], 2)
+        self.assertEqual(instrumentation.phases['page']['queries'], 1)
+        wrapper = connections[DEFAULT_DB_ALIAS]
+        self.assertNotIn('make_cursor', wrapper.__dict__)
+        self.assertNotIn('make_debug_cursor', wrapper.__dict__)
+
+    def test_time_queries_debug_cursor_off(self):
+        """Test the queries are timed without turning on the debug cursor."""
+        durations = []
+
+        with time_queries(callback=durations.append):
+            list(ContentType.objects.all())
+            self.assertFalse(connection.queries_logged)
+
+        self.assertEqual(len(durations), 1)
+
+    def test_get_server_timing(self):
+        """Test the Server-Timing header value of the phases."""
+        instrumentation = RequestInstrumentation()
+
+        with instrumentation.phase('queryset'):
+            pass
+
+        instrumentation.phases['queryset']['duration_ms'] = 1.25
+        self.assertEqual(instrumentation.get_server_timing(),
+                         'activities-queryset;dur=1.2;desc="0 queries"')
+
+    def test_fragment_cache_stats(self):
+        """Test the fragment cache hits and misses are reported."""
+        instrumentation = RequestInstrumentation()
+        instrumentation.record_miss()
+        instrumentation.record_hit()
+        instrumentation.record_hit()
+
+        stats = instrumentation.get_stats()['fragment_cache']
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+
+
+class InstrumentedViewTests(TestCase):
+    """Tests for instrumenting the activities views."""
+
+    def setUp(self):
+        super(InstrumentedViewTests, self).setUp()
+        self.user = create_user()
+
+        for i in range(3):
+            create_activity(about=self.user,
+                            created_user=create_user(),
+                            privacy=Privacy.PUBLIC,
+                            ensure_for_objs=[self.user])
+
+        self.received = []
+        activities_request_instrumented.connect(self.receive)
+        del instrumented_requests[:]
+
+    def tearDown(self):
+        activities_request_instrumented.disconnect(self.receive)
+        super(InstrumentedViewTests, self).tearDown()
+
+    def receive(self, sender, request, instrumentation, **kwargs):
+        self.received.append(instrumentation)
+
+    def get_activities_view(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        request.session = {}
+        content_type = ContentType.objects.get_for_model(self.user)
+        response = ActivitiesGenericObjectView.as_view()(
+            request,
+            content_type_id=str(content_type.id),
+            object_id=str(self.user.id)
+        )
+        response.render()
+        return response
+
+    def test_disabled(self):
+        """Test requests aren't instrumented by default."""
+        response = self.get_activities_view()
+
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(self.received, [])
+
+    @override_settings(ACTIVITIES_INSTRUMENTATION_ENABLED=True)
+    def test_signal(self):
+        """Test the instrumentation of a request is sent with the phases."""
+        response = self.get_activities_view()
+
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(len(self.received), 1)
+        phases = self.received[0].get_stats()['phases']
+        self.assertEqual(list(phases), ['queryset', 'page', 'prefetch',
+                                        'shared_objects', 'render'])
+        self.assertGreater(phases['page']['queries'], 0)
+
+    @override_settings(
+        ACTIVITIES_INSTRUMENTATION_ENABLED=True,
+        ACTIVITIES_INSTRUMENTATION_CALLBACK=(
+            'tests.test_instrumentation.record_instrumentation'
+        )
+    )
+    def test_callback(self):
+        """Test the instrumentation callback is called."""
+        self.get_activities_view()
+
+        self.assertEqual(len(instrumented_requests), 1)
+        self.assertIs(instrumented_requests[0][1], self.received[0])
+
+    @override_settings(ACTIVITIES_INSTRUMENTATION_ENABLED=True,
+                       ACTIVITIES_SERVER_TIMING_ENABLED=True)
+    def test_server_timing(self):
+        """Test the phases are added as a Server-Timing header."""
+        response = self.get_activities_view()
+
+        self.assertEqual(response['Server-Timing'],
+                         self.received[0].get_server_timing())
+        self.assertIn('activities-render;dur=', response['Server-Timing'])
+
+    @override_settings(ACTIVITIES_INSTRUMENTATION_ENABLED=True)
+    def test_view_error(self):
+        """Test the instrumentation is cleared when the view raises."""
+        with patch.object(ActivitiesGenericObjectView, 'get_context_data',
+                          side_effect=ValueError):
+            with self.assertRaises(ValueError):
+                self.get_activities_view()
+
+        self.assertIsNone(get_current_instrumentation())
+        self.assertEqual(self.received, [])
@@ -2,10 +2,21 @@ from activities.constants import Action
 from activities.constants import Privacy
 from activities.constants import Source
 from activities.models import Activity
+from activities.models import ActivityFeedEntry
+from activities.models import ActivityFor
+from activities.models import ActivityReply
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db.models.deletion import CASCADE
+from django.db.models.deletion import PROTECT
+from django.db.models.deletion import ProtectedError
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import override_settings
 from django_testing.user_utils import create_user
+from mock import patch
+from test_models.models import ShareableObject
 
 from .utils import create_activity
 
@@ -259,3 +270,390 @@ class ActivityManagerTests(TestCase):
         for index, activity in enumerate(list(activities)):
             self.assertEqual(activity.privacy, Privacy.PUBLIC,
                              'Error index {0}'.format(index))
+
+    def test_get_for_object_no_distinct(self):
+        """Test the activities for an object are queried with semi-joins
+        and return the same activities as the distinct join query.
+        """
+        user_1 = create_user()
+        user_2 = create_user()
+        create_activity(about=user_1, privacy=Privacy.PUBLIC,
+                        ensure_for_objs=[user_2])
+        create_activity(about=user_1, privacy=Privacy.CUSTOM,
+                        ensure_for_objs=[user_2])
+        create_activity(about=user_1, privacy=Privacy.PRIVATE)
+
+        for for_user in (None, user_1, user_2):
+            activities = Activity.objects.get_for_object(obj=user_1,
+                                                         for_user=for_user)
+            self.assertNotIn('DISTINCT', str(activities.query))
+
+            with self.settings(ACTIVITIES_FEED_QUERY_USE_DISTINCT=True):
+                distinct_activities = Activity.objects.get_for_object(
+                    obj=user_1,
+                    for_user=for_user
+                )
+
+            self.assertEqual(set(activities), set(distinct_activities))
+
+    def test_bulk_create_activities(self):
+        """Test creating many activities at once."""
+        user_1 = create_user()
+        user_2 = create_user()
+        activities = Activity.objects.bulk_create_activities([
+            {'created_user': self.user, 'about': user_1,
+             'action': Action.CREATED},
+            {'created_user': self.user, 'about': user_2,
+             'action': Action.COMMENTED, 'text': ' hello ',
+             'ensure_for_objs': [user_1]},
+            {'created_user': self.user, 'about': user_2,
+             'action': Action.SHARED},
+        ])
+
+        self.assertEqual(len(activities), 3)
+
+        for activity in activities:
+            self.assertIsNotNone(activity.id)
+            self.assertEqual(activity, Activity.objects.get(id=activity.id))
+
+        self.assertEqual(list(activities[0].get_for_objects()), [user_1])
+        self.assertEqual(set(activities[1].get_for_objects()),
+                         set([user_1, user_2]))
+        self.assertEqual(activities[1].text, 'hello')
+        self.assertEqual(set(activities[2].get_for_objects()),
+                         set([self.user, user_2]))
+
+    def test_bulk_create_activities_existing_share(self):
+        """Test bulk creating activities skips objects the user has already
+        shared.
+        """
+        user_1 = create_user()
+        Activity.objects.create(created_user=self.user,
+                                about=user_1,
+                                action=Action.SHARED)
+        activities = Activity.objects.bulk_create_activities([
+            {'created_user': self.user, 'about': user_1,
+             'action': Action.SHARED},
+        ])
+
+        self.assertEqual(activities, [])
+        self.assertEqual(
+            Activity.objects.get_about_object(about=user_1,
+                                              action=Action.SHARED).count(),
+            1
+        )
+
+    def test_reconcile_reply_counts(self):
+        """Test only the activities with the wrong reply count are
+        updated.
+        """
+        activities = [create_activity(about=self.user, created_user=self.user)
+                      for i in range(3)]
+        activities[0].add_reply(user=self.user, text='a reply')
+        activities[0].add_reply(user=self.user, text='another reply')
+        Activity.objects.filter(id=activities[0].id).update(reply_count=0)
+        Activity.objects.filter(id=activities[1].id).update(reply_count=4)
+        activity_ids = [activity.id for activity in activities]
+
+        self.assertEqual(Activity.objects.reconcile_reply_counts(
+            activity_ids=activity_ids,
+            is_dry_run=True
+        ), 2)
+        self.assertEqual(Activity.objects.reconcile_reply_counts(
+            activity_id_start=min(activity_ids),
+            activity_id_end=max(activity_ids) + 1
+        ), 2)
+        self.assertEqual(
+            list(Activity.objects.filter(
+                id__in=activity_ids
+            ).order_by('id').values_list('reply_count', flat=True)),
+            [2, 0, 0]
+        )
+        self.assertEqual(Activity.objects.reconcile_reply_counts(
+            activity_ids=activity_ids
+        ), 0)
+
+    def test_reconcile_share_counts(self):
+        """Test the share counts are set from the SHARED activities and
+        objects with no shares are reset to 0.
+        """
+        objs = [ShareableObject.objects.create() for i in range(3)]
+
+        for user in [create_user(), create_user()]:
+            Activity.objects.create(created_user=user,
+                                    about=objs[0],
+                                    action=Action.SHARED)
+
+        ShareableObject.objects.filter(id=objs[0].id).update(share_count=5)
+        ShareableObject.objects.filter(id=objs[1].id).update(share_count=3)
+
+        with self.assertNumQueries(4):
+            num_updated = Activity.objects.reconcile_share_counts(
+                model=ShareableObject,
+                about_ids=[obj.id for obj in objs]
+            )
+
+        self.assertEqual(num_updated, 2)
+        self.assertEqual(
+            list(ShareableObject.objects.filter(
+                id__in=[obj.id for obj in objs]
+            ).order_by('id').values_list('share_count', flat=True)),
+            [2, 0, 0]
+        )
+
+    def test_fast_delete(self):
+        """Test the activities and their replies are deleted and the share
+        counts of the shared objects are decremented.
+        """
+        obj = ShareableObject.objects.create()
+        shares = [Activity.objects.create(created_user=create_user(),
+                                          about=obj,
+                                          action=Action.SHARED)
+                  for i in range(2)]
+        activity = create_activity(about=self.user, created_user=self.user)
+        shares[0].add_reply(user=self.user, text='a reply')
+
+        self.assertEqual(ShareableObject.objects.get(id=obj.id).share_count,
+                         2)
+
+        queryset = Activity.objects.filter(
+            about_content_type=ContentType.objects.get_for_model(obj),
+            about_id=obj.id
+        )
+        num_deleted = Activity.objects.fast_delete(queryset=queryset,
+                                                   batch_size=1)
+
+        self.assertEqual(num_deleted, 2)
+        self.assertFalse(Activity.objects.filter(
+            id__in=[share.id for share in shares]
+        ).exists())
+        self.assertFalse(ActivityReply.objects.filter(
+            activity_id=shares[0].id
+        ).exists())
+        self.assertTrue(Activity.objects.filter(id=activity.id).exists())
+        self.assertEqual(ShareableObject.objects.get(id=obj.id).share_count,
+                         0)
+
+    def test_fast_delete_grouped(self):
+        """Test activities grouped under deleted activities are ungrouped
+        like the "group" foreign key's SET_NULL.
+        """
+        group = create_activity(about=self.user, created_user=self.user)
+        grouped = create_activity(about=self.user, created_user=self.user,
+                                  group=group)
+
+        Activity.objects.fast_delete(
+            queryset=Activity.objects.filter(id=group.id)
+        )
+
+        self.assertFalse(Activity.objects.filter(id=group.id).exists())
+        self.assertIsNone(Activity.objects.get(id=grouped.id).group_id)
+
+    def test_fast_delete_grouped_on_delete(self):
+        """Test the "group" foreign key's CASCADE and PROTECT are followed."""
+        group = create_activity(about=self.user, created_user=self.user)
+        grouped = create_activity(about=self.user, created_user=self.user,
+                                  group=group)
+        grouped_2 = create_activity(about=self.user, created_user=self.user,
+                                    group=grouped)
+        group_rel = Activity._meta.get_field('group').rel
+
+        with patch.object(group_rel, 'on_delete', PROTECT):
+            with self.assertRaises(ProtectedError):
+                Activity.objects.fast_delete(
+                    queryset=Activity.objects.filter(id=group.id)
+                )
+
+        with patch.object(group_rel, 'on_delete', CASCADE):
+            num_deleted = Activity.objects.fast_delete(
+                queryset=Activity.objects.filter(id=group.id)
+            )
+
+        self.assertEqual(num_deleted, 3)
+        self.assertFalse(Activity.objects.filter(
+            id__in=[group.id, grouped.id, grouped_2.id]
+        ).exists())
+
+    def test_fast_delete_replies(self):
+        """Test the replies and the replies to them are deleted and the reply
+        counts are decremented.
+        """
+        activity = create_activity(about=self.user, created_user=self.user)
+        reply = activity.add_reply(user=self.user, text='a reply')
+        activity.add_reply(user=self.user, text='a child', reply_to=reply)
+        activity.add_reply(user=self.user, text='another reply')
+
+        self.assertEqual(Activity.objects.get(id=activity.id).reply_count, 3)
+
+        num_deleted = ActivityReply.objects.fast_delete(
+            queryset=ActivityReply.objects.filter(id=reply.id)
+        )
+
+        self.assertEqual(num_deleted, 2)
+        self.assertEqual(ActivityReply.objects.filter(
+            activity_id=activity.id
+        ).count(), 1)
+        self.assertEqual(Activity.objects.get(id=activity.id).reply_count, 1)
+
+
+@override_settings(ACTIVITIES_FEED_ENTRIES_ENABLED=True)
+class ActivityFeedEntryTests(TestCase):
+    """Tests for the materialized activity feed entries."""
+
+    def test_create_activity_feed_entries(self):
+        """Test a feed entry is created for each activity recipient."""
+        user_1 = create_user()
+        user_2 = create_user()
+        activity = create_activity(about=user_1, ensure_for_objs=[user_2])
+        feed_entries = ActivityFeedEntry.objects.filter(activity=activity)
+
+        self.assertEqual(feed_entries.count(), 2)
+        self.assertEqual(
+            set(feed_entries.values_list('object_id', flat=True)),
+            set([user_1.id, user_2.id])
+        )
+
+        for feed_entry in feed_entries:
+            self.assertEqual(feed_entry.created_dttm, activity.created_dttm)
+            self.assertEqual(feed_entry.privacy, activity.privacy)
+
+    def test_get_for_object_feed_entries(self):
+        """Test activities visibility when reading from the feed entries."""
+        user_1 = create_user()
+        user_2 = create_user()
+        user_3 = create_user()
+        public_activity = create_activity(about=user_1,
+                                          privacy=Privacy.PUBLIC)
+        custom_activity = create_activity(about=user_1,
+                                          privacy=Privacy.CUSTOM,
+                                          ensure_for_objs=[user_2])
+
+        activities = Activity.objects.get_for_object(obj=user_1)
+        self.assertEqual(list(activities), [public_activity])
+
+        activities = Activity.objects.get_for_object(obj=user_1,
+                                                     for_user=user_2)
+        self.assertEqual(set(activities),
+                         set([public_activity, custom_activity]))
+
+        activities = Activity.objects.get_for_object(obj=user_1,
+                                                     for_user=user_3)
+        self.assertEqual(list(activities), [public_activity])
+
+    def test_get_for_object_feed_entries_ordering(self):
+        """Test the activities are ordered by the feed entry's created_dttm
+        so the feed entry index can be used for the ordering.
+        """
+        user_1 = create_user()
+        activity_1 = create_activity(about=user_1, privacy=Privacy.PUBLIC)
+        activity_2 = create_activity(about=user_1, privacy=Privacy.PUBLIC)
+        activities = Activity.objects.get_for_object(obj=user_1)
+        feed_entry_table = ActivityFeedEntry._meta.db_table
+
+        self.assertIn(
+            'ORDER BY "{0}"."created_dttm" DESC'.format(feed_entry_table),
+            str(activities.query)
+        )
+        self.assertEqual(list(activities), [activity_2, activity_1])
+
+    def test_updates_for_about_object_feed_entries(self):
+        """Test the feed entry privacy is kept in sync with the activity."""
+        user_1 = create_user()
+        activity = create_activity(about=user_1, privacy=Privacy.PRIVATE)
+        Activity.objects.updates_for_about_object(about=user_1,
+                                                  privacy=Privacy.PUBLIC)
+
+        self.assertEqual(
+            set(activity.feed_entries.values_list('privacy', flat=True)),
+            set([Privacy.PUBLIC])
+        )
+
+    def test_save_feed_entries_privacy(self):
+        """Test the feed entry privacy is kept in sync when an activity's
+        privacy is changed with save.
+        """
+        user_1 = create_user()
+        user_2 = create_user()
+        activity = create_activity(about=user_1,
+                                   privacy=Privacy.PRIVATE,
+                                   ensure_for_objs=[user_2])
+        activity.privacy = Privacy.PUBLIC
+        activity.save()
+
+        self.assertEqual(
+            set(activity.feed_entries.values_list('privacy', flat=True)),
+            set([Privacy.PUBLIC])
+        )
+        self.assertEqual(
+            list(Activity.objects.get_for_object(obj=user_1,
+                                                 for_user=create_user())),
+            [activity]
+        )
+
+    def test_bulk_create_activities_feed_entries(self):
+        """Test feed entries are created for bulk created activities."""
+        user_1 = create_user()
+        user_2 = create_user()
+        activities = Activity.objects.bulk_create_activities([
+            {'created_user': user_1, 'about': user_1,
+             'ensure_for_objs': [user_2]},
+        ])
+
+        self.assertEqual(activities[0].feed_entries.count(), 2)
+
+    def test_backfill_feed_entries(self):
+        """Test backfilling the feed entries from the for_objs data."""
+        user_1 = create_user()
+        user_2 = create_user()
+        activity = create_activity(about=user_1, ensure_for_objs=[user_2])
+        activity.feed_entries.all().delete()
+
+        num_entries = ActivityFeedEntry.objects.backfill(
+            activity_id_start=activity.id,
+            activity_id_end=activity.id + 1
+        )
+
+        self.assertEqual(num_entries, 2)
+        self.assertEqual(activity.feed_entries.count(), 2)
+
+
+class ActivityForManagerTests(TestCase):
+    """Tests for the ActivityFor manager."""
+
+    def test_get_or_create_for_objects(self):
+        """Test resolving many objects to ActivityFor instances."""
+        user_1 = create_user()
+        user_2 = create_user()
+        existing = ActivityFor.objects.get_or_create_generic(
+            content_object=user_1
+        )[0]
+
+        # one select, one insert of the missing rows and one select of the
+        # inserted rows.  The savepoint wrapping the insert isn't counted.
+        with CaptureQueriesContext(connection) as queries:
+            activity_fors = ActivityFor.objects.get_or_create_for_objects(
+                objs=[user_1, user_2]
+            )
+
+        self.assertEqual(len([
+            query for query in queries.captured_queries
+            if 'SAVEPOINT' not in query['sql'].upper()
+        ]), 3)
+
+        self.assertEqual(len(activity_fors), 2)
+        self.assertEqual(activity_fors[ActivityFor.get_key(user_1)],
+                         existing)
+        self.assertEqual(
+            activity_fors[ActivityFor.get_key(user_2)].content_object,
+            user_2
+        )
+
+        with self.assertNumQueries(1):
+            activity_fors_2 = ActivityFor.objects.get_or_create_for_objects(
+                objs=[user_1, user_2]
+            )
+
+        self.assertEqual(activity_fors, activity_fors_2)
+        self.assertEqual(ActivityFor.objects.filter(
+            object_id__in=[user_1.id, user_2.id]
+        ).count(), 2)
@@ -11,3 +11,9 @@ class AbstractActivityMixin(models.Model):
 
     def my_test_method(self):
         return 'worked'
+
+
+class ShareableObject(models.Model):
+    """Test "about" model with a denormalized share count."""
+    name = models.CharField(max_length=50, blank=True)
+    share_count = models.IntegerField(default=0)
@@ -0,0 +1,125 @@
+from base64 import urlsafe_b64encode
+
+from activities.models import Activity
+from activities.paging import CursorPaginator
+from activities.paging import HasMorePaginator
+from activities.paging import decode_cursor
+from activities.paging import encode_cursor
+from django.core.paginator import EmptyPage
+from django.test import TestCase
+from django_testing.user_utils import create_user
+
+from .utils import create_activity
+
+
+class CursorPaginatorTests(TestCase):
+    """Tests for the activity cursor paginator."""
+
+    def setUp(self):
+        super(CursorPaginatorTests, self).setUp()
+        self.user = create_user()
+        self.activities = [create_activity(about=self.user,
+                                           created_user=self.user)
+                           for i in range(5)]
+        # newest activities first
+        self.activities.reverse()
+        self.queryset = Activity.objects.get_about_object(about=self.user)
+
+    def test_encode_decode_cursor(self):
+        """Test a cursor token can be decoded back to its keys."""
+        activity = self.activities[0]
+        token = encode_cursor(activity)
+
+        self.assertEqual(decode_cursor(token),
+                         (activity.created_dttm, activity.id))
+
+    def test_decode_invalid_cursor(self):
+        """Test invalid cursor tokens are ignored."""
+        self.assertIsNone(decode_cursor(None))
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        self.assertIsNone(decode_cursor(u'caf\xe9'))
+        self.assertIsNone(decode_cursor(
+            urlsafe_b64encode(b'2016-01-01T00:00:00|abc').decode('ascii')
+        ))
+        self.assertIsNone(decode_cursor(
+            urlsafe_b64encode(b'not-a-date|1').decode('ascii')
+        ))
+
+    def test_page_before(self):
+        """Test paging through the activities using "before" cursors."""
+        paginator = CursorPaginator(self.queryset, per_page=2)
+        page = paginator.page()
+
+        self.assertEqual(page.object_list, self.activities[:2])
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+        page = paginator.page(before=page.next_cursor)
+        self.assertEqual(page.object_list, self.activities[2:4])
+        self.assertTrue(page.has_next())
+        self.assertTrue(page.has_previous())
+
+        page = paginator.page(before=page.next_cursor)
+        self.assertEqual(page.object_list, self.activities[4:])
+        self.assertFalse(page.has_next())
+        self.assertIsNone(page.next_cursor)
+
+    def test_page_after(self):
+        """Test getting the newer activities using an "after" cursor."""
+        paginator = CursorPaginator(self.queryset, per_page=2)
+        page = paginator.page(after=encode_cursor(self.activities[4]))
+
+        self.assertEqual(page.object_list, self.activities[2:4])
+        self.assertTrue(page.has_next())
+        self.assertTrue(page.has_previous())
+
+        page = paginator.page(after=page.previous_cursor)
+        self.assertEqual(page.object_list, self.activities[:2])
+        self.assertFalse(page.has_previous())
+
+
+class HasMorePaginatorTests(TestCase):
+    """Tests for the count free "has more" paginator."""
+
+    def setUp(self):
+        super(HasMorePaginatorTests, self).setUp()
+        self.user = create_user()
+        self.activities = [create_activity(about=self.user,
+                                           created_user=self.user)
+                           for i in range(5)]
+        self.activities.reverse()
+        self.queryset = Activity.objects.get_about_object(
+            about=self.user
+        ).order_by('-created_dttm', '-id')
+
+    def test_page(self):
+        """Test paging through the activities without counting."""
+        paginator = HasMorePaginator(self.queryset, per_page=2)
+        page = paginator.page(1)
+
+        self.assertEqual(page.object_list, self.activities[:2])
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+        self.assertEqual(page.next_page_number(), 2)
+
+        page = paginator.page(3)
+        self.assertEqual(page.object_list, self.activities[4:])
+        self.assertFalse(page.has_next())
+        self.assertTrue(page.has_previous())
+        self.assertEqual(page.start_index(), 5)
+        self.assertEqual(page.end_index(), 5)
+
+    def test_page_no_count_query(self):
+        """Test getting a page only issues a single query."""
+        paginator = HasMorePaginator(self.queryset, per_page=2)
+
+        with self.assertNumQueries(1):
+            page = paginator.page(2)
+            page.has_next()
+
+    def test_empty_page(self):
+        """Test requesting a page past the last page."""
+        paginator = HasMorePaginator(self.queryset, per_page=2)
+
+        with self.assertRaises(EmptyPage):
+            paginator.page(4)
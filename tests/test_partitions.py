@@ -0,0 +1,136 @@
+from datetime import datetime
+from datetime import timedelta
+
+from activities.models import Activity
+from activities.models import ActivityFeedEntry
+from activities.partitions import create_partition
+from activities.partitions import get_index_column_sql
+from activities.partitions import get_index_sql
+from activities.partitions import get_month_start
+from activities.partitions import get_partition_name
+from activities.partitions import get_partitioned_models
+from activities.partitions import is_partitioned
+from django.test import TestCase
+from django.test.utils import override_settings
+from django_testing.user_utils import create_user
+
+from .utils import create_activity
+
+
+class PartitionTests(TestCase):
+    """Tests for the activity table partitioning helpers."""
+
+    def test_get_month_start(self):
+        """Test the month starts are offset across years."""
+        dttm = datetime(2015, 11, 20, 10, 30)
+
+        self.assertEqual(get_month_start(dttm), datetime(2015, 11, 1))
+        self.assertEqual(get_month_start(dttm, months=3),
+                         datetime(2016, 2, 1))
+        self.assertEqual(get_month_start(dttm, months=-11),
+                         datetime(2014, 12, 1))
+
+    def test_get_partition_name(self):
+        """Test the partition name has the year and month."""
+        self.assertEqual(get_partition_name('activities_activity',
+                                            datetime(2015, 1, 1)),
+                         'activities_activity_p201501')
+
+    def test_get_index_sql(self):
+        """Test the partitioned table index statements."""
+        self.assertEqual(
+            get_index_sql(name='"p_idx"', table='"activities_activity"',
+                          method='btree', columns=['about_id', 'created_dttm'],
+                          num_key_columns=2),
+            'CREATE INDEX "p_idx" ON "activities_activity" USING btree '
+            '(about_id, created_dttm);'
+        )
+
+    def test_get_index_sql_unique(self):
+        """Test created_dttm is added to the key columns of unique indexes,
+        including partial and covering ones.
+        """
+        self.assertEqual(
+            get_index_sql(name='"p_idx"', table='"t"', method='btree',
+                          columns=['activity_id', 'object_id', 'privacy'],
+                          num_key_columns=2,
+                          predicate='(object_id IS NOT NULL)',
+                          is_unique=True),
+            'CREATE UNIQUE INDEX "p_idx" ON "t" USING btree '
+            '(activity_id, object_id, created_dttm) INCLUDE (privacy) '
+            'WHERE (object_id IS NOT NULL);'
+        )
+        self.assertEqual(
+            get_index_sql(name='"p_idx"', table='"t"', method='btree',
+                          columns=['"created_dttm" DESC', 'id'],
+                          num_key_columns=2,
+                          is_unique=True),
+            'CREATE UNIQUE INDEX "p_idx" ON "t" USING btree '
+            '("created_dttm" DESC, id);'
+        )
+
+    def test_get_index_column_sql(self):
+        """Test the index column sort orders."""
+        self.assertEqual(get_index_column_sql('id', 0), 'id')
+        self.assertEqual(get_index_column_sql('id', 3), 'id DESC')
+        self.assertEqual(get_index_column_sql('id', 1), 'id DESC NULLS LAST')
+        self.assertEqual(get_index_column_sql('id', 2), 'id NULLS FIRST')
+
+    def test_plain_table_fallback(self):
+        """Test the tables aren't partitioned on sqlite and partitions are
+        never created.
+        """
+        for model in get_partitioned_models():
+            self.assertFalse(is_partitioned(model))
+            self.assertFalse(create_partition(model=model,
+                                              month_start=datetime(2015, 1, 1)))
+
+
+class FeedTimeBoundsTests(TestCase):
+    """Tests for the time bounds of the feed queries."""
+
+    def setUp(self):
+        super(FeedTimeBoundsTests, self).setUp()
+        self.user = create_user()
+        self.old_activity = create_activity(about=self.user,
+                                            created_user=self.user,
+                                            ensure_for_objs=[self.user])
+        Activity.objects.filter(id=self.old_activity.id).update(
+            created_dttm=datetime.utcnow() - timedelta(days=30)
+        )
+        self.new_activity = create_activity(about=self.user,
+                                            created_user=self.user,
+                                            ensure_for_objs=[self.user])
+
+    def test_since(self):
+        """Test only the activities since the datetime are returned."""
+        activities = Activity.objects.get_for_object(
+            obj=self.user,
+            for_user=self.user,
+            since=datetime.utcnow() - timedelta(days=7)
+        )
+
+        self.assertEqual(list(activities), [self.new_activity])
+
+    @override_settings(ACTIVITIES_FEED_MAX_AGE_DAYS=7)
+    def test_max_age_days(self):
+        """Test the max age setting bounds the feed by default."""
+        activities = Activity.objects.get_for_object(obj=self.user,
+                                                     for_user=self.user)
+
+        self.assertEqual(list(activities), [self.new_activity])
+
+    @override_settings(ACTIVITIES_FEED_ENTRIES_ENABLED=True)
+    def test_until_feed_entries(self):
+        """Test the bounds are applied to the feed entries query."""
+        ActivityFeedEntry.objects.backfill(
+            activity_id_start=self.old_activity.id,
+            activity_id_end=self.new_activity.id + 1
+        )
+        activities = Activity.objects.get_for_object(
+            obj=self.user,
+            for_user=self.user,
+            until=datetime.utcnow() - timedelta(days=7)
+        )
+
+        self.assertEqual(list(activities), [self.old_activity])
@@ -0,0 +1,105 @@
+from activities.models import Activity
+from activities.prefetch import get_about_model_spec
+from activities.prefetch import prefetch_about_objects
+from activities.prefetch import prefetch_latest_replies
+from activities.prefetch import register_about_model
+from activities.prefetch import unregister_about_model
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django_testing.user_utils import create_user
+
+from .utils import create_activity
+
+
+class PrefetchAboutObjectsTests(TestCase):
+    """Tests for loading the activity "about" objects."""
+
+    def tearDown(self):
+        super(PrefetchAboutObjectsTests, self).tearDown()
+        unregister_about_model(get_user_model())
+
+    def test_register_about_model(self):
+        """Test getting the registered spec for an "about" model."""
+        user_model = get_user_model()
+        self.assertEqual(get_about_model_spec(user_model),
+                         {'select_related': [], 'prefetch_related': [],
+                          'cache_fragments': True})
+
+        register_about_model(user_model, prefetch_related=['groups'])
+        self.assertEqual(get_about_model_spec(user_model),
+                         {'select_related': [],
+                          'prefetch_related': ['groups'],
+                          'cache_fragments': True})
+
+    def test_prefetch_about_objects(self):
+        """Test the "about" objects are loaded with one query per content
+        type plus the registered prefetch queries.
+        """
+        register_about_model(get_user_model(), prefetch_related=['groups'])
+        users = [create_user() for i in range(3)]
+
+        for user in users:
+            create_activity(about=user, created_user=user)
+
+        activities = list(Activity.objects.filter(
+            about_id__in=[user.id for user in users]
+        ))
+
+        with self.assertNumQueries(2):
+            prefetch_about_objects(activities=activities)
+
+        with self.assertNumQueries(0):
+            for activity in activities:
+                self.assertIn(activity.about, users)
+                list(activity.about.groups.all())
+
+    def test_prefetch_about_objects_deleted(self):
+        """Test activities with deleted "about" objects don't query again."""
+        user = create_user()
+        about_user = create_user()
+        activity = create_activity(about=about_user, created_user=user)
+        about_user.delete()
+        activity = Activity.objects.get(id=activity.id)
+        prefetch_about_objects(activities=[activity])
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(activity.about)
+
+
+class PrefetchLatestRepliesTests(TestCase):
+    """Tests for loading the activity reply previews."""
+
+    def setUp(self):
+        super(PrefetchLatestRepliesTests, self).setUp()
+        self.user = create_user()
+        self.activities = [create_activity(about=self.user,
+                                           created_user=self.user)
+                           for i in range(2)]
+        self.replies = [self.activities[0].add_reply(user=self.user,
+                                                     text='reply {0}'.format(i))
+                        for i in range(5)]
+
+    def test_prefetch_latest_replies(self):
+        """Test only the newest replies are loaded for each activity."""
+        activities = list(Activity.objects.filter(
+            id__in=[activity.id for activity in self.activities]
+        ).order_by('id'))
+
+        with self.assertNumQueries(2):
+            prefetch_latest_replies(activities=activities, count=3)
+
+        self.assertEqual(activities[0].latest_replies,
+                         list(reversed(self.replies))[:3])
+        self.assertEqual(activities[1].latest_replies, [])
+
+        with self.assertNumQueries(0):
+            [reply.created_user for reply in activities[0].latest_replies]
+
+    def test_prefetch_latest_replies_no_count(self):
+        """Test no replies are loaded when the count is 0."""
+        activities = [Activity.objects.get(id=self.activities[0].id)]
+
+        with self.assertNumQueries(0):
+            prefetch_latest_replies(activities=activities, count=0)
+
+        self.assertEqual(activities[0].latest_replies, [])
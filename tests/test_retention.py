@@ -0,0 +1,121 @@
+from datetime import datetime
+from datetime import timedelta
+
+from activities.constants import Action
+from activities.constants import Source
+from activities.models import Activity
+from activities.models import ActivityReply
+from activities.retention import get_retention_rules
+from activities.retention import prune_activities
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+from django.test.utils import override_settings
+from django_testing.user_utils import create_user
+
+from .utils import create_activity
+
+
+@override_settings(ACTIVITIES_RETENTION_POLICY=[
+    {'source': Source.SYSTEM, 'action': Action.UPDATED, 'days': 90},
+    {'days': 365},
+])
+class RetentionTests(TestCase):
+    """Tests for pruning activities by the retention policy."""
+
+    def setUp(self):
+        super(RetentionTests, self).setUp()
+        user = create_user()
+        now = datetime.utcnow()
+        self.activities = {}
+
+        # created oldest first, like real activities
+        for name, source, action, days in (
+            ('expired_comment', Source.USER, Action.COMMENTED, 400),
+            ('old_update', Source.SYSTEM, Action.UPDATED, 100),
+            ('old_comment', Source.USER, Action.COMMENTED, 100),
+            ('new_update', Source.SYSTEM, Action.UPDATED, 10),
+        ):
+            activity = create_activity(about=user,
+                                       created_user=user,
+                                       source=source,
+                                       action=action)
+            Activity.objects.filter(id=activity.id).update(
+                created_dttm=now - timedelta(days=days)
+            )
+            self.activities[name] = activity
+
+        self.activities['old_update'].add_reply(user=user, text='a reply')
+
+    def test_dry_run(self):
+        """Test the dry run reports the number of activities per rule without
+        deleting them.
+        """
+        report = prune_activities(is_dry_run=True)
+
+        self.assertEqual([num_deleted for rule, num_deleted in report],
+                         [1, 1])
+        self.assertEqual(Activity.objects.filter(
+            id__in=[a.id for a in self.activities.values()]
+        ).count(), 4)
+
+    def test_prune(self):
+        """Test only the expired activities and their replies are deleted."""
+        report = prune_activities(batch_size=1, is_dry_run=False)
+
+        self.assertEqual([num_deleted for rule, num_deleted in report],
+                         [1, 1])
+        self.assertEqual(
+            set(Activity.objects.filter(
+                id__in=[a.id for a in self.activities.values()]
+            ).values_list('id', flat=True)),
+            set([self.activities['new_update'].id,
+                 self.activities['old_comment'].id])
+        )
+        self.assertFalse(ActivityReply.objects.filter(
+            activity_id=self.activities['old_update'].id
+        ).exists())
+
+    def test_prune_backdated(self):
+        """Test expired activities with newer ids than unexpired ones (i.e.
+        backdated or restored activities) are pruned.
+        """
+        user = create_user()
+        activity = create_activity(about=user, created_user=user)
+        Activity.objects.filter(id=activity.id).update(
+            created_dttm=datetime.utcnow() - timedelta(days=500)
+        )
+
+        report = prune_activities(batch_size=1, is_dry_run=False)
+
+        self.assertEqual([num_deleted for rule, num_deleted in report],
+                         [1, 2])
+        self.assertFalse(Activity.objects.filter(id=activity.id).exists())
+        self.assertTrue(Activity.objects.filter(
+            id=self.activities['new_update'].id
+        ).exists())
+
+    @override_settings(ACTIVITIES_RETENTION_POLICY=[
+        {'days': 30},
+        {'action': Action.COMMENTED, 'days': 365},
+    ])
+    def test_prune_rule_precedence(self):
+        """Test the most specific rule an activity matches applies to it,
+        even when a less specific rule is listed first.
+        """
+        report = prune_activities(is_dry_run=False)
+
+        self.assertEqual([num_deleted for rule, num_deleted in report],
+                         [1, 1])
+        self.assertEqual(
+            set(Activity.objects.filter(
+                id__in=[a.id for a in self.activities.values()]
+            ).values_list('id', flat=True)),
+            set([self.activities['new_update'].id,
+                 self.activities['old_comment'].id])
+        )
+
+    @override_settings(ACTIVITIES_RETENTION_POLICY=[{'action': 'UPDATED'}])
+    def test_invalid_rule(self):
+        """Test a rule without days is rejected."""
+        with self.assertRaises(ImproperlyConfigured):
+            get_retention_rules()
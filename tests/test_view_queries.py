@@ -0,0 +1,115 @@
+from activities.constants import Privacy
+from activities.views import ActivitiesGenericObjectView
+from activities.views import ActivityRepliesView
+from activities.views import ActivityView
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django_testing.user_utils import create_user
+
+from .utils import assert_max_queries_by_page_size
+from .utils import create_activity
+from .utils import render_response
+
+
+class ViewQueryCountTests(TestCase):
+    """Guards against N+1 queries in the activity views.  The number of
+    queries each view makes must not grow with the number of activities
+    (or replies) on the page.
+    """
+    page_sizes = (1, 3, 6)
+    max_queries = 12
+
+    def setUp(self):
+        super(ViewQueryCountTests, self).setUp()
+        self.user = create_user()
+        self.request_factory = RequestFactory()
+        self.activities = []
+
+        # every activity has replies by the viewing user and another user so
+        # the reply edit links and user links are rendered.
+        for i in range(max(self.page_sizes) + 1):
+            activity = create_activity(about=self.user,
+                                       created_user=create_user(),
+                                       privacy=Privacy.PUBLIC,
+                                       ensure_for_objs=[self.user])
+            activity.add_reply(user=self.user, text='a reply')
+            activity.add_reply(user=create_user(), text='another reply')
+            self.activities.append(activity)
+
+        self.activity = self.activities[0]
+
+        for i in range(max(self.page_sizes)):
+            self.activity.add_reply(user=create_user(), text='a reply')
+
+    def get_request(self, data=None, **extra):
+        request = self.request_factory.get('/', data or {}, **extra)
+        request.user = self.user
+        request.session = {}
+        return request
+
+    def get_activities_view(self, page_size, **extra):
+        content_type = ContentType.objects.get_for_model(self.user)
+        response = ActivitiesGenericObjectView.as_view()(
+            self.get_request({'aps': page_size}, **extra),
+            content_type_id=str(content_type.id),
+            object_id=str(self.user.id)
+        )
+        return render_response(response)
+
+    def test_activities_view(self):
+        """Test the activities feed queries don't grow with the page size."""
+        assert_max_queries_by_page_size(test_case=self,
+                                        func=self.get_activities_view,
+                                        page_sizes=self.page_sizes,
+                                        max_queries=self.max_queries)
+
+    def test_activities_view_ajax(self):
+        """Test the ajax activities feed queries don't grow with the page
+        size.
+        """
+        assert_max_queries_by_page_size(
+            test_case=self,
+            func=lambda page_size: self.get_activities_view(
+                page_size,
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+            ),
+            page_sizes=self.page_sizes,
+            max_queries=self.max_queries
+        )
+
+    def test_activity_view(self):
+        """Test the activity replies paging queries don't grow with the page
+        size.
+        """
+        def get_activity_view(page_size):
+            response = ActivityView.as_view()(
+                self.get_request({'ps': page_size}),
+                activity_id=str(self.activity.id)
+            )
+            return render_response(response)
+
+        assert_max_queries_by_page_size(test_case=self,
+                                        func=get_activity_view,
+                                        page_sizes=self.page_sizes,
+                                        max_queries=self.max_queries)
+
+    def test_activity_replies_view(self):
+        """Test the activity replies view queries don't depend on the number
+        of replies the activity has.
+        """
+        def get_activity_replies_view(activity):
+            response = ActivityRepliesView.as_view()(
+                self.get_request(),
+                activity_id=str(activity.id)
+            )
+            return render_response(response)
+
+        # activities with 2 and 2 + max(page_sizes) replies
+        activities = [self.activities[1], self.activity]
+        assert_max_queries_by_page_size(
+            test_case=self,
+            func=lambda i: get_activity_replies_view(activities[i]),
+            page_sizes=range(len(activities)),
+            max_queries=self.max_queries
+        )
@@ -1,10 +1,14 @@
 from activities.constants import Action
 from activities.constants import Privacy
 from activities.constants import Source
+from activities.mixins.views import ActivitiesViewMixin
 from activities.mixins.views import ActivityViewMixin
 from activities.models import Activity
+from activities.views import ActivityView
 from django.core.exceptions import PermissionDenied
+from django.http import Http404
 from django.test import TestCase
+from django.test.client import RequestFactory
 from django_testing.user_utils import create_user
 from mock import MagicMock
 
@@ -91,3 +95,55 @@ class ActivityViewMixinTests(TestCase):
             mixin.get_activity(**{
                 mixin.activity_pk_url_kwarg: activity.id
             })
+
+
+class ActivitiesViewMixinTests(TestCase):
+    """Testcase for the activities view mixin."""
+
+    def test_get_activities_page_out_of_range(self):
+        """Test an out of range page is an empty last page instead of the
+        first page again.
+        """
+        user = create_user()
+
+        for i in range(3):
+            Activity.objects.create(created_user=user,
+                                    about=user,
+                                    source=Source.USER,
+                                    action=Action.COMMENTED,
+                                    privacy=Privacy.PUBLIC)
+
+        mixin = ActivitiesViewMixin()
+        mixin.request = MagicMock(GET={})
+        mixin.activities_page_size = 2
+        mixin.activities_page_num = 5
+        context = {}
+        page = mixin.get_activities_page(activities=Activity.objects.all(),
+                                         context=context)
+
+        self.assertEqual(page.object_list, [])
+        self.assertFalse(page.has_next())
+        self.assertEqual(page.number, 5)
+        self.assertIs(context['activities_page'], page)
+
+
+class ActivityViewTests(TestCase):
+    """Testcase for the activity view."""
+
+    def test_last_page(self):
+        """Test asking for the last page of replies is a 404 since the
+        replies aren't counted.
+        """
+        user = create_user()
+        activity = Activity.objects.create(created_user=user,
+                                           about=user,
+                                           source=Source.USER,
+                                           action=Action.COMMENTED,
+                                           privacy=Privacy.PUBLIC)
+        activity.add_reply(user=user, text='a reply')
+        request = RequestFactory().get('/', {ActivityView.page_kwarg: 'last'})
+        request.user = user
+        request.session = {}
+
+        with self.assertRaises(Http404):
+            ActivityView.as_view()(request, activity_id=str(activity.id))
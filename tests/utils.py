@@ -1,6 +1,8 @@
 from activities.constants import Action
 from activities.constants import Privacy
 from activities.models import Activity
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django_testing.user_utils import create_user
 
 
@@ -17,3 +19,63 @@ def create_activity(about, created_user=None, text='hello world',
         'ensure_for_objs': ensure_for_objs or [],
     })
     return Activity.objects.create(**kwargs)
+
+
+def render_response(response):
+    """Renders a template response that hasn't been rendered yet.  Plain
+    responses (i.e. the ajax responses) are returned as they are.
+    """
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+
+    return response
+
+
+def get_num_queries(func, *args, **kwargs):
+    """Gets the number of database queries a function makes.
+
+    :return: tuple of the function's return value and the list of queries.
+    """
+    with CaptureQueriesContext(connection) as context:
+        result = func(*args, **kwargs)
+
+    return result, context.captured_queries
+
+
+def assert_max_queries_by_page_size(test_case, func, page_sizes,
+                                    max_queries):
+    """Asserts the number of queries a paged view makes doesn't grow with
+    the page size (no N+1 queries) and is at most ``max_queries``.
+
+    :param test_case: the test case to assert with.
+    :param func: function called with the page size that makes the request.
+    :param page_sizes: the page sizes to request.  The pages should be full
+        so every object on the page is rendered.
+    :param max_queries: the upper bound on the number of queries per
+        request.
+    """
+    num_queries = []
+
+    for page_size in page_sizes:
+        # the first request warms up the per process caches (content types,
+        # etc) so they aren't counted.
+        func(page_size)
+        response, queries = get_num_queries(func, page_size)
+        test_case.assertEqual(response.status_code, 200)
+        test_case.assertLessEqual(
+            len(queries),
+            max_queries,
+            '{0} queries for page size {1}:\n{2}'.format(
+                len(queries),
+                page_size,
+                '\n'.join(query['sql'] for query in queries)
+            )
+        )
+        num_queries.append(len(queries))
+
+    test_case.assertEqual(
+        len(set(num_queries)), 1,
+        'The number of queries grows with the page size: {0}'.format(
+            dict(zip(page_sizes, num_queries))
+        )
+    )